@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings
 import os
 from dotenv import load_dotenv
@@ -8,9 +9,66 @@ load_dotenv()
 class Settings(BaseSettings):
     supabase_url: str = os.getenv("SUPABASE_URL")
     supabase_key: str = os.getenv("SUPABASE_KEY")
+    # Used to verify Supabase access tokens locally (Settings > API > JWT Secret)
+    supabase_jwt_secret: Optional[str] = os.getenv("SUPABASE_JWT_SECRET")
+    auth_token_cache_size: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    admin_role_ttl_seconds: int = int(os.getenv("ADMIN_ROLE_TTL_SECONDS", "60"))
+    jwks_cache_seconds: int = int(os.getenv("JWKS_CACHE_SECONDS", "3600"))
     project_name: str = "Contract Management API"
     debug: bool = os.getenv("DEBUG", "False").lower() == "true"
     environment: str = os.getenv("ENVIRONMENT", "development")
+    # Size of the thread pool that runs blocking Supabase calls
+    db_max_workers: int = int(os.getenv("DB_MAX_WORKERS", "16"))
+    # Deadline per Supabase call, and retries for idempotent reads
+    db_timeout_seconds: float = float(os.getenv("DB_TIMEOUT_SECONDS", "10"))
+    db_retries: int = int(os.getenv("DB_RETRIES", "2"))
+    # Start a duplicate read when the first is slower than this; 0 disables hedging
+    db_hedge_after_ms: int = int(os.getenv("DB_HEDGE_AFTER_MS", "0"))
+    # Deadline for Storage to start a download; uploads have none since they scale with file size
+    storage_timeout_seconds: float = float(os.getenv("STORAGE_TIMEOUT_SECONDS", "30"))
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+    llm_retries: int = int(os.getenv("LLM_RETRIES", "2"))
+    # Consecutive failures that open a dependency's circuit, and how long it stays open
+    circuit_failure_threshold: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    circuit_reset_seconds: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+    # How often the cached app catalog checks the apps table for changes
+    app_catalog_refresh_seconds: int = int(os.getenv("APP_CATALOG_REFRESH_SECONDS", "30"))
+    # Browser cache lifetime for GET /api/apps, sent as Cache-Control max-age
+    app_catalog_max_age_seconds: int = int(os.getenv("APP_CATALOG_MAX_AGE_SECONDS", "60"))
+    # Listing ETags also change after this long, to pick up writes made by other processes
+    listing_version_max_age_seconds: int = int(os.getenv("LISTING_VERSION_MAX_AGE_SECONDS", "30"))
+    # Rows per PostgREST request for bulk writes, to stay under payload limits
+    bulk_chunk_size: int = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+    # Ids per in.(...) filter; filters go in the URL, which gateways cap at a few KB
+    bulk_filter_chunk_size: int = int(os.getenv("BULK_FILTER_CHUNK_SIZE", "100"))
+    # Contracts per batched insert when importing a CSV/XLSX file
+    import_batch_size: int = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+    # Chunk size for streaming contract files to and from Storage
+    storage_chunk_size: int = int(os.getenv("STORAGE_CHUNK_SIZE", str(256 * 1024)))
+    # Uploads larger than this spill from memory to a temporary file
+    upload_spool_max_bytes: int = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+    # "openai" or "stub" (offline extractor for tests and local development)
+    contract_extractor: str = os.getenv("CONTRACT_EXTRACTOR", "openai")
+    extraction_workers: int = int(os.getenv("EXTRACTION_WORKERS", "4"))
+    extraction_queue_size: int = int(os.getenv("EXTRACTION_QUEUE_SIZE", "100"))
+    # Files extracted at once by POST /api/contracts/process/batch, and files per request
+    extraction_batch_concurrency: int = int(os.getenv("EXTRACTION_BATCH_CONCURRENCY", "4"))
+    extraction_batch_max_files: int = int(os.getenv("EXTRACTION_BATCH_MAX_FILES", "50"))
+    # Provider quotas shared by all extractions in this process; 0 disables a limit
+    llm_requests_per_minute: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+    llm_tokens_per_minute: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+    extraction_cache_enabled: bool = os.getenv("EXTRACTION_CACHE_ENABLED", "True").lower() == "true"
+    extraction_cache_path: str = os.getenv("EXTRACTION_CACHE_PATH", ".cache/extractions.sqlite3")
+    extraction_cache_max_mb: int = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "256"))
+    extraction_cache_ttl_seconds: int = int(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    # One process per deployment is enough; sent reminders are recorded, so
+    # extra schedulers do not send them twice
+    reminder_scheduler_enabled: bool = os.getenv("REMINDER_SCHEDULER_ENABLED", "False").lower() == "true"
+    reminder_lead_days: int = int(os.getenv("REMINDER_LEAD_DAYS", "30"))
+    # How often the scheduler reads contracts changed by other processes
+    reminder_sync_seconds: int = int(os.getenv("REMINDER_SYNC_SECONDS", "60"))
+    # Request metrics at /metrics and the Server-Timing header
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
     cors_origins: list = [
         "http://localhost:3000",  # Default React dev server
         "http://localhost:5173"   # Vite dev server
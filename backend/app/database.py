@@ -1,23 +1,149 @@
-from supabase import create_client, Client
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, Generator, Optional
+import httpx
+from supabase import create_client, Client, ClientOptions
 from .config import get_settings
-from functools import lru_cache
-from typing import Generator
+from .utils.metrics import record_db_call
+from .utils.resilience import CircuitBreaker, OutboundPolicy
 
 settings = get_settings()
 
+class Database:
+    """
+    Non-blocking access to Supabase.
+    supabase-py only ships a synchronous client, so every network call is run
+    on a bounded thread pool instead of on the event loop. Query builders are
+    still created with table()/rpc() and handed to execute().
+    Streaming file transfers bypass supabase-py and go through an async
+    HTTP client against the Storage REST API instead.
+    Calls go through an OutboundPolicy: reads (GET) are retried and
+    optionally hedged, and everything fails fast while the circuit is open.
+    The policy is the only retry layer; postgrest-py's own retries are off.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        max_workers: int,
+        policy: Optional[OutboundPolicy] = None,
+        storage_policy: Optional[OutboundPolicy] = None
+    ):
+        self.client = client
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="supabase"
+        )
+        self._http: Optional[httpx.AsyncClient] = None
+        self.policy = policy or OutboundPolicy("supabase", timeout=None)
+        self.storage_policy = storage_policy or OutboundPolicy("storage", timeout=None)
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    def rpc(self, fn: str, params: dict):
+        return self.client.rpc(fn, params)
+
+    @property
+    def storage(self):
+        return self.client.storage
+
+    @property
+    def auth(self):
+        return self.client.auth
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Async HTTP client authenticated against the Supabase project"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=settings.supabase_url,
+                headers={
+                    "apikey": settings.supabase_key,
+                    "Authorization": f"Bearer {settings.supabase_key}",
+                },
+                timeout=httpx.Timeout(30.0, read=None)
+            )
+        return self._http
+
+    async def _call(self, method: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        finally:
+            record_db_call(method, time.perf_counter() - started)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking client call on the database thread pool"""
+        return await self.policy.call(lambda: self._call("call", fn, *args, **kwargs))
+
+    async def execute(self, query) -> Any:
+        """Execute a PostgREST query builder without blocking the event loop"""
+        request = getattr(query, "request", None)
+        method = getattr(request, "http_method", None) or "call"
+        if request is not None:
+            # postgrest-py retries GETs on 503/520 by itself; stacked under the
+            # policy's retries that would multiply attempts past the deadline
+            request.retry_enabled = False
+        return await self.policy.call(
+            lambda: self._call(method, query.execute),
+            idempotent=method in ("GET", "HEAD")
+        )
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self._executor.shutdown(wait=False)
+
 @lru_cache()
 def get_supabase_client() -> Client:
     """Get a cached Supabase client instance"""
-    return create_client(settings.supabase_url, settings.supabase_key)
+    # Lets the worker thread of a timed-out call go instead of blocking on the socket
+    options = ClientOptions(
+        postgrest_client_timeout=settings.db_timeout_seconds,
+        storage_client_timeout=int(settings.storage_timeout_seconds)
+    )
+    return create_client(settings.supabase_url, settings.supabase_key, options=options)
+
+@lru_cache()
+def get_database() -> Database:
+    """Get the process-wide database layer"""
+    return Database(
+        get_supabase_client(),
+        settings.db_max_workers,
+        policy=OutboundPolicy(
+            "supabase",
+            timeout=settings.db_timeout_seconds,
+            retries=settings.db_retries,
+            hedge_after=settings.db_hedge_after_ms / 1000 or None,
+            breaker=CircuitBreaker("supabase", settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+        ),
+        storage_policy=OutboundPolicy(
+            "storage",
+            timeout=settings.storage_timeout_seconds,
+            retries=settings.db_retries,
+            breaker=CircuitBreaker("storage", settings.circuit_failure_threshold, settings.circuit_reset_seconds)
+        )
+    )
+
+async def close_database():
+    """Release the database thread pool and HTTP client if they were ever created"""
+    if get_database.cache_info().currsize:
+        await get_database().close()
+        get_database.cache_clear()
 
-def get_db() -> Generator[Client, None, None]:
+def get_db() -> Generator[Database, None, None]:
     """
     Get database connection.
     Using generator pattern for future flexibility with connection management
     """
     try:
-        db = get_supabase_client()
+        db = get_database()
         yield db
     except Exception as e:
         print(f"Database connection error: {e}")
-        raise
\ No newline at end of file
+        raise
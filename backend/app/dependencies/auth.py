@@ -1,26 +1,122 @@
+import time
+import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from ..database import get_db
-from supabase import Client
+from jose import jwt, JWTError
+from ..config import get_settings
+from ..database import Database, get_db
+from ..models.user import AuthenticatedUser
+from ..utils.cache import TTLCache
 from typing import Optional
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+settings = get_settings()
+
+# Verified tokens, each kept no longer than the token itself is valid
+_token_cache: TTLCache[AuthenticatedUser] = TTLCache(settings.auth_token_cache_size)
+# App role per user id from the profiles table
+_role_cache: TTLCache[Optional[str]] = TTLCache(
+    settings.auth_token_cache_size,
+    default_ttl=settings.admin_role_ttl_seconds
+)
+# Supabase's published signing keys, for projects using asymmetric JWTs
+_jwks_cache: TTLCache[dict] = TTLCache(1, default_ttl=settings.jwks_cache_seconds)
+# Algorithms accepted for JWKS keys; the JWT secret is only used with HS256
+JWKS_ALGORITHMS = ["RS256", "ES256"]
+
+def invalidate_admin_role(user_id: Optional[str] = None):
+    """Forget cached roles, for one user or everyone, after a profile role change"""
+    if user_id is None:
+        _role_cache.clear()
+    else:
+        _role_cache.pop(user_id)
+
+async def _get_jwks(db: Database) -> dict:
+    jwks = _jwks_cache.get("jwks")
+    if jwks is None:
+        response = await db.http.get("/auth/v1/.well-known/jwks.json")
+        response.raise_for_status()
+        jwks = response.json()
+        _jwks_cache.set("jwks", jwks)
+    return jwks
+
+async def _verify_locally(token: str, db: Database) -> Optional[dict]:
+    """
+    Verify the token signature and claims without calling Supabase Auth.
+    Returns None when no local key is available for the token's algorithm;
+    algorithms other than HS256 and JWKS_ALGORITHMS are rejected.
+    """
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    # The header is attacker-controlled, so it only picks the branch; the
+    # algorithm passed to decode is pinned by the key
+    if algorithm == "HS256":
+        if not settings.supabase_jwt_secret:
+            return None
+        return jwt.decode(
+            token,
+            settings.supabase_jwt_secret,
+            algorithms=["HS256"],
+            audience="authenticated"
+        )
+    if algorithm not in JWKS_ALGORITHMS:
+        raise JWTError(f"Unsupported token algorithm: {algorithm}")
+
+    try:
+        jwks = await _get_jwks(db)
+    except httpx.HTTPError:
+        return None
+    key = next(
+        (k for k in jwks.get("keys", []) if k.get("kid") == header.get("kid")),
+        None
+    )
+    if key is None or key.get("alg") not in JWKS_ALGORITHMS:
+        return None
+
+    return jwt.decode(token, key, algorithms=[key["alg"]], audience="authenticated")
+
+async def _verify_remotely(token: str, db: Database) -> dict:
+    """Fall back to Supabase Auth when the token cannot be verified locally"""
+    response = await db.run(db.auth.get_user, token)
+    if not response or not response.user:
+        raise JWTError("Unknown user")
+    # The signature was checked by Supabase; only the expiry is read here
+    claims = jwt.get_unverified_claims(token)
+    return {
+        "sub": response.user.id,
+        "email": response.user.email,
+        "role": response.user.role,
+        "exp": claims["exp"],
+    }
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Client = Depends(get_db)
-):
-    """Get the current authenticated user"""
-    try:
-        # Verify and get user from session
-        user = db.auth.get_user(token)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    db: Database = Depends(get_db)
+) -> AuthenticatedUser:
+    """
+    Get the current authenticated user.
+    Tokens are verified locally with the project's JWT secret or JWKS and
+    cached until they expire, so steady-state requests make no remote calls.
+    """
+    user = _token_cache.get(token)
+    if user:
         return user
+
+    try:
+        claims = await _verify_locally(token, db)
+        if claims is None:
+            claims = await _verify_remotely(token, db)
+
+        user = AuthenticatedUser(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            expires_at=claims["exp"]
+        )
+        if user.expires_at <= time.time():
+            raise JWTError("Token expired")
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,27 +124,35 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    _token_cache.set(token, user, expires_at=user.expires_at)
+    return user
+
 async def get_admin_user(
-    current_user = Depends(get_current_user),
-    db: Client = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Database = Depends(get_db)
 ):
     """Check if the current user is an admin"""
-    try:
-        # Get user's role from profiles table
-        response = db.table('profiles')\
-            .select('role')\
-            .eq('id', current_user.id)\
-            .single()\
-            .execute()
-        
-        if not response.data or response.data.get('role') != 'admin':
+    role = _role_cache.get(current_user.id)
+    if role is None:
+        try:
+            # Get user's role from profiles table
+            query = db.table('profiles')\
+                .select('role')\
+                .eq('id', current_user.id)\
+                .maybe_single()
+            response = await db.execute(query)
+        except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Admin access required"
             )
-        return current_user
-    except Exception as e:
+
+        role = response.data.get('role') if response and response.data else ""
+        _role_cache.set(current_user.id, role)
+
+    if role != 'admin':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
+    return current_user
@@ -1,14 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .config import get_settings
-from .routers import company, apps, auth,contracts
+from .database import close_database, get_database
+from .middleware.metrics import MetricsMiddleware
+from .services.contract_processor import close_contract_processor
+from .services.extraction_jobs import close_extraction_queue
+from .services.reminder_scheduler import start_reminder_scheduler, stop_reminder_scheduler
+from .routers import company, apps, auth,contracts, analytics
+from .utils.metrics import REGISTRY
+from .utils.resilience import CircuitOpenError
 
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.reminder_scheduler_enabled:
+        await start_reminder_scheduler(get_database())
+    yield
+    await stop_reminder_scheduler()
+    await close_extraction_queue()
+    await close_contract_processor()
+    await close_database()
+
 app = FastAPI(
     title=settings.project_name,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -18,15 +38,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+# Added last so it is outermost and also times CORS handling
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """A dependency is failing fast; tell clients when to come back"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(company.router, prefix="/api/companies", tags=["companies"])
 app.include_router(apps.router, prefix="/api/apps", tags=["apps"])
 app.include_router(contracts.router, prefix="/api/contracts", tags=["contracts"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics of this process"""
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
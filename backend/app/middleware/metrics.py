@@ -0,0 +1,61 @@
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..utils.metrics import HTTP_REQUEST_DURATION, HTTP_REQUEST_ROUND_TRIPS, start_request
+
+def route_label(scope: Scope) -> str:
+    """
+    Route template of the request, e.g. /api/contracts/{contract_id}, so ids
+    do not explode the label set. Depending on the FastAPI version the
+    matched route's path may or may not include the router prefix; the
+    prefixes in this app are static, so the missing leading segments are
+    taken from the request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    segments = scope["path"].rstrip("/").split("/")
+    prefix_length = len(segments) - len(template.rstrip("/").split("/")) + 1
+    prefix = "/".join(segments[:prefix_length]) if prefix_length > 1 else ""
+    return prefix + template
+
+class MetricsMiddleware:
+    """
+    Records the latency and Supabase round trips of every HTTP request per
+    route, and reports where the time went in a Server-Timing header.
+    The header is written when the response starts, so time spent streaming
+    the body only shows up in the latency histogram.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = start_request()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", metrics.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route_path = route_label(scope)
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route_path,
+                status=str(status)
+            )
+            HTTP_REQUEST_ROUND_TRIPS.observe(metrics.db_calls, method=scope["method"], route=route_path)
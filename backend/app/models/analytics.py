@@ -0,0 +1,20 @@
+from typing import List
+from pydantic import BaseModel
+
+class SpendBucket(BaseModel):
+    key: str
+    total_value: float
+    # Contracts for category and renewal month, services for license type
+    count: int
+    license_count: int
+
+class SpendAnalytics(BaseModel):
+    company_id: str
+    total_value: float
+    contract_count: int
+    service_total_cost: float
+    service_count: int
+    license_count: int
+    by_category: List[SpendBucket]
+    by_license_type: List[SpendBucket]
+    by_renewal_month: List[SpendBucket]
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from .base import BaseDBModel
 
@@ -30,4 +30,52 @@ class AppResponse(AppBase, BaseDBModel):
 
 class CompanyAppCreate(BaseModel):
     app_id: str
-    company_id: str
\ No newline at end of file
+    company_id: str
+
+class BulkAppSelection(BaseModel):
+    company_id: str
+    app_ids: List[str] = Field(..., min_length=1)
+
+class BulkItemStatus(str, Enum):
+    SELECTED = "selected"
+    ALREADY_SELECTED = "already_selected"
+    UNSELECTED = "unselected"
+    NOT_SELECTED = "not_selected"
+    NOT_FOUND = "not_found"
+    FAILED = "failed"
+
+class BulkItemResult(BaseModel):
+    app_id: str
+    status: BulkItemStatus
+    error: Optional[str] = None
+
+class BulkSelectionResponse(BaseModel):
+    results: List[BulkItemResult]
+
+class AppResolveRequest(BaseModel):
+    names: List[str] = Field(..., min_length=1, max_length=10000)
+    # Candidates returned per name that has no exact match
+    limit: int = Field(5, ge=1, le=20)
+
+class ResolutionStatus(str, Enum):
+    MATCHED = "matched"
+    SUGGESTED = "suggested"
+    NEW = "new"
+
+class AppCandidate(BaseModel):
+    app: AppResponse
+    # Trigram similarity between 0 and 1
+    score: float
+    # The app name contains the raw name
+    partial: bool = False
+
+class AppResolution(BaseModel):
+    name: str
+    status: ResolutionStatus
+    match: Optional[AppResponse] = None
+    candidates: List[AppCandidate] = []
+    # Category for a new app when nothing matched
+    category: Optional[AppCategory] = None
+
+class AppResolveResponse(BaseModel):
+    results: List[AppResolution]
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import date
 from pydantic import BaseModel, Field, field_validator
 from .base import BaseDBModel
@@ -16,6 +16,11 @@ class PricingModel(str, Enum):
     PRORATED = "Pro-rated"
     FEATURE = "Feature based"
 
+class ContractSort(str, Enum):
+    RENEWAL_PRIORITY = "renewal-priority"
+    REVIEW_DATE = "review-date"
+    TOTAL_VALUE = "total-value"
+
 class ServiceBase(BaseModel):
     name: str = Field(..., min_length=1)
     license_type: LicenseType
@@ -68,4 +73,22 @@ class ContractUpdate(BaseModel):
     services: Optional[List[ServiceCreate]] = None
 
 class ContractResponse(ContractBase, BaseDBModel):
-    services: List[ServiceResponse]
\ No newline at end of file
+    services: List[ServiceResponse]
+
+class ContractPage(BaseModel):
+    items: List[ContractResponse]
+    # Opaque keyset cursor for the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    type: Literal["error"] = "error"
+    # Spreadsheet row number, counting the header as row 1
+    row: int
+    errors: List[str]
+
+class ImportProgress(BaseModel):
+    type: Literal["progress"] = "progress"
+    rows_read: int = 0
+    contracts_created: int = 0
+    rows_failed: int = 0
+    done: bool = False
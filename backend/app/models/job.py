@@ -0,0 +1,35 @@
+from enum import Enum
+from typing import Any, Dict, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class ExtractionJob(BaseModel):
+    id: str
+    status: JobStatus = JobStatus.QUEUED
+    filename: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    # Serialized ContractExtraction once the job has succeeded
+    result: Optional[Dict[str, Any]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+class ExtractionResult(BaseModel):
+    """Outcome of one file of a batch extraction"""
+    # Position of the file in the request, since results arrive as they finish
+    index: int
+    filename: Optional[str] = None
+    status: JobStatus
+    error: Optional[str] = None
+    # Serialized ContractExtraction when the file succeeded
+    result: Optional[Dict[str, Any]] = None
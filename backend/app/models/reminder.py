@@ -0,0 +1,25 @@
+from enum import Enum
+from typing import Optional
+from datetime import date, datetime
+from pydantic import BaseModel
+
+class ReminderKind(str, Enum):
+    REVIEW = "review"
+    RENEWAL = "renewal"
+
+class Reminder(BaseModel):
+    contract_id: str
+    company_id: str
+    kind: ReminderKind
+    due_date: date
+    # Day the reminder fires: due_date minus the configured lead time
+    remind_on: date
+
+class ContractChange(BaseModel):
+    contract_id: str
+    company_id: str
+    renewal_date: Optional[date] = None
+    review_date: Optional[date] = None
+    # Version of the row the change was read from, to order changes that race
+    updated_at: Optional[datetime] = None
+    deleted: bool = False
@@ -0,0 +1,10 @@
+from typing import Optional
+from pydantic import BaseModel
+
+class AuthenticatedUser(BaseModel):
+    id: str
+    email: Optional[str] = None
+    # Postgres role from the token, e.g. "authenticated"; not the app role
+    role: Optional[str] = None
+    # Token expiry as epoch seconds
+    expires_at: int
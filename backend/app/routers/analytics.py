@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException
+from ..database import Database, get_db
+from ..models.analytics import SpendAnalytics
+from ..services.analytics_service import AnalyticsService
+from ..utils.resilience import CircuitOpenError
+
+router = APIRouter()
+
+@router.get("/company/{company_id}", response_model=SpendAnalytics)
+async def get_company_spend(
+    company_id: str,
+    db: Database = Depends(get_db)
+):
+    """Get spend by category, license type and renewal month for a company"""
+    service = AnalyticsService(db)
+    try:
+        return await service.get_company_spend(company_id)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,42 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from typing import List, Optional
-from supabase import Client
-from ..database import get_db
-from ..models.app import AppResponse, AppCategory, CompanyAppCreate, AppCreate
+from ..config import get_settings
+from ..database import Database, get_db
+from ..models.app import (
+    AppResponse,
+    CompanyAppCreate,
+    AppCreate,
+    AppResolveRequest,
+    AppResolveResponse,
+    BulkAppSelection,
+    BulkSelectionResponse
+)
 from ..services.app_service import AppService
 from ..dependencies.auth import get_admin_user
+from ..utils.etag import etag_matches, make_etag
+from ..utils.resilience import CircuitOpenError
 
 router = APIRouter()
 
 @router.get("", response_model=List[AppResponse])
 async def get_apps(
+    response: Response,
     category: Optional[str] = None,
     search: Optional[str] = None,
-    db: Client = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db)
 ):
-    """Get all available apps with optional filtering"""
+    """
+    Get all available apps with optional filtering.
+    The ETag follows the catalog version, so a repeat request with
+    If-None-Match gets a 304 without the catalog being searched or sent.
+    """
     service = AppService(db)
     try:
+        etag = make_etag(await service.catalog_version())
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={get_settings().app_catalog_max_age_seconds}"
+        }
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        response.headers.update(headers)
         return await service.get_all_apps(category, search)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/resolve", response_model=AppResolveResponse)
+async def resolve_apps(
+    request: AppResolveRequest,
+    db: Database = Depends(get_db)
+):
+    """Resolve a pasted list of app names to catalog apps or new-app suggestions"""
+    service = AppService(db)
+    try:
+        return AppResolveResponse(results=await service.resolve_apps(request.names, request.limit))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/company/{company_id}", response_model=List[AppResponse])
 async def get_company_apps(
     company_id: str,
-    db: Client = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db)
 ):
-    """Get all apps selected by a company"""
+    """Get all apps selected by a company, answering If-None-Match with 304 when unchanged"""
     service = AppService(db)
     try:
+        etag = make_etag(company_id, await service.company_apps_version(company_id))
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        response.headers.update(headers)
         return await service.get_company_apps(company_id)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/select", status_code=201)
 async def select_app(
     app_selection: CompanyAppCreate,
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Select an app for a company"""
     service = AppService(db)
@@ -45,6 +96,36 @@ async def select_app(
         if not success:
             raise HTTPException(status_code=400, detail="Failed to select app")
         return {"message": "App selected successfully"}
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/select/bulk", response_model=BulkSelectionResponse)
+async def select_apps(
+    selection: BulkAppSelection,
+    db: Database = Depends(get_db)
+):
+    """Select many apps for a company and report the outcome per app"""
+    service = AppService(db)
+    try:
+        return BulkSelectionResponse(results=await service.select_apps(selection))
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/select/bulk", response_model=BulkSelectionResponse)
+async def unselect_apps(
+    selection: BulkAppSelection,
+    db: Database = Depends(get_db)
+):
+    """Remove many app selections for a company and report the outcome per app"""
+    service = AppService(db)
+    try:
+        return BulkSelectionResponse(results=await service.unselect_apps(selection))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -52,7 +133,7 @@ async def select_app(
 async def unselect_app(
     company_id: str,
     app_id: str,
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Remove an app selection for a company"""
     service = AppService(db)
@@ -61,18 +142,22 @@ async def unselect_app(
         if not success:
             raise HTTPException(status_code=404, detail="App selection not found")
         return {"message": "App unselected successfully"}
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("", response_model=AppResponse, status_code=201)
 async def create_app(
     app: AppCreate,
-    db: Client = Depends(get_db),
+    db: Database = Depends(get_db),
     _: dict = Depends(get_admin_user) 
 ):
     """Create a new app (admin only)"""
     service = AppService(db)
     try:
         return await service.create_app(app)
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Form
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from ..database import get_db
+from ..database import Database, get_db
+from ..utils.resilience import CircuitOpenError
 from typing import Optional
 from pydantic import BaseModel
-from supabase import Client
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -17,25 +17,27 @@ class UserLogin(BaseModel):
     password: str
 
 @router.post("/signup")
-async def signup(user: UserCreate, db: Client = Depends(get_db)):
+async def signup(user: UserCreate, db: Database = Depends(get_db)):
     """Sign up a new user"""
     try:
-        response = db.auth.sign_up({
+        response = await db.run(db.auth.sign_up, {
             "email": user.email,
             "password": user.password
         })
         return {"message": "User created successfully", "user": response.user}
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/login")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Login and get access token"""
     try:
-        response = db.auth.sign_in_with_password({
+        response = await db.run(db.auth.sign_in_with_password, {
             "email": form_data.username,
             "password": form_data.password
         })
@@ -44,6 +46,8 @@ async def login(
             "token_type": "bearer",
             "user": response.user
         }
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=401,
@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from supabase import Client
-from ..database import get_db
+from ..database import Database, get_db
 from ..models.company import CompanyCreate, CompanyResponse, CompanyAuth
 from ..services.supabase_service import SupabaseService
+from ..utils.resilience import CircuitOpenError
 
 router = APIRouter()
 
 @router.post("/auth", response_model=CompanyResponse)
 async def authenticate_company(
     auth_data: CompanyAuth,
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Authenticate a company with name and access code"""
     service = SupabaseService(db)
@@ -23,6 +23,8 @@ async def authenticate_company(
             status_code=401,
             detail="Invalid organization name or access code"
         )
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -32,7 +34,7 @@ async def authenticate_company(
 @router.post("/register", response_model=CompanyResponse)
 async def register_company(
     company: CompanyCreate,
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Register a new company"""
     service = SupabaseService(db)
@@ -56,6 +58,8 @@ async def register_company(
         )
     except HTTPException:
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
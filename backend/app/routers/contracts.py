@@ -1,33 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi import UploadFile, File, BackgroundTasks
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import UploadFile, File, BackgroundTasks, Header, Response
 from fastapi.responses import StreamingResponse
-import io
-from ..services.contract_processor import ContractProcessor
+from starlette.background import BackgroundTask
+from ..services.batch_extraction import extract_files
+from ..services.contract_import import ContractImporter, open_import_rows
+from ..services.contract_processor import ContractExtraction, get_contract_processor
+from ..services.extraction_cache import ExtractionCache, get_extraction_cache
+from ..services.extraction_jobs import (
+    ExtractionJobQueue,
+    QueueFullError,
+    get_extraction_queue
+)
 from ..services.storage_service import StorageService
-from typing import List
-from supabase import Client
-from ..database import get_db
-from ..models.contract import ContractCreate, ContractResponse, ContractUpdate
+from ..services.upload_buffer import SpooledUpload
+from typing import List, Optional, Tuple
+from ..config import get_settings
+from ..database import Database, get_db
+from ..models.app import AppCategory
+from ..models.job import ExtractionJob, JobStatus
+from ..models.contract import (
+    ContractCreate,
+    ContractPage,
+    ContractResponse,
+    ContractSort,
+    ContractUpdate
+)
 from ..services.contract_service import ContractService
+from ..utils.etag import etag_matches, make_etag
+from ..utils.resilience import CircuitOpenError
 
 router = APIRouter()
 
-@router.get("/company/{company_id}", response_model=List[ContractResponse])
+@router.get("/company/{company_id}", response_model=ContractPage)
 async def get_company_contracts(
     company_id: str,
-    db: Client = Depends(get_db)
+    response: Response,
+    sort: ContractSort = ContractSort.RENEWAL_PRIORITY,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    category: Optional[AppCategory] = None,
+    renewal_within_days: Optional[int] = Query(None, ge=0),
+    min_value: Optional[float] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_db)
 ):
-    """Get all contracts for a company"""
+    """
+    Get a page of a company's contracts, sorted and filtered server-side.
+    The ETag changes with every write to the company's contracts, so polling
+    with If-None-Match returns 304 without reading the database.
+    """
     service = ContractService(db)
+    etag = make_etag(company_id, service.contracts_version(company_id))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    try:
+        return await service.get_company_contracts(
+            company_id,
+            sort=sort,
+            limit=limit,
+            cursor=cursor,
+            category=category.value if category else None,
+            renewal_within_days=renewal_within_days,
+            min_value=min_value
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/company/{company_id}/import")
+async def import_contracts(
+    company_id: str,
+    file: UploadFile = File(...),
+    batch_size: Optional[int] = Query(None, ge=1, le=1000),
+    db: Database = Depends(get_db)
+):
+    """
+    Import contracts from a CSV or XLSX file.
+    The response streams NDJSON: an error line for each rejected contract, a
+    progress line after each written batch and a final progress line with
+    done set.
+    """
+    importer = ContractImporter(
+        ContractService(db),
+        company_id,
+        batch_size or get_settings().import_batch_size
+    )
     try:
-        return await service.get_company_contracts(company_id)
+        rows = await asyncio.to_thread(open_import_rows, file)
+        await importer.prepare()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def lines():
+        async for event in importer.run(rows):
+            yield event.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.post("", response_model=ContractResponse)
 async def create_contract(
     contract: ContractCreate,
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Create a new contract with services"""
     service = ContractService(db)
@@ -35,13 +120,15 @@ async def create_contract(
         return await service.create_contract(contract)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{contract_id}", response_model=ContractResponse)
 async def get_contract(
     contract_id: str,
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Get a contract by ID"""
     service = ContractService(db)
@@ -52,6 +139,8 @@ async def get_contract(
         return contract
     except HTTPException:
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -60,7 +149,7 @@ async def update_contract(
     contract_id: str,
     contract_update: ContractUpdate,
     company_id: str,  # We'll get this from auth in future
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Update a contract and its services"""
     service = ContractService(db)
@@ -71,6 +160,8 @@ async def update_contract(
         return updated
     except HTTPException:
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,7 +169,7 @@ async def update_contract(
 async def delete_contract(
     contract_id: str,
     company_id: str,  # We'll get this from auth in future
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db)
 ):
     """Delete a contract"""
     service = ContractService(db)
@@ -89,6 +180,8 @@ async def delete_contract(
         return {"message": "Contract deleted successfully"}
     except HTTPException:
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -96,61 +189,218 @@ async def delete_contract(
 @router.post("/process")
 async def process_contract_file(
     file: UploadFile = File(...),
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db),
+    queue: ExtractionJobQueue = Depends(get_extraction_queue)
 ):
-    """Process a contract file and extract information"""
-    processor = ContractProcessor()
-    
+    """
+    Process a contract file and extract information.
+    The extraction runs as a job on the extraction workers and the response
+    waits for it; POST /jobs returns the job without waiting instead.
+    """
     try:
         # Extract data from contract
-        extracted_data = await processor.process_contract(file)
+        content = await file.read()
+        extracted_data = await queue.run(content, file.filename)
         
         return {
             "message": "Contract processed successfully",
             "data": extracted_data
         }
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing contract: {str(e)}"
         )
+    finally:
+        await file.close()
+
+@router.post("/process/stream")
+async def stream_contract_file_processing(file: UploadFile = File(...)):
+    """
+    Process a contract file, streaming Server-Sent Events as fields become known.
+    A "field" event carries one validated field, a "service" event one
+    element of services, and the final "result" event the complete
+    ContractExtraction. Failures end the stream with an "error" event.
+    """
+    processor = get_contract_processor()
+    content = await file.read()
+
+    async def events():
+        try:
+            async for event in processor.extract_stream(content):
+                data = event.model_dump(mode="json", exclude={"event"})
+                payload = json.dumps({name: value for name, value in data.items() if value is not None})
+                yield f"event: {event.event}\ndata: {payload}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error processing contract: {e}'})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/process/batch")
+async def process_contract_files(
+    files: List[UploadFile] = File(...),
+    concurrency: Optional[int] = Query(None, ge=1, le=32)
+):
+    """
+    Extract information from many contract files.
+    The response streams NDJSON with one ExtractionResult per file, in the
+    order the files finish; index refers to the file's position in the request.
+    """
+    settings = get_settings()
+    if len(files) > settings.extraction_batch_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.extraction_batch_max_files} files can be processed at once"
+        )
+
+    results = extract_files(
+        get_contract_processor(),
+        files,
+        concurrency or settings.extraction_batch_concurrency
+    )
+
+    async def lines():
+        async for result in results:
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/process/cache")
+async def get_extraction_cache_stats(
+    cache: ExtractionCache = Depends(get_extraction_cache)
+):
+    """Get hit, miss and size counters of the extraction cache"""
+    return await asyncio.to_thread(cache.stats)
+
+@router.post("/jobs", response_model=ExtractionJob, status_code=202)
+async def submit_extraction_job(
+    file: UploadFile = File(...),
+    queue: ExtractionJobQueue = Depends(get_extraction_queue)
+):
+    """Queue a contract file for extraction and return the job immediately"""
+    try:
+        content = await file.read()
+        return await queue.submit(content, file.filename)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await file.close()
+
+@router.get("/jobs/{job_id}", response_model=ExtractionJob)
+async def get_extraction_job(
+    job_id: str,
+    queue: ExtractionJobQueue = Depends(get_extraction_queue)
+):
+    """Get the status of an extraction job"""
+    job = await queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/result", response_model=ContractExtraction)
+async def get_extraction_job_result(
+    job_id: str,
+    queue: ExtractionJobQueue = Depends(get_extraction_queue)
+):
+    """Get the extracted contract data of a finished job"""
+    job = await queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == JobStatus.FAILED:
+        raise HTTPException(status_code=422, detail=f"Extraction failed: {job.error}")
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status.value}")
+    return job.result
 
 @router.post("/{contract_id}/upload")
 async def upload_contract_file(
     contract_id: str,
     company_id: str,
     file: UploadFile = File(...),
-    db: Client = Depends(get_db)
+    db: Database = Depends(get_db),
+    queue: ExtractionJobQueue = Depends(get_extraction_queue)
 ):
-    """Upload and process a contract file"""
+    """
+    Upload and process a contract file.
+    The upload is read once into a spooled buffer while it is hashed; the
+    extraction (a job on the extraction workers) and the storage upload
+    then run concurrently from that buffer.
+    If either fails the other is cancelled, and a stored file that no
+    contract ends up pointing at is deleted again.
+    """
     storage_service = StorageService(db)
     contract_service = ContractService(db)
-    processor = ContractProcessor()
-    
+    settings = get_settings()
+
+    if file.content_type != 'application/pdf':
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    # Check the contract before spending an extraction and an upload on it
     try:
-        # First process the contract
-        extracted_data = await processor.process_contract(file)
-        
-        # Reset file position for upload
-        await file.seek(0)
-        
-        # Upload file
-        file_path, file_url = await storage_service.upload_contract_file(
+        contract = await contract_service.get_contract(contract_id)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not contract or contract.company_id != company_id:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    
+    upload = await SpooledUpload.from_upload(
+        file,
+        chunk_size=storage_service.chunk_size,
+        max_memory=settings.upload_spool_max_bytes
+    )
+    stored_path: Optional[str] = None
+
+    async def store() -> Tuple[str, str]:
+        nonlocal stored_path
+        file_path, file_url = await storage_service.upload_contract_stream(
             company_id,
             contract_id,
-            file
+            upload.filename,
+            upload.content_type,
+            upload.iter_chunks(storage_service.chunk_size)
         )
-        
+        stored_path = file_path
+        return file_path, file_url
+
+    try:
+        # A large spool is on disk; read it before the upload starts seeking it
+        content = await asyncio.to_thread(upload.read_bytes)
+        try:
+            async with asyncio.TaskGroup() as group:
+                extraction = group.create_task(queue.run(content, upload.filename, digest=upload.sha256))
+                storing = group.create_task(store())
+        except ExceptionGroup as errors:
+            # The other task was cancelled; report the failure itself
+            raise errors.exceptions[0]
+
+        extracted_data = extraction.result()
+        file_path, file_url = storing.result()
+
         # Update contract with file information
-        update = ContractUpdate(
-            contract_file_url=file_url,
-            contract_file_path=file_path  # Add this field to ContractUpdate model
-        )
-        updated_contract = await contract_service.update_contract(
+        updated_contract = await contract_service.set_contract_file(
             contract_id,
             company_id,
-            update
+            file_path,
+            file_url
         )
+        if not updated_contract:
+            raise HTTPException(status_code=404, detail="Contract not found")
+        stored_path = None
 
         return {
             "message": "Contract uploaded and processed successfully",
@@ -158,18 +408,30 @@ async def upload_contract_file(
             "contract": updated_contract
         }
 
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Both tasks have finished here, so nothing reads the buffer any more
+        if stored_path is not None:
+            await storage_service.discard_contract_file(stored_path)
+        upload.close()
 
 @router.get("/{contract_id}/download")
 async def download_contract_file(
     contract_id: str,
     company_id: str,
-    db: Client = Depends(get_db)
+    range: Optional[str] = Header(None),
+    db: Database = Depends(get_db)
 ):
-    """Download a contract file"""
+    """Download a contract file, honouring HTTP Range requests"""
     storage_service = StorageService(db)
     contract_service = ContractService(db)
     
@@ -182,61 +444,33 @@ async def download_contract_file(
         if not contract.contract_file_path:
             raise HTTPException(status_code=404, detail="No file associated with this contract")
         
-        # Download file
-        file_data = await storage_service.download_contract_file(contract.contract_file_path)
-        if not file_data:
+        # Open a streaming download; nothing is buffered beyond one chunk
+        upstream = await storage_service.open_contract_file(
+            contract.contract_file_path,
+            byte_range=range
+        )
+        if upstream is None:
             raise HTTPException(status_code=404, detail="File not found in storage")
+
+        headers = {
+            name: upstream.headers[name]
+            for name in ("content-length", "content-range", "accept-ranges", "etag", "last-modified")
+            if name in upstream.headers
+        }
+        headers.setdefault("accept-ranges", "bytes")
+        headers["Content-Disposition"] = f'attachment; filename="contract_{contract_id}.pdf"'
         
         return StreamingResponse(
-            io.BytesIO(file_data),
+            storage_service.iter_download(upstream),
+            status_code=upstream.status_code,
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="contract_{contract_id}.pdf"'
-            }
+            headers=headers,
+            background=BackgroundTask(upstream.aclose)
         )
 
     except HTTPException:
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    """Upload a contract file"""
-    storage_service = StorageService(db)
-    contract_service = ContractService(db)
-    
-    try:
-        # Verify contract exists and belongs to company
-        contract = await contract_service.get_contract(contract_id)
-        if not contract or contract.company_id != company_id:
-            raise HTTPException(status_code=404, detail="Contract not found")
-
-        # Upload file
-        file_url = await storage_service.upload_contract_file(
-            company_id,
-            contract_id,
-            file
-        )
-        
-        if not file_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to upload file"
-            )
-
-        # Update contract with file URL
-        update = ContractUpdate(contract_file_url=file_url)
-        updated_contract = await contract_service.update_contract(
-            contract_id,
-            company_id,
-            update
-        )
-
-        return {
-            "message": "File uploaded successfully",
-            "file_url": file_url,
-            "contract": updated_contract
-        }
-
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,58 @@
+from typing import Dict, List
+from ..database import Database
+from ..models.analytics import SpendAnalytics, SpendBucket
+
+class AnalyticsService:
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def get_company_spend(self, company_id: str) -> SpendAnalytics:
+        """
+        Get a company's spend breakdown.
+        Reads the company_spend_aggregates rows that database triggers keep
+        up to date, so the cost does not depend on the number of contracts.
+        """
+        try:
+            query = self.db.table('company_spend_aggregates')\
+                .select('dimension, bucket, total_value, item_count, license_count')\
+                .eq('company_id', company_id)
+            response = await self.db.execute(query)
+
+            buckets: Dict[str, List[SpendBucket]] = {}
+            for row in response.data:
+                buckets.setdefault(row['dimension'], []).append(SpendBucket(
+                    key=row['bucket'],
+                    total_value=row['total_value'],
+                    count=row['item_count'],
+                    license_count=row['license_count']
+                ))
+
+            totals = {bucket.key: bucket for bucket in buckets.get('total', [])}
+            contracts = totals.get('contracts')
+            services = totals.get('services')
+
+            return SpendAnalytics(
+                company_id=company_id,
+                total_value=contracts.total_value if contracts else 0,
+                contract_count=contracts.count if contracts else 0,
+                service_total_cost=services.total_value if services else 0,
+                service_count=services.count if services else 0,
+                license_count=services.license_count if services else 0,
+                by_category=sorted(
+                    buckets.get('category', []),
+                    key=lambda bucket: bucket.total_value,
+                    reverse=True
+                ),
+                by_license_type=sorted(
+                    buckets.get('license_type', []),
+                    key=lambda bucket: bucket.total_value,
+                    reverse=True
+                ),
+                by_renewal_month=sorted(
+                    buckets.get('renewal_month', []),
+                    key=lambda bucket: bucket.key
+                )
+            )
+        except Exception as e:
+            print(f"Error getting company spend: {e}")
+            raise
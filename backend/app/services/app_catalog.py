@@ -0,0 +1,202 @@
+import asyncio
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from ..config import get_settings
+from ..database import Database
+from ..models.app import AppResponse
+
+# Substrings up to this length are indexed directly; longer search terms are
+# answered by intersecting their trigram postings
+MAX_GRAM = 3
+
+# Minimum trigram similarity for a fuzzy candidate, the pg_trgm default
+SIMILARITY_THRESHOLD = 0.3
+
+# Rows per request when loading the catalog; PostgREST's max-rows silently
+# truncates larger responses
+PAGE_SIZE = 1000
+
+def _grams(text: str, n: int) -> Set[str]:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def name_key(name: str) -> str:
+    """Exact-match key: case, spacing and punctuation are ignored"""
+    return re.sub(r'[\W_]+', '', name.casefold())
+
+def _trigrams(name: str) -> Set[str]:
+    # Words padded like pg_trgm, so word starts weigh more than middles
+    trigrams = set()
+    for word in re.findall(r'[^\W_]+', name.casefold()):
+        trigrams |= _grams(f"  {word} ", 3)
+    return trigrams
+
+class CatalogSnapshot:
+    """
+    Immutable, indexed view of the apps table.
+    Apps are kept sorted by name; the n-gram and category indexes map to
+    positions in that list, so results come back in name order.
+    """
+
+    def __init__(self, apps: List[AppResponse], version: str):
+        self.version = version
+        self.apps = sorted(apps, key=lambda app: app.name.lower())
+        self.by_id: Dict[str, AppResponse] = {app.id: app for app in self.apps}
+        self._names = [app.name.lower() for app in self.apps]
+        self._by_category: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._by_key: Dict[str, int] = {}
+        self._trigrams: List[Set[str]] = []
+        self._by_trigram: Dict[str, List[int]] = {}
+
+        for position, (app, name) in enumerate(zip(self.apps, self._names)):
+            self._by_category.setdefault(app.category.value, set()).add(position)
+            for n in range(1, MAX_GRAM + 1):
+                for gram in _grams(name, n):
+                    self._grams.setdefault(gram, set()).add(position)
+
+            self._by_key.setdefault(name_key(app.name), position)
+            trigrams = _trigrams(app.name)
+            self._trigrams.append(trigrams)
+            for trigram in trigrams:
+                self._by_trigram.setdefault(trigram, []).append(position)
+
+    def _matching(self, term: str) -> Set[int]:
+        if len(term) <= MAX_GRAM:
+            return self._grams.get(term, set())
+
+        postings = sorted(
+            (self._grams.get(gram, set()) for gram in _grams(term, MAX_GRAM)),
+            key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        # Trigram hits can be scattered through the name; confirm the substring
+        return {position for position in candidates if term in self._names[position]}
+
+    def search(
+        self,
+        search: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[AppResponse]:
+        """Case-insensitive substring search, the same matches as ilike '%term%'"""
+        positions: Optional[Set[int]] = None
+
+        if category:
+            positions = self._by_category.get(category, set())
+
+        term = search.strip().lower() if search else ""
+        if term:
+            matches = self._matching(term)
+            positions = matches if positions is None else positions & matches
+
+        if positions is None:
+            return list(self.apps)
+        return [self.apps[position] for position in sorted(positions)]
+
+    def find(self, name: str) -> Optional[AppResponse]:
+        """Exact match on the normalized name"""
+        key = name_key(name)
+        position = self._by_key.get(key) if key else None
+        return self.apps[position] if position is not None else None
+
+    def similar(self, name: str, limit: int) -> List[Tuple[AppResponse, float, bool]]:
+        """
+        Rank apps by trigram similarity to name, as (app, score, partial).
+        Candidates come from the trigram postings, so only apps sharing a
+        trigram with name are scored. Apps whose name contains name are
+        always included and flagged as partial matches, like the client's
+        includes() fallback.
+        """
+        trigrams = _trigrams(name)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._by_trigram.get(trigram, ()))
+
+        term = name.strip().lower()
+        partial = self._matching(term) if term else set()
+
+        ranked = []
+        for position in shared.keys() | partial:
+            common = shared.get(position, 0)
+            score = common / (len(trigrams) + len(self._trigrams[position]) - common) if common else 0.0
+            if score >= SIMILARITY_THRESHOLD or position in partial:
+                ranked.append((self.apps[position], round(score, 4), position in partial))
+
+        ranked.sort(key=lambda match: (-match[1], match[0].name.lower()))
+        return ranked[:limit]
+
+class AppCatalog:
+    """
+    Process-local cache of the app catalog.
+    The snapshot is rebuilt when invalidate() is called after a write, or
+    when the table's version stamp (row count and latest updated_at) changes.
+    The stamp is re-checked at most once per refresh interval. A load that
+    was already running when invalidate() was called is discarded.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+
+    async def _version(self, db: Database) -> str:
+        query = db.table('apps')\
+            .select('updated_at', count='exact')\
+            .order('updated_at', desc=True)\
+            .limit(1)
+        response = await db.execute(query)
+        latest = response.data[0]['updated_at'] if response.data else None
+        return f"{response.count}:{latest}"
+
+    async def _load(self, db: Database, version: str) -> CatalogSnapshot:
+        rows = []
+        while True:
+            query = db.table('apps')\
+                .select('*')\
+                .order('id')\
+                .range(len(rows), len(rows) + PAGE_SIZE - 1)
+            response = await db.execute(query)
+            rows.extend(response.data)
+            if len(response.data) < PAGE_SIZE:
+                break
+        return CatalogSnapshot([AppResponse(**app) for app in rows], version)
+
+    async def snapshot(self, db: Database) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return snapshot
+
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return snapshot
+
+            while True:
+                generation = self._generation
+                version = await self._version(db)
+                if snapshot is None or snapshot.version != version:
+                    snapshot = await self._load(db, version)
+                if generation == self._generation:
+                    self._snapshot = snapshot
+                    self._checked_at = time.monotonic()
+                    return snapshot
+                # A write invalidated the catalog while it was loading
+                snapshot = None
+
+@lru_cache()
+def get_app_catalog() -> AppCatalog:
+    """Get the process-wide app catalog cache"""
+    return AppCatalog(get_settings().app_catalog_refresh_seconds)
@@ -1,11 +1,67 @@
-from typing import List, Optional
-from supabase import Client
-from ..models.app import AppCreate, AppResponse, AppCategory, CompanyAppCreate
+import asyncio
+from typing import Dict, Iterator, List, Optional
+from ..database import Database
+from ..config import get_settings
+from ..models.app import (
+    AppCreate,
+    AppResponse,
+    AppCategory,
+    AppCandidate,
+    AppResolution,
+    BulkAppSelection,
+    BulkItemResult,
+    BulkItemStatus,
+    CompanyAppCreate,
+    ResolutionStatus
+)
+from .app_catalog import CatalogSnapshot, get_app_catalog, name_key
+from .resource_versions import get_resource_versions
+
+def _resolve(snapshot: CatalogSnapshot, names: List[str], limit: int) -> List[AppResolution]:
+    results = []
+    # Pasted lists repeat names; each distinct normalized name is resolved once
+    resolved: Dict[str, AppResolution] = {}
+    for raw in names:
+        name = raw.strip()
+        key = name_key(name)
+        if key not in resolved:
+            match = snapshot.find(name)
+            if match:
+                resolution = AppResolution(name=name, status=ResolutionStatus.MATCHED, match=match)
+            else:
+                candidates = [
+                    AppCandidate(app=app, score=score, partial=partial)
+                    for app, score, partial in snapshot.similar(name, limit)
+                ]
+                if candidates:
+                    resolution = AppResolution(name=name, status=ResolutionStatus.SUGGESTED, candidates=candidates)
+                else:
+                    resolution = AppResolution(name=name, status=ResolutionStatus.NEW, category=AppCategory.CSV)
+            resolved[key] = resolution
+        results.append(resolved[key].model_copy(update={'name': name}))
+    return results
+
+def _chunks(items: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 class AppService:
-    def __init__(self, db: Client):
+    def __init__(self, db: Database):
         self.db = db
 
+    async def catalog_version(self) -> str:
+        """Version of the app catalog; changes whenever the apps table does"""
+        snapshot = await get_app_catalog().snapshot(self.db)
+        return snapshot.version
+
+    async def company_apps_version(self, company_id: str) -> str:
+        """Version of a company's selected apps, including the catalog rows they embed"""
+        selection = get_resource_versions().current(('company_apps', company_id))
+        return f"{selection}:{await self.catalog_version()}"
+
+    def _selection_changed(self, company_id: str):
+        get_resource_versions().bump(('company_apps', company_id))
+
     async def get_all_apps(
         self, 
         category: Optional[str] = None,
@@ -13,28 +69,37 @@ class AppService:
     ) -> List[AppResponse]:
         """Get all available apps with optional filtering"""
         try:
-            query = self.db.table('apps').select('*')
-            print(category)
-            
-            if category:
-                query = query.eq('category', category)
-            
-            if search:
-                query = query.ilike('name', f'%{search}%')
-            
-            response = query.execute()
-            return [AppResponse(**app) for app in response.data]
+            # Served from the in-memory catalog; the table is only read when
+            # the catalog changes
+            snapshot = await get_app_catalog().snapshot(self.db)
+            return snapshot.search(search, category)
         except Exception as e:
             print(f"Error getting apps: {e}")
             raise
 
+    async def resolve_apps(self, names: List[str], limit: int = 5) -> List[AppResolution]:
+        """
+        Resolve raw app names against the catalog.
+        Exact matches come from the normalized-name map; everything else is
+        ranked by trigram similarity. Names with no candidates are flagged as
+        new CSV Uploads apps.
+        """
+        try:
+            names = [name for name in names if name.strip()]
+            snapshot = await get_app_catalog().snapshot(self.db)
+            # Matching is CPU-bound; keep long lists off the event loop
+            return await asyncio.to_thread(_resolve, snapshot, names, limit)
+        except Exception as e:
+            print(f"Error resolving apps: {e}")
+            raise
+
     async def get_company_apps(self, company_id: str) -> List[AppResponse]:
         """Get all apps selected by a company"""
         try:
-            response = self.db.table('company_apps')\
+            query = self.db.table('company_apps')\
                 .select('apps!inner(*)')\
-                .eq('company_id', company_id)\
-                .execute()
+                .eq('company_id', company_id)
+            response = await self.db.execute(query)
             
             return [AppResponse(**app['apps']) for app in response.data]
         except Exception as e:
@@ -44,25 +109,107 @@ class AppService:
     async def select_app(self, app_selection: CompanyAppCreate) -> bool:
         """Select an app for a company"""
         try:
-            response = self.db.table('company_apps')\
-                .insert(app_selection.model_dump())\
-                .execute()
+            query = self.db.table('company_apps')\
+                .insert(app_selection.model_dump())
+            response = await self.db.execute(query)
             
+            self._selection_changed(app_selection.company_id)
             return bool(response.data)
         except Exception as e:
             print(f"Error selecting app: {e}")
             raise
 
+    async def select_apps(self, selection: BulkAppSelection) -> List[BulkItemResult]:
+        """
+        Select many apps for a company.
+        Unknown app ids are rejected up front against the catalog; the rest
+        are written with one upsert per chunk, which skips existing rows.
+        """
+        app_ids = list(dict.fromkeys(selection.app_ids))
+        results: Dict[str, BulkItemResult] = {}
+
+        snapshot = await get_app_catalog().snapshot(self.db)
+        known = []
+        for app_id in app_ids:
+            if app_id in snapshot.by_id:
+                known.append(app_id)
+            else:
+                results[app_id] = BulkItemResult(app_id=app_id, status=BulkItemStatus.NOT_FOUND)
+
+        for chunk in _chunks(known, get_settings().bulk_chunk_size):
+            rows = [
+                {"company_id": selection.company_id, "app_id": app_id}
+                for app_id in chunk
+            ]
+            try:
+                query = self.db.table('company_apps')\
+                    .upsert(rows, on_conflict='company_id,app_id', ignore_duplicates=True)
+                response = await self.db.execute(query)
+            except Exception as e:
+                print(f"Error selecting apps: {e}")
+                for app_id in chunk:
+                    results[app_id] = BulkItemResult(
+                        app_id=app_id,
+                        status=BulkItemStatus.FAILED,
+                        error=str(e)
+                    )
+                continue
+
+            # Only newly inserted rows are returned when duplicates are ignored
+            inserted = {row['app_id'] for row in response.data}
+            for app_id in chunk:
+                status = BulkItemStatus.SELECTED if app_id in inserted \
+                    else BulkItemStatus.ALREADY_SELECTED
+                results[app_id] = BulkItemResult(app_id=app_id, status=status)
+
+        self._selection_changed(selection.company_id)
+        return [results[app_id] for app_id in app_ids]
+
+    async def unselect_apps(self, selection: BulkAppSelection) -> List[BulkItemResult]:
+        """
+        Remove many app selections for a company with one delete per chunk.
+        The ids go into the query string, so chunks are smaller than for upserts.
+        """
+        app_ids = list(dict.fromkeys(selection.app_ids))
+        results: Dict[str, BulkItemResult] = {}
+
+        for chunk in _chunks(app_ids, get_settings().bulk_filter_chunk_size):
+            try:
+                query = self.db.table('company_apps')\
+                    .delete()\
+                    .eq('company_id', selection.company_id)\
+                    .in_('app_id', chunk)
+                response = await self.db.execute(query)
+            except Exception as e:
+                print(f"Error unselecting apps: {e}")
+                for app_id in chunk:
+                    results[app_id] = BulkItemResult(
+                        app_id=app_id,
+                        status=BulkItemStatus.FAILED,
+                        error=str(e)
+                    )
+                continue
+
+            deleted = {row['app_id'] for row in response.data}
+            for app_id in chunk:
+                status = BulkItemStatus.UNSELECTED if app_id in deleted \
+                    else BulkItemStatus.NOT_SELECTED
+                results[app_id] = BulkItemResult(app_id=app_id, status=status)
+
+        self._selection_changed(selection.company_id)
+        return [results[app_id] for app_id in app_ids]
+
     async def create_app(self, app: AppCreate) -> AppResponse:
         """Create a new app"""
         try:
-            response = self.db.table('apps')\
-                .insert(app.model_dump())\
-                .execute()
+            query = self.db.table('apps')\
+                .insert(app.model_dump())
+            response = await self.db.execute(query)
             
             if not response.data:
                 raise Exception("Failed to create app")
-                
+
+            get_app_catalog().invalidate()
             return AppResponse(**response.data[0])
         except Exception as e:
             print(f"Error creating app: {e}")
@@ -71,12 +218,13 @@ class AppService:
     async def unselect_app(self, company_id: str, app_id: str) -> bool:
         """Remove an app selection for a company"""
         try:
-            response = self.db.table('company_apps')\
+            query = self.db.table('company_apps')\
                 .delete()\
                 .eq('company_id', company_id)\
-                .eq('app_id', app_id)\
-                .execute()
+                .eq('app_id', app_id)
+            response = await self.db.execute(query)
             
+            self._selection_changed(company_id)
             return bool(response.data)
         except Exception as e:
             print(f"Error unselecting app: {e}")
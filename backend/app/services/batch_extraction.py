@@ -0,0 +1,51 @@
+import asyncio
+from typing import AsyncIterator, List
+from fastapi import UploadFile
+from ..models.job import ExtractionResult, JobStatus
+from .contract_processor import ContractProcessor
+
+async def extract_files(
+    processor: ContractProcessor,
+    files: List[UploadFile],
+    concurrency: int
+) -> AsyncIterator[ExtractionResult]:
+    """
+    Extract many contract files, at most `concurrency` at a time, yielding
+    each result as soon as its file is done rather than in request order.
+    A file is only read once its turn comes, so at most `concurrency`
+    documents are held in memory. Files still running when the consumer
+    stops iterating are cancelled.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def extract(index: int, file: UploadFile) -> ExtractionResult:
+        async with semaphore:
+            try:
+                if file.content_type != 'application/pdf':
+                    raise ValueError("Only PDF files are allowed")
+                extraction = await processor.extract(await file.read())
+                return ExtractionResult(
+                    index=index,
+                    filename=file.filename,
+                    status=JobStatus.SUCCEEDED,
+                    result=extraction.model_dump(mode="json")
+                )
+            except Exception as e:
+                print(f"Error extracting {file.filename}: {e}")
+                return ExtractionResult(
+                    index=index,
+                    filename=file.filename,
+                    status=JobStatus.FAILED,
+                    error=str(e)
+                )
+            finally:
+                await file.close()
+
+    tasks = [asyncio.create_task(extract(index, file)) for index, file in enumerate(files)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,31 @@
+from typing import Callable, List
+from ..models.reminder import ContractChange
+
+ContractListener = Callable[[ContractChange], None]
+
+class ContractEvents:
+    """
+    In-process notifications about contract writes.
+    ContractService publishes a ContractChange after every successful write
+    so caches and schedulers can update incrementally. Listeners run inline
+    and must be cheap; their errors are logged and never fail the write.
+    """
+
+    def __init__(self):
+        self._listeners: List[ContractListener] = []
+
+    def subscribe(self, listener: ContractListener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: ContractListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def publish(self, change: ContractChange):
+        for listener in list(self._listeners):
+            try:
+                listener(change)
+            except Exception as e:
+                print(f"Error in contract listener: {e}")
+
+contract_events = ContractEvents()
@@ -0,0 +1,260 @@
+"""
+Bulk import of contracts from CSV or XLSX files.
+
+The file has a header row and one row per service. Adjacent rows sharing a
+contract_ref form one contract; a row without contract_ref is a contract on
+its own. Contract columns are taken from the first row of a contract:
+
+    contract_ref, company_app_id or app_name, renewal_date, review_date,
+    overall_total_value, notes, contact_details, stitchflow_connection,
+    service_name, license_type, pricing_model, cost_per_user,
+    number_of_licenses, total_cost
+
+Rows of one contract_ref must be adjacent. Rows that come back to a
+contract_ref after another contract are rejected, as long as that ref is
+among the last SEEN_REFS_LIMIT refs; a ref seen earlier than that is not
+recognised and starts a new contract.
+
+Rows are read a batch at a time and only the most recent refs are kept, so
+memory use does not depend on the size of the file.
+"""
+import asyncio
+import csv
+import io
+import itertools
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple, Union
+from fastapi import UploadFile
+from pydantic import ValidationError
+from ..models.contract import ContractCreate, ImportProgress, ImportRowError
+from .app_catalog import get_app_catalog
+from .contract_service import ContractService
+
+CONTRACT_COLUMNS = (
+    'renewal_date',
+    'review_date',
+    'overall_total_value',
+    'notes',
+    'contact_details',
+    'stitchflow_connection'
+)
+
+# Import column -> ServiceCreate field
+SERVICE_COLUMNS = {
+    'service_name': 'name',
+    'license_type': 'license_type',
+    'pricing_model': 'pricing_model',
+    'cost_per_user': 'cost_per_user',
+    'number_of_licenses': 'number_of_licenses',
+    'total_cost': 'total_cost',
+}
+
+# contract_refs remembered for the adjacency check; the oldest are forgotten first
+SEEN_REFS_LIMIT = 10000
+
+ImportRow = Tuple[int, Dict[str, Any]]
+
+def _column(name: Any) -> str:
+    return str(name).strip().lower().replace(' ', '_') if name is not None else ''
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def _read_csv(file) -> Iterator[ImportRow]:
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = [_column(name) for name in next(reader, [])]
+    for number, values in enumerate(reader, start=2):
+        if any(value.strip() for value in values):
+            yield number, {name: _cell(value) for name, value in zip(header, values) if name}
+
+def _read_xlsx(file) -> Iterator[ImportRow]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import is not available on this server; upload a CSV file")
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise ValueError("Could not read the XLSX file")
+
+    def rows() -> Iterator[ImportRow]:
+        try:
+            values = workbook.active.iter_rows(values_only=True)
+            header = [_column(name) for name in next(values, ())]
+            for number, row in enumerate(values, start=2):
+                if any(value is not None and value != '' for value in row):
+                    yield number, {name: _cell(value) for name, value in zip(header, row) if name}
+        finally:
+            workbook.close()
+
+    return rows()
+
+def open_import_rows(file: UploadFile) -> Iterator[ImportRow]:
+    """Open an uploaded CSV or XLSX file as an iterator of (row number, row)"""
+    filename = (file.filename or '').lower()
+    if filename.endswith('.xlsx'):
+        return _read_xlsx(file.file)
+    if filename.endswith('.csv') or file.content_type in ('text/csv', 'application/vnd.ms-excel'):
+        return _read_csv(file.file)
+    raise ValueError("Only CSV and XLSX files can be imported")
+
+def _validation_errors(e: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in e.errors()
+    ]
+
+class ContractImporter:
+    """
+    Groups import rows into contracts, validates them with ContractCreate and
+    writes them in batches through ContractService.create_contracts.
+    A batch that fails as a whole is retried contract by contract, so one bad
+    row only rejects its own contract.
+    """
+
+    def __init__(self, service: ContractService, company_id: str, batch_size: int):
+        self.service = service
+        self.company_id = company_id
+        self.batch_size = batch_size
+        self.progress = ImportProgress()
+        self._app_ids: Set[str] = set()
+        self._app_names: Dict[str, str] = {}
+
+    async def prepare(self):
+        """Load the company's selected apps once for validating every row"""
+        query = self.service.db.table('company_apps')\
+            .select('app_id')\
+            .eq('company_id', self.company_id)
+        response = await self.service.db.execute(query)
+        self._app_ids = {row['app_id'] for row in response.data}
+
+        snapshot = await get_app_catalog().snapshot(self.service.db)
+        self._app_names = {
+            snapshot.by_id[app_id].name.lower(): app_id
+            for app_id in self._app_ids
+            if app_id in snapshot.by_id
+        }
+
+    def _app_id(self, row: Dict[str, Any]) -> str:
+        app_id = row.get('company_app_id')
+        if app_id is None:
+            name = row.get('app_name')
+            if name is None:
+                raise ValueError("company_app_id or app_name is required")
+            app_id = self._app_names.get(str(name).lower())
+            if app_id is None:
+                raise ValueError(f"App '{name}' is not selected by this company")
+        elif str(app_id) not in self._app_ids:
+            raise ValueError(f"App {app_id} is not selected by this company")
+        return str(app_id)
+
+    def _build(self, group: List[ImportRow]) -> ContractCreate:
+        _, first = group[0]
+        services = [
+            {field: row.get(column) for column, field in SERVICE_COLUMNS.items()}
+            for _, row in group
+            if any(row.get(column) is not None for column in SERVICE_COLUMNS)
+        ]
+        return ContractCreate(
+            company_id=self.company_id,
+            company_app_id=self._app_id(first),
+            services=services,
+            **{column: first[column] for column in CONTRACT_COLUMNS if first.get(column) is not None}
+        )
+
+    def _reject(self, group: List[ImportRow], errors: List[str]) -> ImportRowError:
+        self.progress.rows_failed += len(group)
+        return ImportRowError(row=group[0][0], errors=errors)
+
+    async def _write(
+        self,
+        batch: List[Tuple[List[ImportRow], ContractCreate]]
+    ) -> List[ImportRowError]:
+        try:
+            created = await self.service.create_contracts([contract for _, contract in batch])
+            self.progress.contracts_created += len(created)
+            return []
+        except Exception as e:
+            print(f"Error importing batch, retrying contracts one by one: {e}")
+
+        errors = []
+        for group, contract in batch:
+            try:
+                await self.service.create_contract(contract)
+                self.progress.contracts_created += 1
+            except Exception as e:
+                errors.append(self._reject(group, [str(e)]))
+        return errors
+
+    def _close_group(
+        self,
+        group: List[ImportRow],
+        batch: List[Tuple[List[ImportRow], ContractCreate]]
+    ) -> Optional[ImportRowError]:
+        try:
+            batch.append((group, self._build(group)))
+        except ValidationError as e:
+            return self._reject(group, _validation_errors(e))
+        except ValueError as e:
+            return self._reject(group, [str(e)])
+        return None
+
+    async def run(self, rows: Iterator[ImportRow]) -> AsyncIterator[Union[ImportRowError, ImportProgress]]:
+        """Import every row, yielding row errors and a progress report per batch"""
+        group: List[ImportRow] = []
+        group_ref = None
+        seen_refs: "OrderedDict[str, None]" = OrderedDict()
+        batch: List[Tuple[List[ImportRow], ContractCreate]] = []
+
+        while True:
+            # Parsing is blocking file IO, so each slice is read off the event loop
+            chunk = await asyncio.to_thread(list, itertools.islice(rows, self.batch_size))
+            for number, row in chunk:
+                self.progress.rows_read += 1
+                ref = row.get('contract_ref')
+                ref = str(ref) if ref is not None else None
+
+                if group and (ref is None or ref != group_ref):
+                    error = self._close_group(group, batch)
+                    if error:
+                        yield error
+                    group = []
+
+                if ref is not None and ref != group_ref and ref in seen_refs:
+                    yield self._reject([(number, row)], [f"Rows of contract_ref {ref} must be adjacent"])
+                    group_ref = None
+                    continue
+
+                if ref is not None and ref != group_ref:
+                    seen_refs[ref] = None
+                    if len(seen_refs) > SEEN_REFS_LIMIT:
+                        seen_refs.popitem(last=False)
+                group.append((number, row))
+                group_ref = ref
+
+                if len(batch) >= self.batch_size:
+                    for error in await self._write(batch):
+                        yield error
+                    batch = []
+                    yield self.progress.model_copy()
+
+            if not chunk:
+                break
+
+        if group:
+            error = self._close_group(group, batch)
+            if error:
+                yield error
+        if batch:
+            for error in await self._write(batch):
+                yield error
+
+        self.progress.done = True
+        yield self.progress.model_copy()
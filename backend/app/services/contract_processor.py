@@ -1,10 +1,31 @@
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-from openai import OpenAI
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import time
+from functools import lru_cache
+from openai import APIConnectionError, AsyncOpenAI
 from fastapi import UploadFile
 import base64
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from ..config import get_settings
 from ..models.contract import LicenseType, PricingModel
+from ..database import get_database
+from ..utils.json_stream import JsonEvent, JsonObjectScanner
+from ..utils.metrics import CONTRACT_EXTRACTIONS, record_llm_call
+from ..utils.resilience import CircuitBreaker, OutboundPolicy
+from .app_catalog import CatalogSnapshot, get_app_catalog
+from .contract_text import (
+    OPTIONAL_FIELDS,
+    PARSER_VERSION,
+    extract_pdf_pages,
+    has_text_layer,
+    missing_fields,
+    parse_contract_text,
+    select_pages
+)
+from .extraction_cache import ExtractionCache, get_extraction_cache
+from .rate_limiter import ProviderRateLimiter, get_llm_rate_limiter
 
 class ServiceExtraction(BaseModel):
     name: str
@@ -25,9 +46,78 @@ class ContractExtraction(BaseModel):
     contact_details: Optional[str]
     overall_total_cost: Optional[str]
 
+class ExtractionEvent(BaseModel):
+    """One step of a streamed extraction"""
+    # "field", "service" (one element of services) or "result"
+    event: str
+    field: Optional[str] = None
+    index: Optional[int] = None
+    value: Any = None
+
+_FIELD_ADAPTERS = {
+    name: TypeAdapter(info.annotation)
+    for name, info in ContractExtraction.model_fields.items()
+    if name != "services"
+}
+
+def _validate_event(found: JsonEvent) -> Optional[ExtractionEvent]:
+    """A streamed field or service as an event, or None while it is unusable"""
+    try:
+        if found.key == "services":
+            # Services are reported one by one rather than as the whole list
+            if found.index is None:
+                return None
+            service = ServiceExtraction.model_validate(found.value)
+            return ExtractionEvent(event="service", index=found.index, value=service.model_dump(mode="json"))
+        if found.index is not None or found.value is None:
+            return None
+        value = _FIELD_ADAPTERS[found.key].validate_python(found.value)
+        return ExtractionEvent(event="field", field=found.key, value=value)
+    except (KeyError, ValidationError):
+        return None
+
+def _field_events(fields: Dict[str, Any]) -> List[ExtractionEvent]:
+    """Events for known fields, in ContractExtraction field order"""
+    events = []
+    for name in ContractExtraction.model_fields:
+        value = fields.get(name)
+        if name == "services" and value:
+            events.extend(
+                _validate_event(JsonEvent(name, index, service)) for index, service in enumerate(value)
+            )
+        elif value is not None:
+            events.append(_validate_event(JsonEvent(name, None, value)))
+    return [event for event in events if event is not None]
+
+def _result_events(extraction: ContractExtraction) -> List[ExtractionEvent]:
+    fields = extraction.model_dump(mode="json")
+    return _field_events(fields) + [ExtractionEvent(event="result", value=extraction)]
+
+def _validate_result(fields: Dict[str, Any]) -> ContractExtraction:
+    return ContractExtraction.model_validate({**dict.fromkeys(OPTIONAL_FIELDS), **fields})
+
 class ContractProcessor:
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(
+        self,
+        cache: Optional[ExtractionCache] = None,
+        rate_limiter: Optional[ProviderRateLimiter] = None,
+        catalog: Optional[Callable[[], Awaitable[CatalogSnapshot]]] = None,
+        policy: Optional[OutboundPolicy] = None
+    ):
+        settings = get_settings()
+        # Retries are left to the policy, which also shares a circuit breaker across requests
+        self.client = AsyncOpenAI(timeout=settings.llm_timeout_seconds, max_retries=0)
+        self.policy = policy or OutboundPolicy("llm", timeout=settings.llm_timeout_seconds)
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        # Used to recognise the app by name in text PDFs
+        self.catalog = catalog
+        self.model = "gpt-4-vision-preview"
+        self.max_tokens = 4096
+        # Reserved against the token quota before a vision call; corrected with the real usage after
+        self.estimated_prompt_tokens = 2000
+        # Budget for the contract text sent when local parsing leaves fields missing
+        self.max_text_chars = 12000
         self.system_prompt = """You're a SaaS contract parser that will ingest the PDF and automatically extract the values for a set of fields. 
         These fields either have pre-defined options that you have to match the data with or open text/string format where you place the right details."""
         
@@ -52,49 +142,315 @@ class ContractProcessor:
 
         Return JSON only, no explanations."""
 
-    async def _encode_pdf(self, file: UploadFile) -> str:
+        self.text_prompt = self.user_prompt.replace("Return JSON only, no explanations.", "") + """
+        Some fields were already read from the contract: {known}
+        Only extract these fields: {fields}
+        Return a JSON object with exactly those keys, using the key names app_name, category,
+        services (each with name, license_type, pricing_model, cost_per_license, number_of_licenses,
+        total_cost), renewal_date, review_date, contract_url, notes, contact_details and
+        overall_total_cost. Use null for anything the contract does not state.
+        Return JSON only, no explanations.
+
+        Contract text:
+        {text}"""
+
+    @property
+    def cache_version(self) -> str:
+        """Changes whenever the model or prompts change, so stale results are never reused"""
+        fingerprint = "\0".join([self.model, self.system_prompt, self.user_prompt, self.text_prompt, PARSER_VERSION])
+        return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    async def close(self):
+        """Release the provider client's connection pool"""
+        await self.client.close()
+
+    def _encode_pdf(self, content: bytes) -> str:
         """Convert PDF to base64"""
-        content = await file.read()
         return base64.b64encode(content).decode('utf-8')
 
     async def process_contract(self, file: UploadFile) -> ContractExtraction:
-        """Process contract PDF and extract information"""
+        """Process an uploaded contract PDF and extract information"""
+        return await self.extract(await file.read())
+
+    async def _cache_key(self, content: bytes, digest: Optional[str]) -> str:
+        if digest is None:
+            digest = await asyncio.to_thread(ExtractionCache.digest, content)
+        return ExtractionCache.make_key(digest, self.cache_version)
+
+    async def extract(self, content: bytes, digest: Optional[str] = None) -> ContractExtraction:
+        """
+        Extract contract information from raw PDF bytes.
+        Results are served from the extraction cache when the same document
+        was already processed with the current prompt and model. Callers that
+        already hashed the bytes can pass the SHA-256 hex digest.
+        """
+        if self.cache is None:
+            return await self._extract(content)
+
+        # SQLite queries and commits block; keep them off the event loop
+        key = await self._cache_key(content, digest)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return ContractExtraction.model_validate(cached)
+
+        extracted_data = await self._extract(content)
+        await asyncio.to_thread(self.cache.set, key, extracted_data.model_dump(mode="json"))
+        return extracted_data
+
+    async def extract_stream(self, content: bytes, digest: Optional[str] = None) -> AsyncIterator[ExtractionEvent]:
+        """
+        Like extract(), but yields each field as soon as it is known and
+        validated, followed by the complete result.
+        """
+        key = None
+        if self.cache is not None:
+            key = await self._cache_key(content, digest)
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                for event in _result_events(ContractExtraction.model_validate(cached)):
+                    yield event
+                return
+
+        async for event in self._extract_events(content):
+            if event.event == "result" and key is not None:
+                await asyncio.to_thread(self.cache.set, key, event.value.model_dump(mode="json"))
+            yield event
+
+    async def _catalog(self) -> Optional[CatalogSnapshot]:
+        if self.catalog is None:
+            return None
         try:
-            # Encode PDF
-            base64_pdf = await self._encode_pdf(file)
-
-            # Call GPT-4 Vision
-            response = self.client.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": self.user_prompt
-                            },
-                            {
-                                "type": "image",
-                                "image_url": {
-                                    "url": f"data:application/pdf;base64,{base64_pdf}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=4096
+            return await self.catalog()
+        except Exception as e:
+            print(f"Error loading app catalog for extraction: {e}")
+            return None
+
+    async def _stream_completion(
+        self,
+        messages: List[dict],
+        estimated_prompt_tokens: int,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Stream the model's reply within the provider rate limits"""
+        estimated_tokens = estimated_prompt_tokens + max_tokens
+
+        async def open_stream():
+            # Every attempt, retried or hedged, reaches the provider and takes its own tokens
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(estimated_tokens)
+            request = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            # The deadline covers the provider call only, not the wait for rate limit tokens
+            if self.policy.timeout is None:
+                return await request
+            return await asyncio.wait_for(request, self.policy.timeout)
+
+        started = time.perf_counter()
+        usage = None
+        try:
+            # Only opening the stream is retried; a reply cut off midway fails the extraction
+            stream = await self.policy.call(open_stream, idempotent=True, deadline=False)
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            record_llm_call(
+                self.model,
+                time.perf_counter() - started,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
             )
+            if self.rate_limiter is not None and usage is not None:
+                self.rate_limiter.settle(estimated_tokens, prompt_tokens + completion_tokens)
+
+    async def _extract(self, content: bytes) -> ContractExtraction:
+        """Run the extraction pipeline and return its result"""
+        async for event in self._extract_events(content):
+            if event.event == "result":
+                return event.value
+        raise ValueError("Extraction finished without a result")
+
+    async def _extract_events(self, content: bytes) -> AsyncIterator[ExtractionEvent]:
+        """
+        Parse the PDF locally where it has a text layer and ask the model
+        only for the fields that could not be read, from the relevant pages
+        as text. Scanned PDFs are sent to the model whole.
+        Fields are yielded as soon as they are known and validated, local
+        ones first, then the model's as its reply streams in.
+        """
+        try:
+            pages = await asyncio.to_thread(extract_pdf_pages, content)
+            if not has_text_layer(pages):
+                CONTRACT_EXTRACTIONS.inc(method="vision")
+                messages, estimated_prompt_tokens, max_tokens = self._vision_request(content)
+                fields: Dict[str, Any] = {}
+                wanted = list(ContractExtraction.model_fields)
+            else:
+                # Matching every word window against the catalog is CPU-bound
+                fields = await asyncio.to_thread(parse_contract_text, pages, await self._catalog())
+                for event in _field_events(fields):
+                    yield event
+
+                missing = missing_fields(fields)
+                if not missing:
+                    CONTRACT_EXTRACTIONS.inc(method="text")
+                    yield ExtractionEvent(event="result", value=_validate_result(fields))
+                    return
 
-            # Parse response
-            result = response.choices[0].message.content
-            # Convert string response to ContractExtraction model
-            extracted_data = ContractExtraction.model_validate_json(result)
-            
-            return extracted_data
+                CONTRACT_EXTRACTIONS.inc(method="text+llm")
+                wanted = missing + [field for field in OPTIONAL_FIELDS if field not in fields]
+                messages, estimated_prompt_tokens, max_tokens = self._text_request(
+                    select_pages(pages, self.max_text_chars),
+                    fields,
+                    wanted
+                )
+
+            scanner = JsonObjectScanner()
+            reply = []
+            async for text in self._stream_completion(messages, estimated_prompt_tokens, max_tokens):
+                reply.append(text)
+                for found in scanner.feed(text):
+                    if found.key in wanted:
+                        event = _validate_event(found)
+                        if event is not None:
+                            yield event
+
+            result = "".join(reply)
+            extracted = json.loads(result[result.find("{"):result.rfind("}") + 1])
+            fields.update({field: extracted[field] for field in wanted if extracted.get(field) is not None})
+            yield ExtractionEvent(event="result", value=_validate_result(fields))
 
         except Exception as e:
             print(f"Error processing contract: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def _text_request(self, text: str, known: Dict[str, Any], wanted: List[str]) -> Tuple[List[dict], int, int]:
+        """Messages asking the model for the wanted fields only, given the contract text"""
+        prompt = self.text_prompt.format(
+            fields=", ".join(wanted),
+            known=json.dumps(known, default=str),
+            text=text
+        )
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        # Roughly four characters per token
+        return messages, len(prompt) // 4, self.max_tokens if "services" in wanted else 1024
+
+    def _vision_request(self, content: bytes) -> Tuple[List[dict], int, int]:
+        """Messages sending the whole PDF to the vision model"""
+        # Encode PDF
+        base64_pdf = self._encode_pdf(content)
+
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": self.user_prompt
+                    },
+                    {
+                        "type": "image",
+                        "image_url": {
+                            "url": f"data:application/pdf;base64,{base64_pdf}",
+                            "detail": "high"
+                        }
+                    }
+                ]
+            }
+        ]
+        return messages, self.estimated_prompt_tokens, self.max_tokens
+
+class StubContractProcessor(ContractProcessor):
+    """
+    Offline stand-in for ContractProcessor.
+    Returns a fixed extraction after an optional delay, so the extraction
+    pipeline can run in tests and local development without OpenAI.
+    """
+
+    def __init__(self, delay: float = 0.0, cache: Optional[ExtractionCache] = None):
+        self.delay = delay
+        self.cache = cache
+
+    @property
+    def cache_version(self) -> str:
+        return "stub"
+
+    async def close(self):
+        pass
+
+    async def _extract_events(self, content: bytes) -> AsyncIterator[ExtractionEvent]:
+        for event in _result_events(await self._extract(content)):
+            yield event
+
+    async def _extract(self, content: bytes) -> ContractExtraction:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return ContractExtraction(
+            app_name="Stub App",
+            category="Productivity & Collaboration",
+            services=[
+                ServiceExtraction(
+                    name="Standard",
+                    license_type=LicenseType.ANNUAL,
+                    pricing_model=PricingModel.FLAT,
+                    cost_per_license="10.00",
+                    number_of_licenses="10",
+                    total_cost="100.00"
+                )
+            ],
+            renewal_date=None,
+            review_date=None,
+            contract_url=None,
+            notes=f"Stub extraction of {len(content)} bytes",
+            contact_details=None,
+            overall_total_cost="100.00"
+        )
+
+@lru_cache()
+def get_llm_policy() -> OutboundPolicy:
+    """Get the process-wide policy for LLM calls"""
+    settings = get_settings()
+    return OutboundPolicy(
+        "llm",
+        timeout=settings.llm_timeout_seconds,
+        retries=settings.llm_retries,
+        backoff_seconds=1.0,
+        max_backoff_seconds=20.0,
+        breaker=CircuitBreaker("llm", settings.circuit_failure_threshold, settings.circuit_reset_seconds),
+        retryable=(APIConnectionError,)
+    )
+
+async def _catalog_snapshot() -> CatalogSnapshot:
+    return await get_app_catalog().snapshot(get_database())
+
+@lru_cache()
+def get_contract_processor() -> ContractProcessor:
+    """Get the process-wide extractor selected by the CONTRACT_EXTRACTOR setting"""
+    settings = get_settings()
+    cache = get_extraction_cache() if settings.extraction_cache_enabled else None
+    if settings.contract_extractor == "stub":
+        return StubContractProcessor(cache=cache)
+    return ContractProcessor(
+        cache=cache,
+        rate_limiter=get_llm_rate_limiter(),
+        catalog=_catalog_snapshot,
+        policy=get_llm_policy()
+    )
+
+async def close_contract_processor():
+    """Close the provider client if the extractor was ever created"""
+    if get_contract_processor.cache_info().currsize:
+        await get_contract_processor().close()
+        get_contract_processor.cache_clear()
@@ -1,105 +1,241 @@
-from typing import List, Optional
-from datetime import datetime
-from supabase import Client
+from typing import Any, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+import asyncio
+import base64
+import json
+import uuid
+from postgrest.exceptions import APIError
+from ..config import get_settings
+from ..database import Database
 from ..models.contract import (
     ContractCreate, 
+    ContractPage,
     ContractResponse, 
+    ContractSort,
     ContractUpdate
 )
+from ..models.reminder import ContractChange
+from .service_diff import diff_services
+from .contract_events import contract_events
+from .resource_versions import get_resource_versions
+
+# Embeds each contract's services through the services.contract_id foreign key
+CONTRACT_WITH_SERVICES = '*, services(*)'
+
+# SQLSTATEs for bad input to create_contract_with_services: the explicit
+# company_app check (invalid_parameter_value) and malformed UUIDs
+INVALID_INPUT_CODES = ('22023', '22P02')
+
+# Sort key -> (column, descending). Rows without a value always sort last and
+# ties are broken by id so the keyset order is total.
+SORT_COLUMNS = {
+    ContractSort.RENEWAL_PRIORITY: ('renewal_date', False),
+    ContractSort.REVIEW_DATE: ('review_date', False),
+    ContractSort.TOTAL_VALUE: ('overall_total_value', True),
+}
+
+def _encode_cursor(sort: ContractSort, value: Any, contract_id: str) -> str:
+    payload = json.dumps({"s": sort.value, "v": value, "id": contract_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _decode_cursor(cursor: str, sort: ContractSort) -> Tuple[Any, str]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value, contract_id = payload["v"], payload["id"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort.value:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, contract_id
+
+def _publish(contract: dict, deleted: bool = False):
+    contract_events.publish(ContractChange(
+        contract_id=contract['id'],
+        company_id=contract['company_id'],
+        renewal_date=contract.get('renewal_date'),
+        review_date=contract.get('review_date'),
+        updated_at=contract.get('updated_at'),
+        deleted=deleted
+    ))
 
 class ContractService:
-    def __init__(self, db: Client):
+    def __init__(self, db: Database):
         self.db = db
 
-    async def get_company_contracts(self, company_id: str) -> List[ContractResponse]:
-        """Get all contracts for a company"""
+    def contracts_version(self, company_id: str) -> str:
+        """
+        Version of a company's contract listing, bumped by every contract
+        write. The date is part of it because renewal_within_days is relative
+        to today.
+        """
+        return f"{get_resource_versions().current(('contracts', company_id))}:{date.today().isoformat()}"
+
+    async def get_company_contracts(
+        self,
+        company_id: str,
+        sort: ContractSort = ContractSort.RENEWAL_PRIORITY,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        category: Optional[str] = None,
+        renewal_within_days: Optional[int] = None,
+        min_value: Optional[float] = None
+    ) -> ContractPage:
+        """Get one keyset-paginated page of a company's contracts"""
         try:
-            # First get all contracts
-            contracts_response = self.db.table('contracts')\
-                .select('*')\
-                .eq('company_id', company_id)\
-                .execute()
-            
-            if not contracts_response.data:
-                return []
-
-            # For each contract, get its services
-            result = []
-            for contract in contracts_response.data:
-                services_response = self.db.table('services')\
-                    .select('*')\
-                    .eq('contract_id', contract['id'])\
-                    .execute()
-                
-                contract['services'] = services_response.data
-                result.append(ContractResponse(**contract))
-            
-            return result
+            column, descending = SORT_COLUMNS[sort]
+
+            # Contracts and their services come back in a single embedded
+            # select, so the round-trip count does not grow with the tenant
+            select = CONTRACT_WITH_SERVICES
+            if category:
+                select += ', apps!inner(category)'
+
+            query = self.db.table('contracts')\
+                .select(select)\
+                .eq('company_id', company_id)
+
+            if category:
+                query = query.eq('apps.category', category)
+
+            if renewal_within_days is not None:
+                today = date.today()
+                query = query.gte('renewal_date', today.isoformat())\
+                    .lte('renewal_date', (today + timedelta(days=renewal_within_days)).isoformat())
+
+            if min_value is not None:
+                query = query.gte('overall_total_value', min_value)
+
+            if cursor:
+                last_value, last_id = _decode_cursor(cursor, sort)
+                if last_value is None:
+                    # Already inside the trailing block of NULL sort values
+                    query = query.is_(column, 'null').gt('id', last_id)
+                else:
+                    op = 'lt' if descending else 'gt'
+                    query = query.or_(
+                        f"{column}.{op}.{last_value},"
+                        f"and({column}.eq.{last_value},id.gt.{last_id}),"
+                        f"{column}.is.null"
+                    )
+
+            # Fetch one extra row to learn whether another page exists
+            query = query.order(column, desc=descending, nullsfirst=False)\
+                .order('id')\
+                .limit(limit + 1)
+            response = await self.db.execute(query)
+
+            rows = response.data[:limit]
+            next_cursor = None
+            if len(response.data) > limit:
+                last = rows[-1]
+                next_cursor = _encode_cursor(sort, last[column], last['id'])
+
+            return ContractPage(
+                items=[ContractResponse(**contract) for contract in rows],
+                next_cursor=next_cursor
+            )
         except Exception as e:
             print(f"Error getting company contracts: {e}")
             raise
 
     async def create_contract(self, contract: ContractCreate) -> ContractResponse:
-        """Create a new contract with services"""
+        """
+        Create a new contract with services.
+        Validation and both inserts happen inside the
+        create_contract_with_services database function, so this is a single
+        round trip and a failure never leaves an orphan contract behind.
+        """
         try:
-            # Verify company_app_id exists
-            company_app = self.db.table('company_apps')\
-                .select('*')\
-                .eq('company_id', contract.company_id)\
-                .execute()
+            query = self.db.rpc('create_contract_with_services', {
+                'p_contract': contract.model_dump(exclude={'services'}, mode='json'),
+                'p_services': [service.model_dump(mode='json') for service in contract.services]
+            })
+            response = await self.db.execute(query)
             
-            if not company_app.data:
-                raise ValueError("Invalid company_app_id")
-
-            # Create contract
-            contract_data = contract.model_dump(exclude={'services'})
-            contract_response = self.db.table('contracts')\
-                .insert(contract_data)\
-                .execute()
-            
-            if not contract_response.data:
+            if not response.data:
                 raise ValueError("Failed to create contract")
 
-            contract_id = contract_response.data[0]['id']
-            
-            # Create services
-            if contract.services:
-                services_data = [
-                    {**service.model_dump(), "contract_id": contract_id}
-                    for service in contract.services
-                ]
-                
-                self.db.table('services')\
-                    .insert(services_data)\
-                    .execute()
-
-            # Return complete contract
-            return await self.get_contract(contract_id)
+            created = ContractResponse(**response.data)
+            _publish(created.model_dump())
+            return created
+        except APIError as e:
+            print(f"Error creating contract: {e.message}")
+            if e.code in INVALID_INPUT_CODES:
+                raise ValueError(e.message)
+            raise
         except Exception as e:
             print(f"Error creating contract: {e}")
             raise
 
+    async def create_contracts(self, contracts: List[ContractCreate]) -> List[ContractResponse]:
+        """
+        Create many contracts with two bulk inserts, one for the contracts and
+        one for all of their services. Ids are generated here so services can
+        reference their contract without reading it back. If the services
+        insert fails the contracts are deleted again, so a batch is created
+        entirely or not at all.
+        """
+        if not contracts:
+            return []
+
+        contract_rows = []
+        service_rows = []
+        for contract in contracts:
+            contract_id = str(uuid.uuid4())
+            contract_rows.append({
+                'id': contract_id,
+                **contract.model_dump(exclude={'services'}, mode='json')
+            })
+            service_rows.extend(
+                {'contract_id': contract_id, **service.model_dump(mode='json')}
+                for service in contract.services
+            )
+
+        try:
+            query = self.db.table('contracts')\
+                .insert(contract_rows)
+            response = await self.db.execute(query)
+            created = {row['id']: {**row, 'services': []} for row in response.data}
+
+            if service_rows:
+                try:
+                    query = self.db.table('services')\
+                        .insert(service_rows)
+                    response = await self.db.execute(query)
+                except Exception:
+                    # Ids go in the query string, so the rollback is chunked
+                    ids = list(created)
+                    size = get_settings().bulk_filter_chunk_size
+                    for start in range(0, len(ids), size):
+                        query = self.db.table('contracts')\
+                            .delete()\
+                            .in_('id', ids[start:start + size])
+                        await self.db.execute(query)
+                    raise
+
+                for row in response.data:
+                    created[row['contract_id']]['services'].append(row)
+
+            results = [ContractResponse(**created[row['id']]) for row in contract_rows]
+            for contract in results:
+                _publish(contract.model_dump())
+            return results
+        except Exception as e:
+            print(f"Error creating contracts: {e}")
+            raise
+
     async def get_contract(self, contract_id: str) -> Optional[ContractResponse]:
         """Get a contract by ID with its services"""
         try:
-            contract_response = self.db.table('contracts')\
-                .select('*')\
-                .eq('id', contract_id)\
-                .execute()
-            
-            if not contract_response.data:
+            query = self.db.table('contracts')\
+                .select(CONTRACT_WITH_SERVICES)\
+                .eq('id', contract_id)
+            response = await self.db.execute(query)
+
+            if not response.data:
                 return None
 
-            contract = contract_response.data[0]
-            
-            # Get services
-            services_response = self.db.table('services')\
-                .select('*')\
-                .eq('contract_id', contract_id)\
-                .execute()
-            
-            contract['services'] = services_response.data
-            return ContractResponse(**contract)
+            return ContractResponse(**response.data[0])
         except Exception as e:
             print(f"Error getting contract: {e}")
             raise
@@ -110,57 +246,116 @@ class ContractService:
         company_id: str,
         contract_update: ContractUpdate
     ) -> Optional[ContractResponse]:
-        """Update a contract and its services"""
+        """
+        Update a contract and its services.
+        Services are diffed against the stored rows so only changed, new and
+        removed services are written. The independent writes run
+        concurrently, and the result is merged in memory instead of being
+        read back.
+        """
         try:
             # Verify contract belongs to company
             existing = await self.get_contract(contract_id)
             if not existing or existing.company_id != company_id:
                 return None
 
+            now = datetime.utcnow().isoformat()
+            writes = {}
+
             update_data = contract_update.model_dump(
                 exclude={'services'}, 
-                exclude_unset=True
+                exclude_unset=True,
+                mode='json'
             )
-            
             if update_data:
-                update_data['updated_at'] = datetime.utcnow()
-                self.db.table('contracts')\
+                update_data['updated_at'] = now
+                query = self.db.table('contracts')\
                     .update(update_data)\
-                    .eq('id', contract_id)\
-                    .execute()
+                    .eq('id', contract_id)
+                writes['contract'] = self.db.execute(query)
 
-            # Update services if provided
+            diff = None
             if contract_update.services is not None:
-                # Delete existing services
-                self.db.table('services')\
-                    .delete()\
-                    .eq('contract_id', contract_id)\
-                    .execute()
-                
-                # Create new services
-                if contract_update.services:
-                    services_data = [
-                        {**service.model_dump(), "contract_id": contract_id}
-                        for service in contract_update.services
-                    ]
-                    self.db.table('services')\
-                        .insert(services_data)\
-                        .execute()
-
-            return await self.get_contract(contract_id)
+                diff = diff_services(contract_id, existing.services, contract_update.services)
+                if diff.upserts:
+                    rows = [{**row, 'updated_at': now} for row in diff.upserts]
+                    query = self.db.table('services')\
+                        .upsert(rows, on_conflict='id')
+                    writes['upsert'] = self.db.execute(query)
+                if diff.deletes:
+                    query = self.db.table('services')\
+                        .delete()\
+                        .in_('id', diff.deletes)
+                    writes['delete'] = self.db.execute(query)
+
+            responses = dict(zip(writes, await asyncio.gather(*writes.values())))
+
+            # Merge what was written over what was read
+            contract = existing.model_dump(exclude={'services'})
+            if 'contract' in responses:
+                contract.update(responses['contract'].data[0] if responses['contract'].data else update_data)
+
+            services = {service.id: service.model_dump() for service in existing.services}
+            if 'upsert' in responses:
+                for row in responses['upsert'].data:
+                    services[row['id']] = {**services.get(row['id'], {}), **row}
+
+            if diff is not None:
+                contract['services'] = [services[service_id] for service_id in diff.order]
+            else:
+                contract['services'] = list(services.values())
+
+            updated = ContractResponse(**contract)
+            _publish(contract)
+            return updated
         except Exception as e:
             print(f"Error updating contract: {e}")
             raise
 
+    async def set_contract_file(
+        self,
+        contract_id: str,
+        company_id: str,
+        file_path: str,
+        file_url: str
+    ) -> Optional[ContractResponse]:
+        """
+        Point a contract at its uploaded file in a single round trip.
+        Returns the updated contract with its services, or None if the
+        contract does not exist or belongs to another company.
+        """
+        try:
+            query = self.db.table('contracts')\
+                .update({
+                    'contract_file_path': file_path,
+                    'contract_file_url': file_url,
+                    'updated_at': datetime.utcnow().isoformat()
+                })\
+                .eq('id', contract_id)\
+                .eq('company_id', company_id)\
+                .select(CONTRACT_WITH_SERVICES)
+            response = await self.db.execute(query)
+
+            if not response.data:
+                return None
+
+            _publish(response.data[0])
+            return ContractResponse(**response.data[0])
+        except Exception as e:
+            print(f"Error setting contract file: {e}")
+            raise
+
     async def delete_contract(self, contract_id: str, company_id: str) -> bool:
         """Delete a contract and its services"""
         try:
-            response = self.db.table('contracts')\
+            query = self.db.table('contracts')\
                 .delete()\
                 .eq('id', contract_id)\
-                .eq('company_id', company_id)\
-                .execute()
-            
+                .eq('company_id', company_id)
+            response = await self.db.execute(query)
+
+            for row in response.data:
+                _publish(row, deleted=True)
             return bool(response.data)
         except Exception as e:
             print(f"Error deleting contract: {e}")
@@ -0,0 +1,312 @@
+"""
+Local text extraction and deterministic parsing of contract PDFs.
+
+PDFs with a text layer are read with pypdf and scanned for the fields that
+follow fixed patterns: renewal and review dates, amounts, and line items
+whose quantity times unit price matches their total. The app is recognised
+by name from the app catalog. Whatever cannot be found this way is left
+for the LLM, which then only sees the most relevant pages as plain text.
+"""
+import calendar
+import io
+import re
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+from ..models.contract import LicenseType, PricingModel
+from .app_catalog import CatalogSnapshot, name_key
+
+# Bump when parsing changes, so cached extractions are not reused
+PARSER_VERSION = "2"
+
+# Average characters per page below which a PDF is treated as scanned
+MIN_TEXT_CHARS_PER_PAGE = 100
+
+# The product is named on the order form up front; later pages are terms
+APP_SEARCH_PAGES = 5
+
+# Fields a contract cannot be saved without; the rest are optional
+REQUIRED_FIELDS = ('app_name', 'category', 'services', 'renewal_date', 'overall_total_cost')
+OPTIONAL_FIELDS = ('review_date', 'contract_url', 'notes', 'contact_details')
+
+RELEVANT_TERMS = re.compile(
+    r'renew|expir|term\b|licen[cs]e|seat|subscription|users?\b|total|fee|price|pricing|'
+    r'cost|quantity|qty|amount|invoice|order form|plan\b|edition|notice',
+    re.IGNORECASE
+)
+
+_MONTHS = {
+    name.lower(): number
+    for number in range(1, 13)
+    for name in (calendar.month_name[number], calendar.month_abbr[number])
+}
+_MONTHS['sept'] = 9
+_MONTH_NAMES = '|'.join(sorted(_MONTHS, key=len, reverse=True))
+
+DATE_PATTERN = re.compile(
+    rf'(?P<iso>(?P<iy>\d{{4}})-(?P<im>\d{{1,2}})-(?P<id>\d{{1,2}}))'
+    rf'|(?P<num>(?P<n1>\d{{1,2}})[/.](?P<n2>\d{{1,2}})[/.](?P<ny>\d{{4}}))'
+    rf'|(?P<mdy>(?P<m1>{_MONTH_NAMES})\.?\s+(?P<d1>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<y1>\d{{4}}))'
+    rf'|(?P<dmy>(?P<d2>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<m2>{_MONTH_NAMES})\.?,?\s+(?P<y2>\d{{4}}))',
+    re.IGNORECASE
+)
+MONEY = r'(?:USD|EUR|GBP|[$€£])?[ \t]?(\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)'
+
+RENEWAL_LABEL = re.compile(
+    r'renewal date|renews? on|auto[- ]?renews?|expiration date|expiry date|expires? on|'
+    r'end date|term end(?:s|ing)?(?: on)?|subscription end',
+    re.IGNORECASE
+)
+REVIEW_LABEL = re.compile(
+    r'review date|notice date|notice deadline|cancel(?:lation)?(?: notice)? (?:by|deadline)',
+    re.IGNORECASE
+)
+NOTICE_DAYS = re.compile(r'(\d{1,3})\s*(?:calendar\s+)?days?[\'’]?\s*(?:prior\s+)?(?:written\s+)?notice', re.IGNORECASE)
+TOTAL_LABEL = re.compile(
+    rf'\b(grand total|total contract value|total (?:annual |contract )?(?:amount|cost|fees?|price|value)|total)'
+    rf'[ \t]*(?:\(\w+\))?[ \t]*[:\-]?[ \t]*{MONEY}',
+    re.IGNORECASE
+)
+LINE_ITEM = re.compile(
+    rf'^(?P<name>[A-Za-z][\w&/+().\- ]*?)\s+{MONEY}\s+{MONEY}\s+{MONEY}\s*$'
+)
+SEAT_COUNT = re.compile(r'(\d[\d,]*)\s+(?:named\s+)?(?:licen[cs]es|seats|users|subscriptions)\b', re.IGNORECASE)
+UNIT_PRICE = re.compile(
+    rf'{MONEY}\s*(?:/|per)\s*(?:user|seat|licen[cs]e)'
+    rf'|(?:price|cost|fee) per (?:user|seat|licen[cs]e)\s*[:\-]?\s*{MONEY}',
+    re.IGNORECASE
+)
+PLAN_NAME = re.compile(r'\b([A-Z][\w+]*(?:\s[A-Z][\w+]*)?)\s+(?:plan|edition|tier)\b')
+URL_PATTERN = re.compile(r'https?://[^\s<>"\')\]]+')
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+BILLING_TERMS = (
+    (LicenseType.MONTHLY, re.compile(r'\bmonthly\b|per month|/\s?mo(?:nth)?\b', re.IGNORECASE)),
+    (LicenseType.QUARTERLY, re.compile(r'\bquarterly\b|per quarter', re.IGNORECASE)),
+    (LicenseType.ANNUAL, re.compile(r'\bannual(?:ly)?\b|per year|/\s?y(?:ea)?r\b|\byearly\b|12 months', re.IGNORECASE)),
+)
+PRICING_TERMS = (
+    (PricingModel.TIERED, re.compile(r'\btier(?:ed)? pricing|volume tier', re.IGNORECASE)),
+    (PricingModel.PRORATED, re.compile(r'pro[- ]?rat', re.IGNORECASE)),
+    (PricingModel.FEATURE, re.compile(r'feature[- ]based', re.IGNORECASE)),
+)
+
+def extract_pdf_pages(content: bytes) -> List[str]:
+    """
+    Text of every page, or an empty list when the PDF cannot be read
+    locally (pypdf not installed, encrypted or malformed).
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return []
+
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        if reader.is_encrypted and not reader.decrypt(''):
+            return []
+        return [page.extract_text() or '' for page in reader.pages]
+    except Exception as e:
+        print(f"Error reading PDF text: {e}")
+        return []
+
+def has_text_layer(pages: List[str]) -> bool:
+    text_chars = sum(len(page.strip()) for page in pages)
+    return bool(pages) and text_chars / len(pages) >= MIN_TEXT_CHARS_PER_PAGE
+
+def select_pages(pages: List[str], max_chars: int) -> str:
+    """
+    The most relevant pages, in document order, within a character budget.
+    The first page is always kept since it names the parties and product.
+    """
+    cleaned = [re.sub(r'[ \t]+', ' ', re.sub(r'\n\s*\n+', '\n', page)).strip() for page in pages]
+    ranked = sorted(
+        range(len(cleaned)),
+        key=lambda index: (index != 0, -len(RELEVANT_TERMS.findall(cleaned[index])), index)
+    )
+
+    chosen, used = [], 0
+    for index in ranked:
+        if index != 0 and not RELEVANT_TERMS.search(cleaned[index]):
+            break
+        remaining = max_chars - used
+        if remaining <= 0:
+            break
+        chosen.append((index, cleaned[index][:remaining]))
+        used += len(chosen[-1][1])
+
+    return '\n\n'.join(f"[Page {index + 1}]\n{text}" for index, text in sorted(chosen))
+
+def _amount(value: str) -> Optional[Decimal]:
+    try:
+        return Decimal(value.replace(',', ''))
+    except InvalidOperation:
+        return None
+
+def _format_amount(value: Decimal) -> str:
+    return f"{value:.2f}"
+
+def _format_date(value: date) -> str:
+    # The format the extraction prompt asks the model for
+    return value.strftime('%d/%m/%Y')
+
+def _date(match: re.Match) -> Optional[date]:
+    try:
+        if match.group('iso'):
+            return date(int(match.group('iy')), int(match.group('im')), int(match.group('id')))
+        if match.group('mdy'):
+            return date(int(match.group('y1')), _MONTHS[match.group('m1').lower()], int(match.group('d1')))
+        if match.group('dmy'):
+            return date(int(match.group('y2')), _MONTHS[match.group('m2').lower()], int(match.group('d2')))
+
+        first, second, year = int(match.group('n1')), int(match.group('n2')), int(match.group('ny'))
+        # 03/04/2025 could be either order; leave it to the model rather than guess
+        if first > 12:
+            return date(year, second, first)
+        if second > 12:
+            return date(year, first, second)
+        return None
+    except ValueError:
+        return None
+
+def _date_after(label: re.Pattern, text: str, window: int = 120) -> Optional[date]:
+    for found in label.finditer(text):
+        match = DATE_PATTERN.search(text, found.end(), found.end() + window)
+        if match:
+            parsed = _date(match)
+            if parsed:
+                return parsed
+    return None
+
+def _months_before(value: date, months: int) -> date:
+    month = value.month - months
+    year = value.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+def _classify(text: str, terms: Tuple[Tuple[Any, re.Pattern], ...]) -> Optional[Any]:
+    """The term mentioned most often; earlier terms win ties"""
+    counts = [(len(pattern.findall(text)), -position, value) for position, (value, pattern) in enumerate(terms)]
+    count, _, value = max(counts)
+    return value if count else None
+
+def _line_items(text: str) -> List[Tuple[str, Decimal, Decimal, Decimal]]:
+    """Table rows of name, two numbers and a total where quantity x unit price = total"""
+    items = []
+    for line in text.splitlines():
+        match = LINE_ITEM.match(line.strip())
+        if not match:
+            continue
+        first, second, total = (_amount(value) for value in match.groups()[1:])
+        if None in (first, second, total) or not total:
+            continue
+        # Quantity and unit price appear in either order; the quantity is the whole number
+        for quantity, unit in ((first, second), (second, first)):
+            if quantity == quantity.to_integral_value() and abs(quantity * unit - total) <= Decimal('0.01') * quantity:
+                items.append((match.group('name').strip(), quantity, unit, total))
+                break
+    return items
+
+def _find_app(text: str, catalog: CatalogSnapshot) -> Optional[Tuple[str, str]]:
+    """
+    The catalog app named most often in the text. A name must appear twice,
+    or once near the top of the document, to count.
+    """
+    words = re.findall(r"[\w.&+'-]+", text)
+    head = name_key(text[:500])
+    counts: Dict[str, int] = {}
+    apps = {}
+    for size in (3, 2, 1):
+        for start in range(len(words) - size + 1):
+            app = catalog.find(' '.join(words[start:start + size]))
+            if app and app.category:
+                counts[app.id] = counts.get(app.id, 0) + 1
+                apps[app.id] = app
+
+    candidates = [
+        app_id for app_id, count in counts.items()
+        if count >= 2 or name_key(apps[app_id].name) in head
+    ]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda app_id: (counts[app_id], len(apps[app_id].name)))
+    category = apps[best].category
+    return apps[best].name, getattr(category, 'value', category)
+
+def parse_contract_text(
+    pages: List[str],
+    catalog: Optional[CatalogSnapshot] = None
+) -> Dict[str, Any]:
+    """Fields of ContractExtraction that could be read from the text; missing ones are absent"""
+    text = '\n'.join(pages)
+    fields: Dict[str, Any] = {}
+
+    if catalog is not None:
+        app = _find_app('\n'.join(pages[:APP_SEARCH_PAGES]), catalog)
+        if app:
+            fields['app_name'], fields['category'] = app
+
+    renewal = _date_after(RENEWAL_LABEL, text)
+    if renewal:
+        fields['renewal_date'] = _format_date(renewal)
+        review = _date_after(REVIEW_LABEL, text)
+        notice = NOTICE_DAYS.search(text)
+        if review is None and notice:
+            review = renewal - timedelta(days=int(notice.group(1)))
+        # The prompt's convention when the contract does not say otherwise
+        fields['review_date'] = _format_date(review or _months_before(renewal, 2))
+
+    license_type = _classify(text, BILLING_TERMS)
+    pricing_model = _classify(text, PRICING_TERMS) or PricingModel.FLAT
+    services = []
+    for name, quantity, unit, total in _line_items(text):
+        services.append({
+            'name': name,
+            'license_type': license_type,
+            'pricing_model': pricing_model,
+            'cost_per_license': _format_amount(unit),
+            'number_of_licenses': str(int(quantity)),
+            'total_cost': _format_amount(total)
+        })
+
+    if not services:
+        seats, price = SEAT_COUNT.search(text), UNIT_PRICE.search(text)
+        plan = PLAN_NAME.search(text)
+        if seats and price and plan:
+            quantity = _amount(seats.group(1))
+            unit = _amount(price.group(1) or price.group(2))
+            if quantity and unit:
+                services.append({
+                    'name': plan.group(1),
+                    'license_type': license_type,
+                    'pricing_model': pricing_model,
+                    'cost_per_license': _format_amount(unit),
+                    'number_of_licenses': str(int(quantity)),
+                    'total_cost': _format_amount(quantity * unit)
+                })
+
+    if services and license_type is not None:
+        fields['services'] = services
+
+    totals = [(match.group(1).lower(), _amount(match.group(2))) for match in TOTAL_LABEL.finditer(text)]
+    totals = [(label, amount) for label, amount in totals if amount]
+    if totals:
+        # Prefer an explicit grand total or contract value over a plain "total"
+        totals.sort(key=lambda total: total[0] == 'total')
+        fields['overall_total_cost'] = _format_amount(totals[0][1])
+    elif 'services' in fields:
+        fields['overall_total_cost'] = _format_amount(
+            sum(Decimal(service['total_cost']) for service in fields['services'])
+        )
+
+    url = URL_PATTERN.search(text)
+    if url:
+        fields['contract_url'] = url.group(0).rstrip('.,;')
+    emails = list(dict.fromkeys(EMAIL_PATTERN.findall(text)))
+    if emails:
+        fields['contact_details'] = ', '.join(emails[:3])
+
+    return fields
+
+def missing_fields(fields: Dict[str, Any]) -> List[str]:
+    return [field for field in REQUIRED_FIELDS if not fields.get(field)]
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from ..config import get_settings
+
+class ExtractionCache:
+    """
+    Content-addressed store of contract extraction results.
+    Entries are keyed by the SHA-256 of the PDF bytes plus a version string
+    derived from the prompt and model, kept in a local SQLite file, expired
+    after ttl_seconds and evicted least-recently-used once the stored
+    payloads exceed max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS extractions_accessed_at ON extractions (accessed_at)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def make_key(digest: str, version: str) -> str:
+        return f"{digest}:{version}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE extractions SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        payload = json.dumps(value)
+        size = len(payload.encode())
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute(
+            "DELETE FROM extractions WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM extractions"
+        ).fetchone()[0]
+
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM extractions ORDER BY accessed_at"
+        )
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM extractions WHERE key = ?", stale)
+        self.evictions += len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+@lru_cache()
+def get_extraction_cache() -> ExtractionCache:
+    """Get the process-wide extraction cache"""
+    settings = get_settings()
+    return ExtractionCache(
+        path=settings.extraction_cache_path,
+        max_bytes=settings.extraction_cache_max_mb * 1024 * 1024,
+        ttl_seconds=settings.extraction_cache_ttl_seconds
+    )
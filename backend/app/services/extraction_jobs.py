@@ -0,0 +1,189 @@
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from ..config import get_settings
+from ..models.job import ExtractionJob, JobStatus
+from .contract_processor import ContractExtraction, ContractProcessor, get_contract_processor
+
+class QueueFullError(Exception):
+    """Raised when the extraction queue cannot accept another job"""
+
+class JobStore(ABC):
+    """Where extraction job state lives between submission and polling"""
+
+    @abstractmethod
+    async def save(self, job: ExtractionJob) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[ExtractionJob]:
+        ...
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local job store.
+    Keeps at most max_jobs entries and drops the oldest finished jobs first.
+    """
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ExtractionJob]" = OrderedDict()
+
+    async def save(self, job: ExtractionJob) -> None:
+        self._jobs[job.id] = job.model_copy()
+        while len(self._jobs) > self.max_jobs:
+            oldest = next(
+                (job_id for job_id, stored in self._jobs.items() if stored.finished),
+                None
+            )
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+
+    async def get(self, job_id: str) -> Optional[ExtractionJob]:
+        job = self._jobs.get(job_id)
+        return job.model_copy() if job else None
+
+class ExtractionJobQueue:
+    """
+    Runs contract extractions on a bounded pool of worker tasks.
+    PDF bytes travel through the in-process queue; only job metadata and
+    results are written to the store. Callers either poll the job (submit)
+    or wait for its result (run); both share the same workers and limits.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        processor: ContractProcessor,
+        workers: int,
+        max_queued: int
+    ):
+        self.store = store
+        self.processor = processor
+        self.workers = workers
+        self._queue: "asyncio.Queue[Tuple[str, bytes, Optional[str]]]" = asyncio.Queue(maxsize=max_queued)
+        self._tasks: List[asyncio.Task] = []
+        # Results for callers of run(), by job id
+        self._waiters: Dict[str, asyncio.Future] = {}
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"extraction-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for waiter in self._waiters.values():
+            waiter.cancel()
+        self._waiters.clear()
+
+    async def submit(
+        self,
+        content: bytes,
+        filename: Optional[str] = None,
+        digest: Optional[str] = None,
+        waiter: Optional[asyncio.Future] = None
+    ) -> ExtractionJob:
+        """
+        Queue a PDF for extraction and return its job immediately.
+        digest is the SHA-256 hex digest of content, if the caller has it.
+        """
+        self.start()
+        if self._queue.full():
+            raise QueueFullError("Extraction queue is full, try again later")
+
+        job = ExtractionJob(id=str(uuid.uuid4()), filename=filename)
+        await self.store.save(job)
+        if waiter is not None:
+            self._waiters[job.id] = waiter
+        self._queue.put_nowait((job.id, content, digest))
+        return job
+
+    async def run(
+        self,
+        content: bytes,
+        filename: Optional[str] = None,
+        digest: Optional[str] = None
+    ) -> ContractExtraction:
+        """
+        Queue a PDF for extraction and wait for the result, for endpoints
+        that answer with the extraction. Errors are raised unchanged; if the
+        caller goes away before a worker picks the job up, it is skipped.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        await self.submit(content, filename, digest, waiter)
+        return await waiter
+
+    async def get(self, job_id: str) -> Optional[ExtractionJob]:
+        return await self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id, content, digest = await self._queue.get()
+            try:
+                await self._run(job_id, content, digest)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, content: bytes, digest: Optional[str]):
+        waiter = self._waiters.pop(job_id, None)
+        job = await self.store.get(job_id)
+        if job is None:
+            if waiter is not None and not waiter.done():
+                waiter.set_exception(LookupError(f"Extraction job {job_id} was lost"))
+            return
+
+        if waiter is not None and waiter.cancelled():
+            job.status = JobStatus.FAILED
+            job.error = "Cancelled before it started"
+            job.finished_at = datetime.utcnow()
+            await self.store.save(job)
+            return
+
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        await self.store.save(job)
+
+        try:
+            extraction = await self.processor.extract(content, digest=digest)
+            job.status = JobStatus.SUCCEEDED
+            job.result = extraction.model_dump(mode="json")
+            if waiter is not None and not waiter.done():
+                waiter.set_result(extraction)
+        except Exception as e:
+            print(f"Error in extraction job {job_id}: {e}")
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            if waiter is not None and not waiter.done():
+                waiter.set_exception(e)
+
+        job.finished_at = datetime.utcnow()
+        await self.store.save(job)
+
+@lru_cache()
+def get_extraction_queue() -> ExtractionJobQueue:
+    """Get the process-wide extraction queue"""
+    settings = get_settings()
+    return ExtractionJobQueue(
+        store=InMemoryJobStore(),
+        processor=get_contract_processor(),
+        workers=settings.extraction_workers,
+        max_queued=settings.extraction_queue_size
+    )
+
+async def close_extraction_queue():
+    """Stop the extraction workers if the queue was ever created"""
+    if get_extraction_queue.cache_info().currsize:
+        await get_extraction_queue().stop()
+        get_extraction_queue.cache_clear()
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Optional
+from ..config import get_settings
+from ..utils.metrics import LLM_RATE_LIMIT_WAIT
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute.
+    Waiters are served in arrival order. The balance may go negative when a
+    request turns out to cost more than was reserved for it; later callers
+    then wait until the debt is paid off.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1):
+        # A request larger than the bucket could otherwise never be served
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens after the fact"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+class ProviderRateLimiter:
+    """
+    Keeps LLM calls under the provider's requests-per-minute and
+    tokens-per-minute quotas. A limit of 0 disables that bucket.
+    Token usage is only known after a call, so callers reserve an estimate
+    with acquire() and correct it with settle().
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    async def acquire(self, estimated_tokens: int):
+        started = time.perf_counter()
+        if self.requests is not None:
+            await self.requests.acquire()
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+        LLM_RATE_LIMIT_WAIT.observe(time.perf_counter() - started)
+
+    def settle(self, estimated_tokens: int, used_tokens: int):
+        if self.tokens is not None:
+            self.tokens.adjust(used_tokens - estimated_tokens)
+
+@lru_cache()
+def get_llm_rate_limiter() -> ProviderRateLimiter:
+    """Get the process-wide limiter shared by every LLM call"""
+    settings = get_settings()
+    return ProviderRateLimiter(
+        requests_per_minute=settings.llm_requests_per_minute,
+        tokens_per_minute=settings.llm_tokens_per_minute
+    )
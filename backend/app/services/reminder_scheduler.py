@@ -0,0 +1,401 @@
+import asyncio
+import heapq
+import itertools
+import time as clock
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from ..config import get_settings
+from ..database import Database
+from ..models.reminder import ContractChange, Reminder, ReminderKind
+from .contract_events import contract_events
+
+CONTRACT_COLUMNS = 'id, company_id, renewal_date, review_date, updated_at'
+
+DATE_COLUMNS = {
+    ReminderKind.RENEWAL: 'renewal_date',
+    ReminderKind.REVIEW: 'review_date',
+}
+
+# Rows per request; PostgREST's max-rows silently truncates larger responses
+PAGE_SIZE = 1000
+
+# Each sync re-reads changes this far behind the newest one seen, so rows
+# committed slightly out of updated_at order are not missed
+SYNC_OVERLAP = timedelta(minutes=5)
+
+class ReminderSink(ABC):
+    """Where due reminders are delivered"""
+
+    @abstractmethod
+    async def emit(self, reminder: Reminder) -> None:
+        ...
+
+class LogReminderSink(ReminderSink):
+    async def emit(self, reminder: Reminder) -> None:
+        print(
+            f"Reminder: {reminder.kind.value} of contract {reminder.contract_id} "
+            f"(company {reminder.company_id}) is due on {reminder.due_date}"
+        )
+
+class InMemoryReminderSink(ReminderSink):
+    """Collects reminders in a list, for tests and local runs"""
+
+    def __init__(self):
+        self.reminders: List[Reminder] = []
+
+    async def emit(self, reminder: Reminder) -> None:
+        self.reminders.append(reminder)
+
+ReminderKey = Tuple[str, ReminderKind]
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # The API writes naive UTC timestamps, the database returns aware ones
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _change(row: Dict[str, Any]) -> ContractChange:
+    return ContractChange(
+        contract_id=row['id'],
+        company_id=row['company_id'],
+        renewal_date=row.get('renewal_date'),
+        review_date=row.get('review_date'),
+        updated_at=row.get('updated_at')
+    )
+
+async def _fetch_all(db: Database, build: Callable[[], Any], order: Tuple[str, ...]) -> List[dict]:
+    """Read every row a query matches, a page at a time"""
+    rows = []
+    while True:
+        query = build()
+        for column in order:
+            query = query.order(column)
+        response = await db.execute(query.range(len(rows), len(rows) + PAGE_SIZE - 1))
+        rows.extend(response.data)
+        if len(response.data) < PAGE_SIZE:
+            return rows
+
+class ReminderScheduler:
+    """
+    Priority queue of upcoming review and renewal reminders for all tenants.
+    Upcoming deadlines are loaded once; afterwards the queue is updated
+    incrementally from contract events in this process and, every
+    sync_seconds, from contracts whose updated_at moved, which also covers
+    writes made by other processes or directly in the database. Changes are
+    applied in updated_at order per contract, so a stale row never
+    overwrites a newer change. Replaced or removed entries are left in the
+    heap and skipped when they surface, so finding what is due only ever
+    looks at the head of the heap.
+    Before a reminder is sent, its contract is re-read and the reminder is
+    claimed in reminders_sent, so it goes out once across restarts and
+    processes.
+    """
+
+    def __init__(
+        self,
+        sink: ReminderSink,
+        lead_days: int,
+        poll_seconds: float = 3600,
+        sync_seconds: float = 60
+    ):
+        self.sink = sink
+        self.lead_days = lead_days
+        self.poll_seconds = poll_seconds
+        self.sync_seconds = sync_seconds
+        self._heap: List[Tuple[date, int, ReminderKey]] = []
+        self._current: Dict[ReminderKey, Tuple[int, Reminder]] = {}
+        self._emitted: Set[Tuple[str, ReminderKind, date]] = set()
+        # Per contract: updated_at of the newest change applied, and whether it was a delete
+        self._versions: Dict[str, Tuple[Optional[datetime], bool]] = {}
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._db: Optional[Database] = None
+        self._watermark: Optional[datetime] = None
+        self._synced_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    async def load(self, db: Database):
+        """
+        Queue every contract with a review or renewal date still ahead,
+        except reminders that were already sent. The database is then kept
+        for syncing and claiming.
+        """
+        self._db = db
+        query = db.table('contracts')\
+            .select('updated_at')\
+            .order('updated_at', desc=True)\
+            .limit(1)
+        response = await db.execute(query)
+        if response.data:
+            self._watermark = _utc(datetime.fromisoformat(response.data[0]['updated_at']))
+        self._synced_at = clock.monotonic()
+
+        today = date.today().isoformat()
+        sent = await _fetch_all(
+            db,
+            lambda: db.table('reminders_sent')\
+                .select('contract_id, kind, due_date')\
+                .gte('due_date', today),
+            order=('contract_id', 'kind', 'due_date')
+        )
+        for row in sent:
+            self._emitted.add((row['contract_id'], ReminderKind(row['kind']), date.fromisoformat(row['due_date'])))
+
+        rows = await _fetch_all(
+            db,
+            lambda: db.table('contracts')\
+                .select(CONTRACT_COLUMNS)\
+                .or_(f"renewal_date.gte.{today},review_date.gte.{today}"),
+            order=('id',)
+        )
+        for row in rows:
+            self.handle_change(_change(row))
+
+    async def sync(self, db: Database):
+        """Apply contracts changed since the last sync, a keyset page at a time"""
+        start = self._watermark - SYNC_OVERLAP if self._watermark else None
+        last = None
+        while True:
+            query = db.table('contracts').select(CONTRACT_COLUMNS)
+            if start is not None:
+                query = query.gte('updated_at', start.isoformat())
+            if last is not None:
+                query = query.or_(
+                    f"updated_at.gt.{last['updated_at']},"
+                    f"and(updated_at.eq.{last['updated_at']},id.gt.{last['id']})"
+                )
+            query = query.order('updated_at').order('id').limit(PAGE_SIZE)
+            response = await db.execute(query)
+
+            for row in response.data:
+                self.handle_change(_change(row))
+            if response.data:
+                last = response.data[-1]
+                newest = _utc(datetime.fromisoformat(last['updated_at']))
+                self._watermark = max(self._watermark, newest) if self._watermark else newest
+            if len(response.data) < PAGE_SIZE:
+                break
+        self._synced_at = clock.monotonic()
+
+    def _schedule(self, reminder: Reminder):
+        key = (reminder.contract_id, reminder.kind)
+        seq = next(self._seq)
+        self._current[key] = (seq, reminder)
+        heapq.heappush(self._heap, (reminder.remind_on, seq, key))
+
+    def _is_stale(self, change: ContractChange) -> bool:
+        """Whether a newer change to the contract was already applied"""
+        seen = self._versions.get(change.contract_id)
+        updated_at = _utc(change.updated_at)
+        if seen is not None:
+            seen_at, deleted = seen
+            if deleted or (updated_at is not None and seen_at is not None and updated_at < seen_at):
+                return True
+        if change.deleted or updated_at is not None:
+            self._versions[change.contract_id] = (updated_at, change.deleted)
+        return False
+
+    def handle_change(self, change: ContractChange):
+        """Apply a contract write to the queue; registered as a contract listener"""
+        if self._is_stale(change):
+            return
+
+        today = date.today()
+        deadlines = {
+            ReminderKind.RENEWAL: None if change.deleted else change.renewal_date,
+            ReminderKind.REVIEW: None if change.deleted else change.review_date,
+        }
+        for kind, due_date in deadlines.items():
+            key = (change.contract_id, kind)
+            current = self._current.get(key)
+            if current and current[1].due_date == due_date and current[1].company_id == change.company_id:
+                continue
+
+            self._current.pop(key, None)
+            if due_date is None or due_date < today or (change.contract_id, kind, due_date) in self._emitted:
+                continue
+
+            self._schedule(Reminder(
+                contract_id=change.contract_id,
+                company_id=change.company_id,
+                kind=kind,
+                due_date=due_date,
+                remind_on=due_date - timedelta(days=self.lead_days)
+            ))
+        self._wake.set()
+
+    def pop_due(self, today: Optional[date] = None) -> List[Reminder]:
+        """Remove and return every reminder whose day has come"""
+        today = today or date.today()
+        due = []
+        while self._heap and self._heap[0][0] <= today:
+            _, seq, key = heapq.heappop(self._heap)
+            current = self._current.get(key)
+            if current is None or current[0] != seq:
+                # Superseded by a later change
+                continue
+            reminder = current[1]
+            del self._current[key]
+            self._emitted.add((reminder.contract_id, reminder.kind, reminder.due_date))
+            due.append(reminder)
+
+        self._emitted = {entry for entry in self._emitted if entry[2] >= today}
+        return due
+
+    def _requeue(self, reminders: List[Reminder]):
+        for reminder in reminders:
+            self._emitted.discard((reminder.contract_id, reminder.kind, reminder.due_date))
+            self._schedule(reminder)
+
+    async def _confirm(self, db: Database, due: List[Reminder]) -> List[Reminder]:
+        """
+        Re-read the contracts of due reminders and keep those whose date still
+        holds. Contracts that changed or were deleted elsewhere are applied
+        to the queue instead.
+        """
+        ids = list({reminder.contract_id for reminder in due})
+        rows: Dict[str, dict] = {}
+        size = get_settings().bulk_filter_chunk_size
+        for start in range(0, len(ids), size):
+            query = db.table('contracts')\
+                .select(CONTRACT_COLUMNS)\
+                .in_('id', ids[start:start + size])
+            response = await db.execute(query)
+            rows.update((row['id'], row) for row in response.data)
+
+        confirmed = []
+        for reminder in due:
+            row = rows.get(reminder.contract_id)
+            if row is not None and row.get(DATE_COLUMNS[reminder.kind]) == reminder.due_date.isoformat():
+                confirmed.append(reminder)
+            elif row is not None:
+                self.handle_change(_change(row))
+            else:
+                self.handle_change(ContractChange(
+                    contract_id=reminder.contract_id,
+                    company_id=reminder.company_id,
+                    deleted=True
+                ))
+        return confirmed
+
+    async def _claim(self, db: Database, reminders: List[Reminder]) -> List[Reminder]:
+        """Record reminders as sent; only those not recorded before are returned"""
+        rows = [
+            {'contract_id': r.contract_id, 'kind': r.kind.value, 'due_date': r.due_date.isoformat()}
+            for r in reminders
+        ]
+        query = db.table('reminders_sent')\
+            .upsert(rows, on_conflict='contract_id,kind,due_date', ignore_duplicates=True)
+        response = await db.execute(query)
+        # Only newly inserted rows are returned when duplicates are ignored
+        claimed = {(row['contract_id'], row['kind'], row['due_date']) for row in response.data}
+        return [
+            r for r in reminders
+            if (r.contract_id, r.kind.value, r.due_date.isoformat()) in claimed
+        ]
+
+    async def deliver(self, due: List[Reminder]):
+        """
+        Send due reminders. Reminders that could not be confirmed or claimed
+        are queued again and the error is raised.
+        """
+        db = self._db
+        if db is not None:
+            try:
+                due = await self._confirm(db, due)
+            except Exception:
+                self._requeue(due)
+                raise
+
+        size = get_settings().bulk_chunk_size
+        for start in range(0, len(due), size):
+            chunk = due[start:start + size]
+            if db is not None:
+                try:
+                    chunk = await self._claim(db, chunk)
+                except Exception:
+                    self._requeue(due[start:])
+                    raise
+
+            for reminder in chunk:
+                try:
+                    await self.sink.emit(reminder)
+                except Exception as e:
+                    print(f"Error emitting reminder: {e}")
+
+    def _seconds_until_next(self) -> float:
+        timeout = self.poll_seconds
+        if self._db is not None:
+            timeout = min(timeout, max(self._synced_at + self.sync_seconds - clock.monotonic(), 0))
+        if not self._heap:
+            return timeout
+        next_day = datetime.combine(self._heap[0][0], time.min)
+        return min(max((next_day - datetime.now()).total_seconds(), 0), timeout)
+
+    async def run(self):
+        while not self._stopping:
+            timeout = None
+            try:
+                if self._db is not None and clock.monotonic() - self._synced_at >= self.sync_seconds:
+                    await self.sync(self._db)
+                await self.deliver(self.pop_due())
+            except Exception as e:
+                print(f"Error in reminder scheduler: {e}")
+                # Back off instead of retrying a failing database in a tight loop
+                timeout = self.sync_seconds
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(),
+                    timeout=timeout if timeout is not None else self._seconds_until_next()
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run(), name="reminder-scheduler")
+
+    async def stop(self):
+        if self._task is not None:
+            # wait_for can swallow a cancellation that races a wake-up, so
+            # the loop also checks this flag
+            self._stopping = True
+            self._wake.set()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+@lru_cache()
+def get_reminder_scheduler() -> ReminderScheduler:
+    """Get the process-wide reminder scheduler"""
+    settings = get_settings()
+    return ReminderScheduler(
+        LogReminderSink(),
+        settings.reminder_lead_days,
+        sync_seconds=settings.reminder_sync_seconds
+    )
+
+async def start_reminder_scheduler(db: Database) -> ReminderScheduler:
+    """Subscribe to contract changes, load upcoming deadlines once and start"""
+    scheduler = get_reminder_scheduler()
+    # Subscribe before loading so writes during the load are not missed;
+    # loaded rows older than those writes are ignored
+    contract_events.subscribe(scheduler.handle_change)
+    await scheduler.load(db)
+    scheduler.start()
+    return scheduler
+
+async def stop_reminder_scheduler():
+    if get_reminder_scheduler.cache_info().currsize:
+        scheduler = get_reminder_scheduler()
+        contract_events.unsubscribe(scheduler.handle_change)
+        await scheduler.stop()
@@ -0,0 +1,45 @@
+import itertools
+import uuid
+from functools import lru_cache
+from typing import Hashable
+from ..config import get_settings
+from ..models.reminder import ContractChange
+from ..utils.cache import TTLCache
+from .contract_events import contract_events
+
+class ResourceVersions:
+    """
+    Version stamps for cacheable listings, used to build ETags.
+    A listing's version changes whenever this process writes to it, so a
+    matching If-None-Match can be answered without reading the database.
+    Writes made by other processes are not seen, so versions also expire
+    after max_age_seconds, the same staleness bound as the app catalog.
+    Stamps include a per-process epoch and are never reused, so a stamp
+    from another process or an earlier run never matches.
+    """
+
+    def __init__(self, max_age_seconds: float, max_size: int = 10000):
+        self._epoch = uuid.uuid4().hex[:8]
+        self._counter = itertools.count(1)
+        self._versions: TTLCache[str] = TTLCache(max_size, max_age_seconds)
+
+    def current(self, key: Hashable) -> str:
+        version = self._versions.get(key)
+        if version is None:
+            version = self.bump(key)
+        return version
+
+    def bump(self, key: Hashable) -> str:
+        version = f"{self._epoch}.{next(self._counter)}"
+        self._versions.set(key, version)
+        return version
+
+    def handle_change(self, change: ContractChange):
+        self.bump(('contracts', change.company_id))
+
+@lru_cache()
+def get_resource_versions() -> ResourceVersions:
+    """Get the process-wide listing versions, kept current by contract events"""
+    versions = ResourceVersions(get_settings().listing_version_max_age_seconds)
+    contract_events.subscribe(versions.handle_change)
+    return versions
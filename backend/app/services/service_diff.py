@@ -0,0 +1,55 @@
+import uuid
+from typing import Dict, List, NamedTuple
+from ..models.contract import ServiceBase, ServiceCreate, ServiceResponse
+
+# Columns a client can change on a service row
+SERVICE_FIELDS = tuple(ServiceBase.model_fields)
+
+class ServiceDiff(NamedTuple):
+    # Rows to write in one upsert: changed existing rows keep their id,
+    # new rows get a freshly generated one
+    upserts: List[dict]
+    # Ids of existing rows that are no longer in the incoming list
+    deletes: List[str]
+    # Resulting service ids in the order of the incoming list
+    order: List[str]
+
+def _values(service: ServiceBase) -> dict:
+    return service.model_dump(include=set(SERVICE_FIELDS), mode="json")
+
+def diff_services(
+    contract_id: str,
+    existing: List[ServiceResponse],
+    incoming: List[ServiceCreate]
+) -> ServiceDiff:
+    """
+    Work out the minimal writes that turn existing into incoming.
+    Services carry no id on the way in, so they are paired with existing rows
+    by name; duplicate names pair up in order. Paired rows are only written
+    when one of their fields changed. Runs in O(existing + incoming).
+    """
+    by_name: Dict[str, List[ServiceResponse]] = {}
+    for service in existing:
+        by_name.setdefault(service.name, []).append(service)
+
+    upserts: List[dict] = []
+    order: List[str] = []
+    kept = set()
+
+    for service in incoming:
+        values = _values(service)
+        candidates = by_name.get(service.name)
+
+        if candidates:
+            current = candidates.pop(0)
+            kept.add(current.id)
+            order.append(current.id)
+            if values != _values(current):
+                upserts.append({"id": current.id, "contract_id": contract_id, **values})
+        else:
+            service_id = str(uuid.uuid4())
+            order.append(service_id)
+            upserts.append({"id": service_id, "contract_id": contract_id, **values})
+
+    deletes = [service.id for service in existing if service.id not in kept]
+    return ServiceDiff(upserts, deletes, order)
@@ -1,12 +1,38 @@
-from supabase import Client
 from fastapi import UploadFile
-from typing import Optional, Tuple
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
 import os
+import time
+import uuid
+import httpx
+from ..config import get_settings
+from ..database import Database
+from ..utils.metrics import record_storage
+from ..utils.resilience import RETRYABLE_STATUSES
 
 class StorageService:
-    def __init__(self, db: Client):
+    def __init__(self, db: Database):
         self.db = db
         self.bucket_name = "contract-files"
+        self.chunk_size = get_settings().storage_chunk_size
+
+    def _object_url(self, file_path: str) -> str:
+        return f"/storage/v1/object/{self.bucket_name}/{quote(file_path)}"
+
+    async def _count_upload(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            record_storage("upload", len(chunk))
+            yield chunk
+
+    async def iter_download(self, response: httpx.Response) -> AsyncIterator[bytes]:
+        """Stream the body of an opened download, counting the bytes sent"""
+        async for chunk in response.aiter_bytes(self.chunk_size):
+            record_storage("download", len(chunk))
+            yield chunk
+
+    async def _iter_upload(self, file: UploadFile) -> AsyncIterator[bytes]:
+        while chunk := await file.read(self.chunk_size):
+            yield chunk
 
     async def upload_contract_file(
         self,
@@ -14,24 +40,59 @@ class StorageService:
         contract_id: str,
         file: UploadFile
     ) -> Tuple[str, str]:
-        """Upload a contract file and return both storage path and public URL"""
+        """
+        Upload a contract file and return both storage path and public URL.
+        The file is streamed to Storage one chunk at a time, so memory use is
+        bounded by the chunk size rather than the file size.
+        """
+        try:
+            return await self.upload_contract_stream(
+                company_id,
+                contract_id,
+                file.filename,
+                file.content_type,
+                self._iter_upload(file)
+            )
+        finally:
+            await file.close()
+
+    async def upload_contract_stream(
+        self,
+        company_id: str,
+        contract_id: str,
+        filename: str,
+        content_type: Optional[str],
+        chunks: AsyncIterator[bytes]
+    ) -> Tuple[str, str]:
+        """Stream contract file chunks to Storage and return its path and public URL"""
         try:
-            if not file.content_type == 'application/pdf':
+            if not content_type == 'application/pdf':
                 raise ValueError("Only PDF files are allowed")
 
-            # Create safe filename
+            # Create safe filename; the random part keeps two uploads in the
+            # same second from overwriting (or later deleting) each other
             timestamp = int(time.time())
-            safe_filename = f"{timestamp}_{file.filename.replace(' ', '_')}"
+            safe_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename.replace(' ', '_')}"
             file_path = f"{company_id}/{contract_id}/{safe_filename}"
             
-            content = await file.read()
-            
-            response = self.db.storage\
-                .from_(self.bucket_name)\
-                .upload(file_path, content, {"content-type": file.content_type})
-            
-            if not response:
-                raise ValueError("Failed to upload file")
+            async def send() -> httpx.Response:
+                response = await self.db.http.post(
+                    self._object_url(file_path),
+                    content=self._count_upload(chunks),
+                    headers={"content-type": content_type}
+                )
+                # Raised so the circuit breaker counts Storage failures
+                if response.status_code in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                return response
+
+            started = time.perf_counter()
+            # The body is a one-shot stream, so an upload is never retried
+            response = await self.db.storage_policy.call(send, deadline=False)
+            record_storage("upload", 0, time.perf_counter() - started)
+
+            if response.is_error:
+                raise ValueError(f"Failed to upload file: {response.text}")
 
             # Get public URL
             file_url = self.db.storage\
@@ -42,17 +103,68 @@ class StorageService:
         except Exception as e:
             print(f"Error uploading file: {e}")
             raise
-        finally:
-            await file.close()
 
-    async def download_contract_file(self, file_path: str) -> Optional[bytes]:
-        """Download a contract file by its path"""
+    async def discard_contract_file(self, file_path: str) -> bool:
+        """
+        Delete an uploaded contract file that no contract points at.
+        Runs while another failure is being handled, so errors are logged
+        and reported as False instead of raised.
+        """
         try:
-            response = self.db.storage\
-                .from_(self.bucket_name)\
-                .download(file_path)
-            
+            async def send() -> httpx.Response:
+                response = await self.db.http.delete(self._object_url(file_path))
+                # Raised so the delete is retried and the circuit breaker sees it
+                if response.status_code in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                return response
+
+            response = await self.db.storage_policy.call(send, idempotent=True)
+            if response.is_error and response.status_code != 404:
+                raise ValueError(f"Failed to delete file: {response.text}")
+            return True
+        except Exception as e:
+            print(f"Error deleting file {file_path}: {e}")
+            return False
+
+    async def open_contract_file(
+        self,
+        file_path: str,
+        byte_range: Optional[str] = None
+    ) -> Optional[httpx.Response]:
+        """
+        Open a streaming download of a contract file.
+        byte_range is forwarded as the HTTP Range header. The caller must
+        close the returned response; None means the object does not exist.
+        """
+        try:
+            headers = {"Range": byte_range} if byte_range else {}
+
+            async def send() -> httpx.Response:
+                request = self.db.http.build_request(
+                    "GET",
+                    self._object_url(file_path),
+                    headers=headers
+                )
+                response = await self.db.http.send(request, stream=True)
+                if response.status_code in RETRYABLE_STATUSES:
+                    await response.aread()
+                    await response.aclose()
+                    response.raise_for_status()
+                return response
+
+            started = time.perf_counter()
+            response = await self.db.storage_policy.call(send, idempotent=True)
+            record_storage("download", 0, time.perf_counter() - started)
+
+            if response.status_code in (400, 404):
+                await response.aclose()
+                return None
+            if response.is_error and response.status_code != 416:
+                await response.aread()
+                await response.aclose()
+                raise ValueError(f"Failed to download file: {response.text}")
+
             return response
         except Exception as e:
             print(f"Error downloading file: {e}")
-            raise
\ No newline at end of file
+            raise
@@ -1,18 +1,18 @@
 from typing import Optional
-from supabase import Client
+from ..database import Database
 from ..models.company import CompanyCreate, CompanyResponse
 
 class SupabaseService:
-    def __init__(self, db: Client):
+    def __init__(self, db: Database):
         self.db = db
 
     async def get_company(self, name: str, access_code: str) -> Optional[CompanyResponse]:
         """Get company by name and access code"""
         try:
-            response = self.db.table('companies').select('*')\
+            query = self.db.table('companies').select('*')\
                 .eq('name', name)\
-                .eq('access_code', access_code)\
-                .execute()
+                .eq('access_code', access_code)
+            response = await self.db.execute(query)
             
             if response.data and len(response.data) > 0:
                 return CompanyResponse(**response.data[0])
@@ -24,8 +24,8 @@ class SupabaseService:
     async def create_company(self, company: CompanyCreate) -> Optional[CompanyResponse]:
         """Create a new company"""
         try:
-            response = self.db.table('companies').insert(company.model_dump())\
-                .execute()
+            query = self.db.table('companies').insert(company.model_dump())
+            response = await self.db.execute(query)
             
             if response.data and len(response.data) > 0:
                 return CompanyResponse(**response.data[0])
@@ -37,9 +37,9 @@ class SupabaseService:
     async def check_company_exists(self, name: str) -> bool:
         """Check if company exists by name"""
         try:
-            response = self.db.table('companies').select('id')\
-                .eq('name', name)\
-                .execute()
+            query = self.db.table('companies').select('id')\
+                .eq('name', name)
+            response = await self.db.execute(query)
             return len(response.data) > 0
         except Exception as e:
             print(f"Error checking company existence: {e}")
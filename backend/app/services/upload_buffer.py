@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import tempfile
+from typing import AsyncIterator, Optional
+from fastapi import UploadFile
+
+class SpooledUpload:
+    """
+    An uploaded file copied exactly once into a spooled temporary file.
+    The SHA-256 digest is computed during that single pass. Afterwards any
+    number of consumers can read from the buffer concurrently, because each
+    chunk read seeks to its own offset without yielding to the event loop.
+    """
+
+    def __init__(
+        self,
+        buffer: tempfile.SpooledTemporaryFile,
+        size: int,
+        sha256: str,
+        filename: Optional[str],
+        content_type: Optional[str]
+    ):
+        self._buffer = buffer
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+
+    @classmethod
+    async def from_upload(
+        cls,
+        file: UploadFile,
+        chunk_size: int,
+        max_memory: int
+    ) -> "SpooledUpload":
+        buffer = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            while chunk := await file.read(chunk_size):
+                digest.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        except Exception:
+            buffer.close()
+            raise
+        finally:
+            await file.close()
+
+        return cls(buffer, size, digest.hexdigest(), file.filename, file.content_type)
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        self._buffer.seek(offset)
+        return self._buffer.read(size)
+
+    def read_bytes(self) -> bytes:
+        """Read the whole buffer, for consumers that need the document at once"""
+        return self._read_at(0, self.size)
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        offset = 0
+        while offset < self.size:
+            chunk = self._read_at(offset, chunk_size)
+            offset += len(chunk)
+            yield chunk
+            # Let concurrent consumers of the same buffer make progress
+            await asyncio.sleep(0)
+
+    def close(self):
+        self._buffer.close()
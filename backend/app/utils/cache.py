@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class TTLCache(Generic[V]):
+    """
+    Size-bounded LRU cache whose entries expire.
+    Each entry carries its own absolute expiry (epoch seconds); set() falls
+    back to default_ttl when none is given.
+    """
+
+    def __init__(self, max_size: int, default_ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, expires_at: Optional[float] = None):
+        if expires_at is None:
+            if self.default_ttl is None:
+                raise ValueError("An expiry is required when the cache has no default TTL")
+            expires_at = time.time() + self.default_ttl
+
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,103 @@
+import json
+from typing import Any, List, NamedTuple, Optional
+
+class JsonEvent(NamedTuple):
+    key: str
+    # Position within a top-level array, or None for the whole value of key
+    index: Optional[int]
+    value: Any
+
+class JsonObjectScanner:
+    """
+    Incrementally scans a JSON object that arrives in pieces, such as a
+    streamed model reply, and reports each top-level value as soon as it is
+    complete. Elements of top-level arrays are also reported one by one.
+    Anything before the opening brace (prose, code fences) is skipped, and
+    values that are not valid JSON are dropped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._done = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+
+    def _decode(self, start: int, end: int) -> Any:
+        text = self._buffer[start:end].strip()
+        try:
+            return json.loads(text) if text else None
+        except ValueError:
+            return None
+
+    def _item(self, end: int, events: List[JsonEvent]):
+        if self._buffer[self._item_start:end].strip():
+            events.append(JsonEvent(self._key, self._item_index, self._decode(self._item_start, end)))
+            self._item_index += 1
+
+    def _field(self, end: int, events: List[JsonEvent]):
+        if self._key is not None and self._value_start is not None:
+            events.append(JsonEvent(self._key, None, self._decode(self._value_start, end)))
+        self._key = None
+        self._value_start = None
+
+    def feed(self, text: str) -> List[JsonEvent]:
+        self._buffer += text
+        events: List[JsonEvent] = []
+
+        while self._position < len(self._buffer) and not self._done:
+            index = self._position
+            char = self._buffer[index]
+            self._position += 1
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = self._decode(self._key_start, index + 1)
+                        self._key_start = None
+                continue
+
+            if depth == 0:
+                if char == '{':
+                    self._stack.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if depth == 1 and self._value_start is None:
+                    self._key_start = index
+            elif char == ':' and depth == 1:
+                self._value_start = index + 1
+            elif char in '{[':
+                self._stack.append(char)
+                if depth == 1 and char == '[':
+                    self._item_start = index + 1
+                    self._item_index = 0
+            elif char in '}]':
+                if depth == 2 and self._stack[-1] == '[':
+                    self._item(index, events)
+                    self._item_start = None
+                if depth == 1:
+                    self._field(index, events)
+                    self._done = True
+                self._stack.pop()
+            elif char == ',':
+                if depth == 1:
+                    self._field(index, events)
+                elif depth == 2 and self._stack[-1] == '[':
+                    self._item(index, events)
+                    self._item_start = index + 1
+
+        return events
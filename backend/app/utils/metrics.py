@@ -0,0 +1,233 @@
+import math
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; from a cached read to a slow LLM call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: bucket counts (not cumulative), sum
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, including streaming the response body",
+    ("method", "route", "status")
+))
+HTTP_REQUEST_ROUND_TRIPS = REGISTRY.register(Histogram(
+    "http_request_supabase_round_trips",
+    "Supabase round trips made while serving a request",
+    ("method", "route"),
+    buckets=ROUND_TRIP_BUCKETS
+))
+SUPABASE_DURATION = REGISTRY.register(Histogram(
+    "supabase_request_duration_seconds",
+    "Duration of Supabase calls by HTTP method ('call' for other client calls)",
+    ("method",)
+))
+STORAGE_BYTES = REGISTRY.register(Counter(
+    "storage_bytes_total",
+    "Bytes transferred to and from Supabase Storage",
+    ("direction",)
+))
+LLM_DURATION = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds",
+    "Duration of LLM calls",
+    ("model",)
+))
+CONTRACT_EXTRACTIONS = REGISTRY.register(Counter(
+    "contract_extractions_total",
+    "Contract extractions by method: text (parsed locally), text+llm or vision",
+    ("method",)
+))
+LLM_RATE_LIMIT_WAIT = REGISTRY.register(Histogram(
+    "llm_rate_limit_wait_seconds",
+    "Time LLM calls waited for the provider rate limiter"
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total",
+    "Tokens used by LLM calls",
+    ("model", "type")
+))
+
+OUTBOUND_RETRIES = REGISTRY.register(Counter(
+    "outbound_retries_total",
+    "Retried calls to a dependency",
+    ("dependency",)
+))
+OUTBOUND_HEDGES = REGISTRY.register(Counter(
+    "outbound_hedges_total",
+    "Hedged duplicate calls started because the first was slow",
+    ("dependency",)
+))
+OUTBOUND_REJECTIONS = REGISTRY.register(Counter(
+    "outbound_circuit_rejections_total",
+    "Calls rejected without trying because the dependency's circuit was open",
+    ("dependency",)
+))
+
+@dataclass
+class RequestMetrics:
+    """What one request spent its time on, for the Server-Timing header"""
+    db_calls: int = 0
+    db_seconds: float = 0.0
+    storage_bytes: int = 0
+    storage_seconds: float = 0.0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    llm_tokens: int = 0
+
+    def server_timing(self, total_seconds: float) -> str:
+        entries = [f"app;dur={total_seconds * 1000:.1f}"]
+        if self.db_calls:
+            entries.append(f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_calls} round trips"')
+        if self.storage_seconds or self.storage_bytes:
+            # Downloads stream after the header is sent, so their bytes are not known yet
+            entry = f'storage;dur={self.storage_seconds * 1000:.1f}'
+            entries.append(entry + f';desc="{self.storage_bytes} bytes"' if self.storage_bytes else entry)
+        if self.llm_calls:
+            entries.append(f'llm;dur={self.llm_seconds * 1000:.1f};desc="{self.llm_tokens} tokens"')
+        return ", ".join(entries)
+
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+def start_request() -> RequestMetrics:
+    metrics = RequestMetrics()
+    _current_request.set(metrics)
+    return metrics
+
+def current_request() -> Optional[RequestMetrics]:
+    """Metrics of the request being served, or None outside a request"""
+    return _current_request.get()
+
+def record_db_call(method: str, seconds: float):
+    SUPABASE_DURATION.observe(seconds, method=method)
+    request = current_request()
+    if request is not None:
+        request.db_calls += 1
+        request.db_seconds += seconds
+
+def record_storage(direction: str, size: int, seconds: float = 0.0):
+    STORAGE_BYTES.inc(size, direction=direction)
+    request = current_request()
+    if request is not None:
+        request.storage_bytes += size
+        request.storage_seconds += seconds
+
+def record_llm_call(model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+    LLM_DURATION.observe(seconds, model=model)
+    LLM_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, type="completion")
+    request = current_request()
+    if request is not None:
+        request.llm_calls += 1
+        request.llm_seconds += seconds
+        request.llm_tokens += prompt_tokens + completion_tokens
@@ -0,0 +1,186 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+import httpx
+from .metrics import OUTBOUND_HEDGES, OUTBOUND_REJECTIONS, OUTBOUND_RETRIES
+
+T = TypeVar("T")
+
+# Statuses that mean the dependency is struggling, not that the request was wrong
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit breaker is open"""
+
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(f"{dependency} is unavailable, retry in {retry_after:.0f}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_seconds. Then a single trial call is let through (half-open): its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self):
+        if self._opened_at is None:
+            return
+        remaining = self._opened_at + self.reset_seconds - time.monotonic()
+        if remaining > 0 or self._trial_running:
+            OUTBOUND_REJECTIONS.inc(dependency=self.name)
+            raise CircuitOpenError(self.name, max(remaining, 0))
+        self._trial_running = True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def abandon_trial(self):
+        """The trial call was cancelled before it could tell anything"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_running or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._trial_running:
+                print(f"Circuit for {self.name} opened after {self._failures} failures")
+            self._opened_at = time.monotonic()
+            self._trial_running = False
+
+class OutboundPolicy:
+    """
+    How calls to one dependency are made: a deadline per attempt, jittered
+    exponential retries and optional hedging for idempotent calls, and a
+    circuit breaker shared by every call.
+    Only failures that point at the dependency (timeouts, connection errors,
+    408/429/5xx responses and the extra `retryable` types) are retried and
+    count against the breaker; anything else is the caller's error and is
+    raised unchanged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: Optional[float],
+        retries: int = 0,
+        backoff_seconds: float = 0.1,
+        max_backoff_seconds: float = 2.0,
+        hedge_after: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retryable: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.hedge_after = hedge_after
+        self.breaker = breaker
+        self.retryable = retryable
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        if self.retryable and isinstance(error, self.retryable):
+            return True
+        status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        if status is None:
+            # postgrest's APIError carries the HTTP status as its code for gateway
+            # errors: an int when the body was not JSON, a string otherwise
+            code = getattr(error, "code", None)
+            if isinstance(code, int):
+                status = code
+            elif isinstance(code, str) and code.isdigit():
+                status = int(code)
+        return status in RETRYABLE_STATUSES
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter, so retries from many callers do not arrive together
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], timeout: Optional[float]) -> T:
+        if timeout is None:
+            return await fn()
+        return await asyncio.wait_for(fn(), timeout)
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], timeout: Optional[float]) -> T:
+        """Start a second copy of a slow call and take whichever finishes first"""
+        first = asyncio.ensure_future(self._attempt(fn, timeout))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        OUTBOUND_HEDGES.inc(dependency=self.name)
+        pending = {first, asyncio.ensure_future(self._attempt(fn, timeout))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        idempotent: bool = False,
+        deadline: bool = True
+    ) -> T:
+        """
+        Call fn under this policy. fn must start a fresh request every time
+        it is called. Only idempotent calls are retried or hedged. Calls
+        whose duration depends on the payload, such as streaming uploads,
+        can opt out of the deadline.
+        """
+        timeout = self.timeout if deadline else None
+        attempts = self.retries + 1 if idempotent else 1
+
+        for attempt in range(attempts):
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                if idempotent and self.hedge_after:
+                    result = await self._hedged(fn, timeout)
+                else:
+                    result = await self._attempt(fn, timeout)
+            except asyncio.CancelledError:
+                if self.breaker is not None:
+                    self.breaker.abandon_trial()
+                raise
+            except Exception as e:
+                if not self.is_retryable(e):
+                    if self.breaker is not None:
+                        # The dependency answered, so it is up
+                        self.breaker.record_success()
+                    raise
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    raise
+                OUTBOUND_RETRIES.inc(dependency=self.name)
+                await asyncio.sleep(self._backoff(attempt))
+            else:
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                return result
@@ -0,0 +1,91 @@
+"""
+Concurrent throughput of the API with blocking vs. pooled Supabase calls.
+
+Drives GET /api/contracts/company/{id} in-process with a stand-in client whose execute()
+blocks for a fixed time, the way a slow PostgREST call blocks supabase-py.
+The "inline" mode runs calls on the event loop (the old behaviour); the
+"pooled" modes run them on the Database thread pool.
+
+    python benchmarks/bench_db_concurrency.py --latency-ms 50 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The stand-in client never talks to Supabase, but settings still require these
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import httpx
+from app.database import Database, get_db
+from app.main import app
+
+class BlockingQuery:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __getattr__(self, name):
+        # select/eq/ilike/... all just return the same builder
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self.latency)
+        return SimpleNamespace(data=[])
+
+class BlockingClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def table(self, name: str):
+        return BlockingQuery(self.latency)
+
+class InlineDatabase(Database):
+    """Runs client calls directly on the event loop, like the old services"""
+
+    async def run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+async def measure(db: Database, requests: int, concurrency: int) -> float:
+    app.dependency_overrides[get_db] = lambda: db
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get("/api/contracts/company/bench")
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    app.dependency_overrides.clear()
+    return requests / elapsed
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[4, 16, 32])
+    args = parser.parse_args()
+
+    client = BlockingClient(args.latency_ms / 1000)
+    modes = [("inline", InlineDatabase(client, max_workers=1))]
+    modes += [(f"pooled[{size}]", Database(client, max_workers=size)) for size in args.pool_sizes]
+
+    print(f"{'mode':<12}" + "".join(f"{'c=' + str(c):>12}" for c in args.concurrency))
+    for name, db in modes:
+        row = []
+        for concurrency in args.concurrency:
+            row.append(await measure(db, args.requests, concurrency))
+        await db.close()
+        print(f"{name:<12}" + "".join(f"{rps:>10.1f}/s" for rps in row))
+
+if __name__ == "__main__":
+    asyncio.run(main())
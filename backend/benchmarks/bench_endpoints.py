@@ -0,0 +1,345 @@
+"""
+Latency and round trips of the API's endpoints for different tenant sizes.
+
+Drives the FastAPI app in-process against FakeSupabase (fake_supabase.py),
+seeded with one company per tenant size, and injects a fixed per-round-trip
+latency so results reflect how many database calls an endpoint makes, not
+just Python overhead. Reports p50/p95/p99 latency and round trips per
+request, and writes everything to a JSON file for comparing runs.
+
+    python benchmarks/bench_endpoints.py --sizes 10 500 5000 --latency-ms 5 --output results.json
+    python benchmarks/bench_endpoints.py --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, 'scripts'))
+# The fake client never talks to Supabase, but settings still require these
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import httpx
+from app.config import get_settings
+from app.database import Database, get_db
+from app.main import app
+from fake_supabase import FakeSupabase
+from sync_apps import load_frontend_apps
+
+LICENSE_TYPES = ("Monthly", "Annual", "Quarterly", "Other")
+PRICING_MODELS = ("Flat rated", "Tiered", "Pro-rated", "Feature based")
+FILE_SIZE = 1024 * 1024
+
+class Endpoint(NamedTuple):
+    name: str
+    method: str
+    # Formatted with the tenant's ids
+    path: str
+    # Builds request kwargs (json=, files=, ...) for one call
+    request: Optional[Callable[["Tenant", random.Random], dict]] = None
+
+class Tenant(NamedTuple):
+    size: int
+    company_id: str
+    contract_ids: List[str]
+    app_ids: List[str]
+    file_contract_id: str
+    app_names: List[str]
+
+def _service(rng: random.Random, index: int) -> dict:
+    licenses = rng.randint(1, 500)
+    cost = round(rng.uniform(1, 100), 2)
+    return {
+        'name': f"Service {index}",
+        'license_type': rng.choice(LICENSE_TYPES),
+        'pricing_model': rng.choice(PRICING_MODELS),
+        'cost_per_user': cost,
+        'number_of_licenses': licenses,
+        'total_cost': round(cost * licenses, 2),
+    }
+
+def _contract_body(tenant: Tenant, rng: random.Random) -> dict:
+    return {'json': {
+        'company_id': tenant.company_id,
+        'company_app_id': rng.choice(tenant.app_ids),
+        'renewal_date': (date.today() + timedelta(days=rng.randint(1, 365))).isoformat(),
+        'overall_total_value': round(rng.uniform(100, 100000), 2),
+        'services': [_service(rng, i) for i in range(2)],
+    }}
+
+def _update_body(tenant: Tenant, rng: random.Random) -> dict:
+    return {'json': {
+        'notes': f"Reviewed {rng.random()}",
+        'services': [_service(rng, i) for i in range(rng.randint(1, 3))],
+    }}
+
+def _resolve_body(tenant: Tenant, rng: random.Random) -> dict:
+    names = [rng.choice(tenant.app_names) for _ in range(800)]
+    names += [name[:-1] for name in rng.sample(tenant.app_names, 50)]
+    names += [f"Internal Tool {i}" for i in range(150)]
+    return {'json': {'names': names}}
+
+def _import_body(tenant: Tenant, rng: random.Random) -> dict:
+    lines = ["company_app_id,renewal_date,overall_total_value,service_name,license_type,pricing_model"]
+    for _ in range(100):
+        lines.append(
+            f"{rng.choice(tenant.app_ids)},{date.today() + timedelta(days=rng.randint(1, 365))},"
+            f"{rng.randint(100, 10000)},Seats,Annual,Tiered"
+        )
+    return {'files': {'file': ('contracts.csv', "\n".join(lines).encode(), 'text/csv')}}
+
+def _range_headers(tenant: Tenant, rng: random.Random) -> dict:
+    start = rng.randrange(0, FILE_SIZE - 65536)
+    return {'headers': {'Range': f"bytes={start}-{start + 65535}"}}
+
+ENDPOINTS = [
+    Endpoint("list_contracts", "GET", "/api/contracts/company/{company_id}?limit=50"),
+    Endpoint("list_contracts_by_value", "GET", "/api/contracts/company/{company_id}?sort=total-value&limit=200"),
+    Endpoint("list_contracts_renewing", "GET", "/api/contracts/company/{company_id}?renewal_within_days=90"),
+    Endpoint("get_contract", "GET", "/api/contracts/{contract_id}"),
+    Endpoint("create_contract", "POST", "/api/contracts", _contract_body),
+    Endpoint("update_contract", "PUT", "/api/contracts/{contract_id}?company_id={company_id}", _update_body),
+    Endpoint("import_100_rows", "POST", "/api/contracts/company/{company_id}/import", _import_body),
+    Endpoint("download_file", "GET", "/api/contracts/{file_contract_id}/download?company_id={company_id}"),
+    Endpoint("download_range", "GET", "/api/contracts/{file_contract_id}/download?company_id={company_id}", _range_headers),
+    Endpoint("search_apps", "GET", "/api/apps?search=sa"),
+    Endpoint("company_apps", "GET", "/api/apps/company/{company_id}"),
+    Endpoint("resolve_1000_names", "POST", "/api/apps/resolve", _resolve_body),
+    Endpoint("spend_analytics", "GET", "/api/analytics/company/{company_id}"),
+]
+
+def seed(fake: FakeSupabase, sizes: List[int], rng: random.Random) -> List[Tenant]:
+    """Load the app catalog and one company per tenant size"""
+    now = datetime.utcnow().isoformat()
+    apps = [{**app, 'created_at': now, 'updated_at': now} for app in load_frontend_apps()]
+    fake.tables['apps'] = apps
+    app_names = [app['name'] for app in apps]
+
+    tenants = []
+    for size in sizes:
+        company = fake.insert_row('companies', {'name': f"Tenant {size}", 'access_code': 'BNCH'})
+        selected = rng.sample(apps, min(len(apps), max(5, size // 10)))
+        for app in selected:
+            fake.insert_row('company_apps', {'company_id': company['id'], 'app_id': app['id']})
+
+        aggregates: Dict[tuple, dict] = {}
+
+        def bump(dimension, bucket, value, licenses=0):
+            row = aggregates.setdefault((dimension, bucket), {
+                'company_id': company['id'], 'dimension': dimension, 'bucket': bucket,
+                'total_value': 0, 'item_count': 0, 'license_count': 0,
+            })
+            row['total_value'] += value or 0
+            row['item_count'] += 1
+            row['license_count'] += licenses
+
+        contract_ids = []
+        for _ in range(size):
+            app = rng.choice(selected)
+            renewal = date.today() + timedelta(days=rng.randint(-365, 730)) if rng.random() < 0.9 else None
+            contract = fake.insert_row('contracts', {
+                'company_id': company['id'],
+                'company_app_id': app['id'],
+                'renewal_date': renewal.isoformat() if renewal else None,
+                'review_date': (date.today() + timedelta(days=rng.randint(0, 365))).isoformat() if rng.random() < 0.5 else None,
+                'overall_total_value': round(rng.uniform(100, 100000), 2),
+                'contract_file_url': None,
+                'contract_file_path': None,
+                'notes': None,
+                'contact_details': None,
+                'stitchflow_connection': 'CSV Upload/API coming soon',
+            })
+            contract_ids.append(contract['id'])
+            bump('category', app['category'], contract['overall_total_value'])
+            bump('renewal_month', renewal.strftime('%Y-%m') if renewal else 'none', contract['overall_total_value'])
+            bump('total', 'contracts', contract['overall_total_value'])
+            for index in range(rng.randint(1, 3)):
+                service = fake.insert_row('services', {'contract_id': contract['id'], **_service(rng, index)})
+                bump('license_type', service['license_type'], service['total_cost'], service['number_of_licenses'])
+                bump('total', 'services', service['total_cost'], service['number_of_licenses'])
+
+        if not size:
+            fake.insert_row('contracts', {'company_id': company['id'], 'company_app_id': selected[0]['id']})
+        file_contract = fake.tables['contracts'][-1]
+        file_path = f"{company['id']}/{file_contract['id']}/bench.pdf"
+        file_contract['contract_file_path'] = file_path
+        fake.objects[('contract-files', file_path)] = os.urandom(FILE_SIZE)
+
+        fake.tables.setdefault('company_spend_aggregates', []).extend(aggregates.values())
+        tenants.append(Tenant(
+            size=size,
+            company_id=company['id'],
+            contract_ids=contract_ids or [file_contract['id']],
+            app_ids=[app['id'] for app in selected],
+            file_contract_id=file_contract['id'],
+            app_names=app_names,
+        ))
+    return tenants
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+async def measure(
+    client: httpx.AsyncClient,
+    fake: FakeSupabase,
+    tenant: Tenant,
+    endpoint: Endpoint,
+    requests: int,
+    warmup: int,
+    concurrency: int,
+    rng: random.Random
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def one(record: bool):
+        path = endpoint.path.format(
+            company_id=tenant.company_id,
+            contract_id=rng.choice(tenant.contract_ids),
+            file_contract_id=tenant.file_contract_id,
+        )
+        kwargs = endpoint.request(tenant, rng) if endpoint.request else {}
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(endpoint.method, path, **kwargs)
+            await response.aread()
+            elapsed = time.perf_counter() - started
+        if record:
+            timings.append(elapsed * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    for _ in range(warmup):
+        await one(False)
+
+    round_trips = fake.round_trips
+    await asyncio.gather(*(one(True) for _ in range(requests)))
+    round_trips = fake.round_trips - round_trips
+
+    return {
+        'endpoint': endpoint.name,
+        'tenant_size': tenant.size,
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'round_trips': round(round_trips / requests, 2),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def print_results(results: List[dict]):
+    print(f"{'endpoint':<26}{'tenant':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'trips':>8}  status")
+    for result in results:
+        print(
+            f"{result['endpoint']:<26}{result['tenant_size']:>8}{result['p50_ms']:>10.2f}"
+            f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['round_trips']:>8.2f}  "
+            f"{','.join(f'{code}x{count}' for code, count in result['status_codes'].items())}"
+        )
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> int:
+    """Print p95 and round-trip changes against a saved run; return the regression count"""
+    with open(baseline_path) as f:
+        baseline = {(r['endpoint'], r['tenant_size']): r for r in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nvs {baseline_path}")
+    print(f"{'endpoint':<26}{'tenant':>8}{'p95 before':>12}{'p95 after':>12}{'trips':>14}")
+    for result in results:
+        before = baseline.get((result['endpoint'], result['tenant_size']))
+        if before is None:
+            continue
+        slower = result['p95_ms'] > before['p95_ms'] * (1 + threshold)
+        more_trips = result['round_trips'] > before['round_trips']
+        regressions += slower or more_trips
+        print(
+            f"{result['endpoint']:<26}{result['tenant_size']:>8}{before['p95_ms']:>12.2f}"
+            f"{result['p95_ms']:>12.2f}{before['round_trips']:>7.2f}->{result['round_trips']:<6.2f}"
+            f"{'  REGRESSION' if slower or more_trips else ''}"
+        )
+    return regressions
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 500, 5000], help="contracts per tenant")
+    parser.add_argument("--latency-ms", type=float, default=5, help="injected latency per round trip")
+    parser.add_argument("--jitter-ms", type=float, default=1, help="extra random latency per round trip")
+    parser.add_argument("--requests", type=int, default=50, help="measured requests per endpoint and tenant")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--endpoints", nargs="+", help="only run these endpoints")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against a previous JSON result file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fake = FakeSupabase(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=args.seed)
+    print("Seeding tenants...", flush=True)
+    tenants = seed(fake, args.sizes, rng)
+
+    db = Database(fake, get_settings().db_max_workers)
+    db._http = httpx.AsyncClient(transport=fake.http_transport(), base_url="http://fake-supabase")
+    app.dependency_overrides[get_db] = lambda: db
+
+    endpoints = [e for e in ENDPOINTS if not args.endpoints or e.name in args.endpoints]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for tenant in tenants:
+            for endpoint in endpoints:
+                results.append(await measure(
+                    client, fake, tenant, endpoint,
+                    args.requests, args.warmup, args.concurrency, rng
+                ))
+                print(f"  {endpoint.name} @ {tenant.size}", flush=True)
+
+    app.dependency_overrides.clear()
+    await db.close()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'commit': _git_commit(),
+                    'python': platform.python_version(),
+                    'latency_ms': args.latency_ms,
+                    'jitter_ms': args.jitter_ms,
+                    'requests': args.requests,
+                    'concurrency': args.concurrency,
+                    'sizes': args.sizes,
+                },
+                'results': results,
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,515 @@
+"""
+In-memory stand-in for the supabase-py client, for benchmarks.
+
+Implements the part of the table/rpc/storage builder API the app uses, on
+top of plain lists of dicts. Every execute() blocks for the configured
+latency, the way a PostgREST round trip blocks supabase-py, and is counted
+so benchmarks can report round trips per request. Storage objects are
+served to Database.http through an httpx.MockTransport with the same
+latency.
+
+Faults can be injected to exercise timeouts, retries and circuit breaking:
+error_rate is the share of round trips that fail with a 503, stall_rate
+the share that hang for stall_seconds, and fail_next fails that many round
+trips outright before the random faults apply.
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+import httpx
+
+# (table, embedded table) -> (cardinality, local column, remote column)
+RELATIONS = {
+    ('contracts', 'services'): ('many', 'id', 'contract_id'),
+    ('contracts', 'apps'): ('one', 'company_app_id', 'id'),
+    ('services', 'contracts'): ('one', 'contract_id', 'id'),
+    ('company_apps', 'apps'): ('one', 'app_id', 'id'),
+}
+
+Row = Dict[str, Any]
+Predicate = Callable[[Row], bool]
+
+class FakeAPIError(Exception):
+    """Mimics postgrest.exceptions.APIError closely enough for the services"""
+
+    def __init__(self, message: str, code: str = 'P0001'):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+def _split_top_level(expr: str) -> List[str]:
+    parts, depth, current = [], 0, ''
+    for char in expr:
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        depth += (char == '(') - (char == ')')
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+def _coerce(value: str, like: Any) -> Any:
+    if isinstance(like, bool):
+        return value == 'true'
+    if isinstance(like, (int, float)):
+        return float(value)
+    return value
+
+def _lookup(row: Row, column: str) -> Any:
+    # Filters on embedded resources look like "apps.category"
+    if '.' in column:
+        embedded, column = column.split('.', 1)
+        row = row.get(embedded) or {}
+    return row.get(column)
+
+def _compare(op: str, current: Any, value: Any) -> bool:
+    if op == 'is':
+        return current is None if value in (None, 'null') else current == (value in (True, 'true'))
+    if current is None:
+        return False
+    if op == 'in':
+        return current in value
+    if op in ('like', 'ilike'):
+        pattern = re.escape(str(value)).replace('%', '.*').replace('\\*', '.*')
+        return re.fullmatch(pattern, str(current), re.IGNORECASE if op == 'ilike' else 0) is not None
+    if not isinstance(value, (list, tuple, set)) and isinstance(value, str):
+        value = _coerce(value, current)
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        value = float(value)
+    else:
+        current, value = str(current), str(value)
+    return {
+        'eq': current == value,
+        'neq': current != value,
+        'gt': current > value,
+        'gte': current >= value,
+        'lt': current < value,
+        'lte': current <= value,
+    }[op]
+
+def _parse_logic(expr: str) -> Predicate:
+    """Parse a PostgREST or=/and= tree such as 'a.gt.1,and(a.eq.1,id.gt.x)'"""
+    predicates = []
+    for part in _split_top_level(expr):
+        part = part.strip()
+        for combinator, reducer in (('and(', all), ('or(', any)):
+            if part.startswith(combinator):
+                inner = [_parse_logic(p) for p in _split_top_level(part[len(combinator):-1])]
+                predicates.append(lambda row, inner=inner, reducer=reducer: reducer(p(row) for p in inner))
+                break
+        else:
+            column, op, value = part.split('.', 2)
+            if op == 'in':
+                value = set(value.strip('()').split(','))
+            predicates.append(lambda row, c=column, o=op, v=value: _compare(o, _lookup(row, c), v))
+    return lambda row: any(p(row) for p in predicates)
+
+def _parse_select(columns: str) -> Tuple[List[str], List[Tuple[str, bool, str]]]:
+    """Split a select string into plain columns and (table, inner, columns) embeds"""
+    plain, embeds = [], []
+    for part in _split_top_level(columns):
+        part = part.strip()
+        match = re.fullmatch(r'(\w+)(!inner)?\((.*)\)', part)
+        if match:
+            embeds.append((match.group(1), bool(match.group(2)), match.group(3)))
+        elif part:
+            plain.append(part)
+    return plain, embeds
+
+class FakeQuery:
+    """Chainable query builder executed against FakeSupabase tables"""
+
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.op = 'select'
+        self.columns = '*'
+        self.payload: Any = None
+        self.filters: List[Predicate] = []
+        self.orders: List[Tuple[str, bool, Optional[bool]]] = []
+        self.limit_count: Optional[int] = None
+        self.offset = 0
+        self.count: Optional[str] = None
+        self.single_row: Optional[str] = None
+        self.on_conflict = 'id'
+        self.ignore_duplicates = False
+        self.request = SimpleNamespace(http_method='GET', path=f"/rest/v1/{table}")
+
+    def _method(self, method: str) -> "FakeQuery":
+        self.request.http_method = method
+        return self
+
+    # Operations
+    def select(self, columns: str = '*', count: Optional[str] = None) -> "FakeQuery":
+        self.columns, self.count = columns, count
+        return self
+
+    def insert(self, rows: Any) -> "FakeQuery":
+        self.op, self.payload = 'insert', rows
+        return self._method('POST')
+
+    def upsert(self, rows: Any, on_conflict: str = 'id', ignore_duplicates: bool = False) -> "FakeQuery":
+        self.op, self.payload = 'upsert', rows
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self._method('POST')
+
+    def update(self, values: Row) -> "FakeQuery":
+        self.op, self.payload = 'update', values
+        return self._method('PATCH')
+
+    def delete(self) -> "FakeQuery":
+        self.op = 'delete'
+        return self._method('DELETE')
+
+    # Filters
+    def _filter(self, op: str, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: _compare(op, _lookup(row, column), value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('eq', column, value)
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('neq', column, value)
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('gt', column, value)
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('gte', column, value)
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('lt', column, value)
+
+    def lte(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('lte', column, value)
+
+    def is_(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter('is', column, value)
+
+    def ilike(self, column: str, pattern: str) -> "FakeQuery":
+        return self._filter('ilike', column, pattern)
+
+    def in_(self, column: str, values: List[Any]) -> "FakeQuery":
+        return self._filter('in', column, set(values))
+
+    def or_(self, expr: str) -> "FakeQuery":
+        self.filters.append(_parse_logic(expr))
+        return self
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None) -> "FakeQuery":
+        self.orders.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self.limit_count = count
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self.offset, self.limit_count = start, end - start + 1
+        return self
+
+    def single(self) -> "FakeQuery":
+        self.single_row = 'single'
+        return self
+
+    def maybe_single(self) -> "FakeQuery":
+        self.single_row = 'maybe'
+        return self
+
+    def execute(self) -> Any:
+        self.client.round_trip()
+        with self.client.lock:
+            return self.client.run_query(self)
+
+class FakeRPC:
+    def __init__(self, client: "FakeSupabase", fn: str, params: Row):
+        self.client = client
+        self.fn = fn
+        self.params = params
+        self.request = SimpleNamespace(http_method='POST', path=f"/rest/v1/rpc/{fn}")
+
+    def execute(self) -> Any:
+        self.client.round_trip()
+        with self.client.lock:
+            handler = self.client.functions.get(self.fn)
+            if handler is None:
+                raise FakeAPIError(f"Could not find the function {self.fn}", code='PGRST202')
+            return SimpleNamespace(data=handler(self.client, self.params), count=None)
+
+class FakeBucket:
+    def __init__(self, client: "FakeSupabase", bucket: str):
+        self.client = client
+        self.bucket = bucket
+
+    def upload(self, path: str, file: bytes, file_options: Optional[dict] = None):
+        self.client.round_trip()
+        self.client.objects[(self.bucket, path)] = bytes(file)
+        return SimpleNamespace(path=path)
+
+    def download(self, path: str) -> bytes:
+        self.client.round_trip()
+        return self.client.objects[(self.bucket, path)]
+
+    def remove(self, paths: List[str]):
+        self.client.round_trip()
+        for path in paths:
+            self.client.objects.pop((self.bucket, path), None)
+        return []
+
+    def get_public_url(self, path: str) -> str:
+        return f"http://fake-supabase/storage/v1/object/public/{self.bucket}/{path}"
+
+class FakeStorage:
+    def __init__(self, client: "FakeSupabase"):
+        self.client = client
+
+    def from_(self, bucket: str) -> FakeBucket:
+        return FakeBucket(self.client, bucket)
+
+def _create_contract_with_services(client: "FakeSupabase", params: Row) -> Row:
+    contract = client.insert_row('contracts', dict(params['p_contract']))
+    contract['services'] = [
+        client.insert_row('services', {**service, 'contract_id': contract['id']})
+        for service in params.get('p_services') or []
+    ]
+    return contract
+
+class FakeSupabase:
+    """
+    Tables are plain lists of dicts keyed by name. latency_ms (plus up to
+    jitter_ms) is slept on every round trip; round_trips counts them, and
+    faults counts the ones that were made to fail or stall.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        seed: int = 0,
+        error_rate: float = 0,
+        stall_rate: float = 0,
+        stall_seconds: float = 30
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.fail_next = 0
+        self.faults = 0
+        self.tables: Dict[str, List[Row]] = {}
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.functions: Dict[str, Callable[["FakeSupabase", Row], Any]] = {
+            'create_contract_with_services': _create_contract_with_services,
+        }
+        self.round_trips = 0
+        self.lock = threading.RLock()
+        self.storage = FakeStorage(self)
+        self._random = random.Random(seed)
+
+    # Client API
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, fn: str, params: Row) -> FakeRPC:
+        return FakeRPC(self, fn, params)
+
+    # Latency and accounting
+    def _delay(self) -> float:
+        return (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+
+    def _fault(self) -> Optional[str]:
+        """'error', 'stall' or None for the current round trip; call with the lock held"""
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            fault = 'error'
+        else:
+            roll = self._random.random()
+            if roll < self.error_rate:
+                fault = 'error'
+            elif roll < self.error_rate + self.stall_rate:
+                fault = 'stall'
+            else:
+                return None
+        self.faults += 1
+        return fault
+
+    def round_trip(self):
+        with self.lock:
+            self.round_trips += 1
+            delay = self._delay()
+            fault = self._fault()
+        if fault == 'stall':
+            delay += self.stall_seconds
+        if delay:
+            time.sleep(delay)
+        if fault == 'error':
+            raise FakeAPIError("Service Unavailable", code='503')
+
+    # Storage over HTTP, for Database.http
+    def http_transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            with self.lock:
+                self.round_trips += 1
+                delay = self._delay()
+                fault = self._fault()
+            if fault == 'stall':
+                delay += self.stall_seconds
+            if delay:
+                await asyncio.sleep(delay)
+            if fault == 'error':
+                return httpx.Response(503, json={"error": "Service Unavailable"})
+
+            match = re.match(r'/storage/v1/object/([^/]+)/(.+)', request.url.path)
+            if not match:
+                return httpx.Response(404, json={"error": "not found"})
+            key = (match.group(1), unquote(match.group(2)))
+
+            if request.method == 'POST':
+                self.objects[key] = await request.aread()
+                return httpx.Response(200, json={"Key": '/'.join(key)})
+
+            if request.method == 'DELETE':
+                if self.objects.pop(key, None) is None:
+                    return httpx.Response(404, json={"error": "not found"})
+                return httpx.Response(200, json={"message": "Successfully deleted"})
+
+            content = self.objects.get(key)
+            if content is None:
+                return httpx.Response(404, json={"error": "not found"})
+            byte_range = re.fullmatch(r'bytes=(\d+)-(\d*)', request.headers.get('range', ''))
+            if byte_range:
+                start = int(byte_range.group(1))
+                end = int(byte_range.group(2) or len(content) - 1)
+                return httpx.Response(206, content=content[start:end + 1], headers={
+                    'content-range': f"bytes {start}-{end}/{len(content)}",
+                    'accept-ranges': 'bytes',
+                })
+            return httpx.Response(200, content=content, headers={'accept-ranges': 'bytes'})
+
+        return httpx.MockTransport(handler)
+
+    # Data
+    def insert_row(self, table: str, row: Row) -> Row:
+        row = {'id': str(uuid.uuid4()), 'created_at': _now(), 'updated_at': _now(), **row}
+        self.tables.setdefault(table, []).append(row)
+        return dict(row)
+
+    def _related(self, table: str, name: str, indexes: dict) -> Dict[Any, List[Row]]:
+        # Rows of an embedded table grouped by the join column, built once per query
+        if (table, name) not in indexes:
+            _, _, remote = RELATIONS[(table, name)]
+            grouped: Dict[Any, List[Row]] = {}
+            for row in self.tables.get(name, []):
+                grouped.setdefault(row.get(remote), []).append(row)
+            indexes[(table, name)] = grouped
+        return indexes[(table, name)]
+
+    def _embed(self, table: str, row: Row, embeds, indexes: dict) -> Optional[Row]:
+        row = dict(row)
+        for name, inner, columns in embeds:
+            cardinality, local, _ = RELATIONS[(table, name)]
+            plain, nested = _parse_select(columns)
+            related = [
+                self._project(name, r, plain, nested, indexes)
+                for r in self._related(table, name, indexes).get(row.get(local), [])
+            ]
+            if cardinality == 'one':
+                row[name] = related[0] if related else None
+                if inner and row[name] is None:
+                    return None
+            else:
+                row[name] = related
+                if inner and not related:
+                    return None
+        return row
+
+    def _project(self, table: str, row: Row, plain: List[str], embeds, indexes: dict) -> Row:
+        projected = dict(row) if '*' in plain or not plain else {c: row.get(c) for c in plain}
+        if embeds:
+            embedded = self._embed(table, row, embeds, indexes)
+            for name, _, _ in embeds:
+                projected[name] = embedded[name] if embedded else None
+        return projected
+
+    def _sort(self, rows: List[Row], orders) -> List[Row]:
+        for column, desc, nullsfirst in reversed(orders):
+            # Postgres puts NULLs last ascending and first descending by default
+            nulls_first = desc if nullsfirst is None else nullsfirst
+            present = sorted((r for r in rows if r.get(column) is not None), key=lambda r: r[column], reverse=desc)
+            missing = [r for r in rows if r.get(column) is None]
+            rows = missing + present if nulls_first else present + missing
+        return rows
+
+    def _write(self, query: FakeQuery) -> List[Row]:
+        table = self.tables.setdefault(query.table, [])
+        rows = query.payload if isinstance(query.payload, list) else [query.payload]
+
+        if query.op == 'insert':
+            return [self.insert_row(query.table, dict(row)) for row in rows]
+
+        keys = query.on_conflict.split(',')
+        written = []
+        for row in rows:
+            existing = next((r for r in table if all(r.get(k) == row.get(k) for k in keys)), None)
+            if existing is None:
+                written.append(self.insert_row(query.table, dict(row)))
+            elif not query.ignore_duplicates:
+                existing.update(row, updated_at=_now())
+                written.append(dict(existing))
+        return written
+
+    def run_query(self, query: FakeQuery) -> Any:
+        if query.op in ('insert', 'upsert'):
+            return SimpleNamespace(data=self._write(query), count=None)
+
+        plain, embeds = _parse_select(query.columns)
+        table = self.tables.setdefault(query.table, [])
+        indexes: dict = {}
+        # Only inner embeds can drop rows or be filtered on; the rest are
+        # attached to the returned page alone
+        inner = [embed for embed in embeds if embed[1]]
+        candidates = []
+        for row in table:
+            view = self._embed(query.table, row, inner, indexes) if inner else row
+            if view is not None and all(f(view) for f in query.filters):
+                candidates.append((row, view))
+
+        if query.op == 'update':
+            for row, _ in candidates:
+                row.update(query.payload)
+            # Like return=representation, the select (and its embeds) shapes the result
+            data = [self._project(query.table, row, plain, embeds, indexes) for row, _ in candidates]
+            return SimpleNamespace(data=data, count=None)
+
+        if query.op == 'delete':
+            doomed = {id(row) for row, _ in candidates}
+            self.tables[query.table] = [row for row in table if id(row) not in doomed]
+            return SimpleNamespace(data=[dict(row) for row, _ in candidates], count=None)
+
+        total = len(candidates)
+        rows = self._sort([row for row, _ in candidates], query.orders)
+        end = None if query.limit_count is None else query.offset + query.limit_count
+        rows = [self._project(query.table, row, plain, embeds, indexes) for row in rows[query.offset:end]]
+
+        if query.single_row:
+            if not rows:
+                if query.single_row == 'maybe':
+                    return None
+                raise FakeAPIError("JSON object requested, multiple (or no) rows returned", code='PGRST116')
+            return SimpleNamespace(data=rows[0], count=total if query.count else None)
+        return SimpleNamespace(data=rows, count=total if query.count else None)
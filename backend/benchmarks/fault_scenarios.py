@@ -0,0 +1,202 @@
+"""
+Checks timeouts, retries, hedging and circuit breaking against injected faults.
+
+Drives the FastAPI app in-process against FakeSupabase (fake_supabase.py)
+configured to fail or stall a share of round trips, with the Database
+calls going through an OutboundPolicy like in production. Each scenario
+states what it expects; the script exits 1 if any expectation is not met.
+
+    python benchmarks/fault_scenarios.py
+    python benchmarks/fault_scenarios.py --scenarios outage --requests 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Awaitable, Callable, List, NamedTuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, 'scripts'))
+# The fake client never talks to Supabase, but settings still require these
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+import httpx
+from app.database import Database, get_db
+from app.main import app
+from app.utils.resilience import CircuitBreaker, OutboundPolicy
+from bench_endpoints import Tenant, _contract_body, percentile, seed
+from fake_supabase import FakeSupabase
+
+# Stalled round trips block a worker thread until they end, so leave room
+MAX_WORKERS = 64
+
+class Scenario(NamedTuple):
+    name: str
+    description: str
+    run: Callable[[httpx.AsyncClient, FakeSupabase, Tenant, int], Awaitable[List[str]]]
+    fake: dict
+    policy: dict
+
+async def _get_contracts(
+    client: httpx.AsyncClient,
+    tenant: Tenant,
+    requests: int,
+    rng: random.Random
+) -> List[tuple]:
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(f"/api/contracts/{rng.choice(tenant.contract_ids)}")
+        samples.append((time.perf_counter() - started, response.status_code))
+    return samples
+
+def _summary(samples: List[tuple]) -> tuple:
+    latencies = [latency for latency, _ in samples]
+    succeeded = sum(1 for _, status in samples if status == 200)
+    return succeeded, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+async def errors(client, fake, tenant, requests) -> List[str]:
+    samples = await _get_contracts(client, tenant, requests, random.Random(1))
+    succeeded, _, _ = _summary(samples)
+    # Three attempts at a 20% error rate fail together 0.8% of the time
+    if succeeded < requests * 0.97:
+        return [f"only {succeeded}/{requests} reads succeeded despite retries"]
+    return []
+
+async def stalls(client, fake, tenant, requests) -> List[str]:
+    samples = await _get_contracts(client, tenant, requests, random.Random(2))
+    succeeded, _, p99 = _summary(samples)
+    failures = []
+    if succeeded < requests * 0.99:
+        failures.append(f"only {succeeded}/{requests} reads succeeded")
+    if p99 > 1000:
+        failures.append(f"p99 {p99:.0f}ms; stalled calls were not cut off by the deadline")
+    return failures
+
+async def hedging(client, fake, tenant, requests) -> List[str]:
+    samples = await _get_contracts(client, tenant, requests, random.Random(3))
+    _, _, p99 = _summary(samples)
+    if p99 > fake.stall_seconds * 1000 / 2:
+        return [f"p99 {p99:.0f}ms; slow reads were not hedged"]
+    return []
+
+async def outage(client, fake, tenant, requests) -> List[str]:
+    failures = []
+    fake.fail_next = 10 ** 9
+    samples = await _get_contracts(client, tenant, requests, random.Random(4))
+    if fake.faults > 10:
+        failures.append(f"{fake.faults} calls reached the failing dependency; the circuit did not open")
+    rejected = [latency for latency, _ in samples[10:]]
+    if rejected and max(rejected) > 0.05:
+        failures.append(f"calls took up to {max(rejected) * 1000:.0f}ms while the circuit was open")
+    statuses = {status for _, status in samples[10:]}
+    if statuses - {503}:
+        failures.append(f"got {sorted(statuses)} while the circuit was open, expected 503")
+    response = await client.get(f"/api/contracts/company/{tenant.company_id}")
+    if response.status_code != 503 or 'retry-after' not in response.headers:
+        failures.append(f"listing got {response.status_code} without Retry-After while the circuit was open")
+
+    # Recovery: once the dependency is back and the circuit has cooled down, reads work again
+    fake.fail_next = 0
+    await asyncio.sleep(1.1)
+    samples = await _get_contracts(client, tenant, 5, random.Random(5))
+    if any(status != 200 for _, status in samples):
+        failures.append("reads still failing after the dependency recovered")
+    return failures
+
+async def writes(client, fake, tenant, requests) -> List[str]:
+    # Creating a contract is a single RPC; make exactly that round trip fail
+    fake.fail_next = 1
+    before = fake.round_trips
+    response = await client.post("/api/contracts", **_contract_body(tenant, random.Random(6)))
+    if response.status_code == 200:
+        return ["write succeeded although its round trip failed"]
+    if fake.round_trips - before != 1:
+        return [f"{fake.round_trips - before} round trips; a failed write was retried"]
+    return []
+
+SCENARIOS = [
+    Scenario(
+        "errors", "20% of round trips fail with 503; reads are retried",
+        errors, {'error_rate': 0.2}, {'retries': 2}
+    ),
+    Scenario(
+        "stalls", "5% of round trips hang for 2s; a 200ms deadline cuts them off",
+        stalls, {'stall_rate': 0.05, 'stall_seconds': 2}, {'timeout': 0.2, 'retries': 2}
+    ),
+    Scenario(
+        "hedging", "5% of round trips take 500ms; a duplicate read starts after 50ms",
+        hedging, {'stall_rate': 0.05, 'stall_seconds': 0.5}, {'timeout': 2, 'hedge_after': 0.05}
+    ),
+    Scenario(
+        "outage", "every round trip fails; the circuit opens, fails fast and recovers",
+        outage, {}, {'retries': 0, 'breaker': (5, 1.0)}
+    ),
+    Scenario(
+        "writes", "failed writes are not retried",
+        writes, {}, {'retries': 2}
+    ),
+]
+
+async def run_scenario(scenario: Scenario, tenant: Tenant, base: FakeSupabase, requests: int) -> dict:
+    fake = FakeSupabase(latency_ms=1, seed=7, **scenario.fake)
+    fake.tables, fake.objects = base.tables, base.objects
+
+    options = dict(scenario.policy)
+    breaker = options.pop('breaker', (10 ** 6, 0))
+    policy = OutboundPolicy(
+        "supabase",
+        timeout=options.pop('timeout', 5),
+        backoff_seconds=0.01,
+        breaker=CircuitBreaker("supabase", *breaker),
+        **options
+    )
+    db = Database(fake, MAX_WORKERS, policy=policy)
+    app.dependency_overrides[get_db] = lambda: db
+
+    started = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://faults") as client:
+            failures = await scenario.run(client, fake, tenant, requests)
+    finally:
+        app.dependency_overrides.clear()
+        await db.close()
+
+    return {
+        'scenario': scenario.name,
+        'seconds': time.perf_counter() - started,
+        'round_trips': fake.round_trips,
+        'faults': fake.faults,
+        'failures': failures
+    }
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", help="only run these scenarios")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    args = parser.parse_args()
+
+    base = FakeSupabase()
+    tenant = seed(base, [50], random.Random(1))[0]
+
+    failed = 0
+    print(f"{'scenario':<10} {'seconds':>8} {'trips':>6} {'faults':>6}  result")
+    for scenario in SCENARIOS:
+        if args.scenarios and scenario.name not in args.scenarios:
+            continue
+        outcome = await run_scenario(scenario, tenant, base, args.requests)
+        status = "ok" if not outcome['failures'] else "FAILED: " + "; ".join(outcome['failures'])
+        print(
+            f"{outcome['scenario']:<10} {outcome['seconds']:>8.2f} {outcome['round_trips']:>6} "
+            f"{outcome['faults']:>6}  {status}"
+        )
+        print(f"{'':<10} {scenario.description}")
+        failed += bool(outcome['failures'])
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,68 @@
+-- Tables used by the contract services. 003 (create_contract_with_services)
+-- and 004 (spend aggregates) are typed against them, so they must exist
+-- first. Projects that created the tables by hand keep them as they are.
+
+-- Create companies table
+CREATE TABLE IF NOT EXISTS companies (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    name TEXT NOT NULL UNIQUE,
+    access_code TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- Create contracts table
+CREATE TABLE IF NOT EXISTS contracts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    company_id UUID NOT NULL REFERENCES companies(id) ON DELETE CASCADE,
+    -- The app must be selected when the contract is created (checked by
+    -- create_contract_with_services), but unselecting it later keeps the contract
+    company_app_id UUID NOT NULL REFERENCES apps(id),
+    renewal_date DATE,
+    review_date DATE,
+    overall_total_value NUMERIC(14, 2) CHECK (overall_total_value >= 0),
+    contract_file_url TEXT,
+    contract_file_path TEXT,
+    notes TEXT,
+    contact_details TEXT,
+    stitchflow_connection TEXT NOT NULL DEFAULT 'CSV Upload/API coming soon',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- An earlier version of this migration also referenced company_apps, which
+-- made unselecting an app with contracts fail
+ALTER TABLE contracts DROP CONSTRAINT IF EXISTS contracts_company_id_company_app_id_fkey;
+
+-- Create services table
+CREATE TABLE IF NOT EXISTS services (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    contract_id UUID NOT NULL REFERENCES contracts(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    license_type TEXT NOT NULL CHECK (license_type IN ('Monthly', 'Annual', 'Quarterly', 'Other')),
+    pricing_model TEXT NOT NULL CHECK (pricing_model IN ('Flat rated', 'Tiered', 'Pro-rated', 'Feature based')),
+    cost_per_user NUMERIC(14, 2) CHECK (cost_per_user >= 0),
+    number_of_licenses INTEGER CHECK (number_of_licenses >= 0),
+    total_cost NUMERIC(14, 2) CHECK (total_cost >= 0),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+-- Add triggers for updated_at
+DROP TRIGGER IF EXISTS update_companies_updated_at ON companies;
+CREATE TRIGGER update_companies_updated_at
+    BEFORE UPDATE ON companies
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_contracts_updated_at ON contracts;
+CREATE TRIGGER update_contracts_updated_at
+    BEFORE UPDATE ON contracts
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_services_updated_at ON services;
+CREATE TRIGGER update_services_updated_at
+    BEFORE UPDATE ON services
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,83 @@
+-- Create a contract and its services atomically in one round trip.
+-- Called through PostgREST RPC by ContractService.create_contract; PostgREST
+-- runs each RPC in a single transaction, so a failure while inserting the
+-- services rolls back the contract as well.
+
+CREATE OR REPLACE FUNCTION create_contract_with_services(
+    p_contract JSONB,
+    p_services JSONB DEFAULT '[]'::JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    new_contract contracts%ROWTYPE;
+    new_services JSONB;
+BEGIN
+    -- The app must be selected by the company the contract belongs to
+    IF NOT EXISTS (
+        SELECT 1 FROM company_apps
+        WHERE company_id = (p_contract->>'company_id')::UUID
+        AND app_id = (p_contract->>'company_app_id')::UUID
+    ) THEN
+        RAISE EXCEPTION 'Invalid company_app_id'
+            USING ERRCODE = '22023';
+    END IF;
+
+    INSERT INTO contracts (
+        company_id,
+        company_app_id,
+        renewal_date,
+        review_date,
+        overall_total_value,
+        contract_file_url,
+        notes,
+        contact_details,
+        stitchflow_connection,
+        contract_file_path
+    )
+    SELECT
+        c.company_id,
+        c.company_app_id,
+        c.renewal_date,
+        c.review_date,
+        c.overall_total_value,
+        c.contract_file_url,
+        c.notes,
+        c.contact_details,
+        COALESCE(c.stitchflow_connection, 'CSV Upload/API coming soon'),
+        c.contract_file_path
+    FROM jsonb_populate_record(NULL::contracts, p_contract) AS c
+    RETURNING * INTO new_contract;
+
+    WITH inserted AS (
+        INSERT INTO services (
+            contract_id,
+            name,
+            license_type,
+            pricing_model,
+            cost_per_user,
+            number_of_licenses,
+            total_cost
+        )
+        SELECT
+            new_contract.id,
+            s.name,
+            s.license_type,
+            s.pricing_model,
+            s.cost_per_user,
+            s.number_of_licenses,
+            s.total_cost
+        FROM jsonb_populate_recordset(NULL::services, COALESCE(p_services, '[]'::JSONB)) AS s
+        RETURNING *
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::JSONB)
+    INTO new_services
+    FROM inserted;
+
+    RETURN to_jsonb(new_contract) || jsonb_build_object('services', new_services);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION create_contract_with_services(JSONB, JSONB)
+    TO authenticated, service_role;
@@ -0,0 +1,207 @@
+-- Incrementally maintained spend aggregates per company.
+-- Triggers on contracts and services apply each row change as a delta, so
+-- GET /api/analytics/company/{company_id} reads a handful of summary rows
+-- instead of re-aggregating every contract and service.
+--
+-- Dimensions and buckets:
+--   category        app category of the contract     (contracts)
+--   renewal_month   YYYY-MM of renewal_date, or none  (contracts)
+--   license_type    service license type              (services)
+--   total           'contracts' or 'services'         (both)
+
+CREATE TABLE IF NOT EXISTS company_spend_aggregates (
+    company_id UUID NOT NULL,
+    dimension TEXT NOT NULL CHECK (dimension IN ('category', 'renewal_month', 'license_type', 'total')),
+    bucket TEXT NOT NULL,
+    total_value NUMERIC(16, 2) NOT NULL DEFAULT 0,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    license_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (company_id, dimension, bucket)
+);
+
+-- Add a delta to one aggregate row, dropping rows that no longer count anything
+CREATE OR REPLACE FUNCTION bump_spend_aggregate(
+    p_company_id UUID,
+    p_dimension TEXT,
+    p_bucket TEXT,
+    p_value NUMERIC,
+    p_count INTEGER,
+    p_licenses BIGINT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO company_spend_aggregates AS a
+        (company_id, dimension, bucket, total_value, item_count, license_count)
+    VALUES
+        (p_company_id, p_dimension, p_bucket, COALESCE(p_value, 0), p_count, COALESCE(p_licenses, 0))
+    ON CONFLICT (company_id, dimension, bucket) DO UPDATE SET
+        total_value = a.total_value + EXCLUDED.total_value,
+        item_count = a.item_count + EXCLUDED.item_count,
+        license_count = a.license_count + EXCLUDED.license_count,
+        updated_at = TIMEZONE('utc'::text, NOW());
+
+    DELETE FROM company_spend_aggregates
+    WHERE company_id = p_company_id
+    AND dimension = p_dimension
+    AND bucket = p_bucket
+    AND item_count <= 0;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION contract_spend_bucket_category(p_company_app_id UUID)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    SELECT COALESCE(
+        (SELECT category::TEXT FROM apps WHERE id = p_company_app_id),
+        'Uncategorized'
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION contract_spend_bucket_month(p_renewal_date DATE)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(TO_CHAR(p_renewal_date, 'YYYY-MM'), 'none');
+$$;
+
+-- Apply a contract row to the aggregates with the given sign (+1 or -1)
+CREATE OR REPLACE FUNCTION apply_contract_spend(c contracts, sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM bump_spend_aggregate(
+        c.company_id, 'category', contract_spend_bucket_category(c.company_app_id),
+        sign * c.overall_total_value, sign, 0
+    );
+    PERFORM bump_spend_aggregate(
+        c.company_id, 'renewal_month', contract_spend_bucket_month(c.renewal_date),
+        sign * c.overall_total_value, sign, 0
+    );
+    PERFORM bump_spend_aggregate(
+        c.company_id, 'total', 'contracts',
+        sign * c.overall_total_value, sign, 0
+    );
+END;
+$$;
+
+-- Apply a service row to the aggregates with the given sign (+1 or -1)
+CREATE OR REPLACE FUNCTION apply_service_spend(p_company_id UUID, s services, sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    PERFORM bump_spend_aggregate(
+        p_company_id, 'license_type', s.license_type::TEXT,
+        sign * s.total_cost, sign, sign * s.number_of_licenses
+    );
+    PERFORM bump_spend_aggregate(
+        p_company_id, 'total', 'services',
+        sign * s.total_cost, sign, sign * s.number_of_licenses
+    );
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION track_contract_spend()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    s services;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- Runs BEFORE DELETE: the services removed by ON DELETE CASCADE are
+        -- still visible here, and their own triggers can no longer find the
+        -- contract's company afterwards
+        FOR s IN SELECT * FROM services WHERE contract_id = OLD.id LOOP
+            PERFORM apply_service_spend(OLD.company_id, s, -1);
+        END LOOP;
+        PERFORM apply_contract_spend(OLD, -1);
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM apply_contract_spend(OLD, -1);
+    END IF;
+    PERFORM apply_contract_spend(NEW, 1);
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION track_service_spend()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    old_company UUID;
+    new_company UUID;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT company_id INTO old_company FROM contracts WHERE id = OLD.contract_id;
+        -- A missing contract means a cascading delete already accounted for it
+        IF old_company IS NOT NULL THEN
+            PERFORM apply_service_spend(old_company, OLD, -1);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT company_id INTO new_company FROM contracts WHERE id = NEW.contract_id;
+        IF new_company IS NOT NULL THEN
+            PERFORM apply_service_spend(new_company, NEW, 1);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS track_contract_spend_write ON contracts;
+CREATE TRIGGER track_contract_spend_write
+    AFTER INSERT OR UPDATE ON contracts
+    FOR EACH ROW
+    EXECUTE FUNCTION track_contract_spend();
+
+DROP TRIGGER IF EXISTS track_contract_spend_delete ON contracts;
+CREATE TRIGGER track_contract_spend_delete
+    BEFORE DELETE ON contracts
+    FOR EACH ROW
+    EXECUTE FUNCTION track_contract_spend();
+
+DROP TRIGGER IF EXISTS track_service_spend ON services;
+CREATE TRIGGER track_service_spend
+    AFTER INSERT OR UPDATE OR DELETE ON services
+    FOR EACH ROW
+    EXECUTE FUNCTION track_service_spend();
+
+-- Backfill from the rows that already exist
+TRUNCATE company_spend_aggregates;
+
+SELECT apply_contract_spend(c, 1) FROM contracts c;
+
+SELECT apply_service_spend(c.company_id, s, 1)
+FROM services s
+JOIN contracts c ON c.id = s.contract_id;
+
+ALTER TABLE company_spend_aggregates ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Spend aggregates are viewable by everyone." ON company_spend_aggregates;
+CREATE POLICY "Spend aggregates are viewable by everyone."
+    ON company_spend_aggregates FOR SELECT
+    USING (true);
@@ -0,0 +1,50 @@
+-- Indexes behind the hot queries of the contract services. Everything here
+-- is idempotent, so only missing indexes are added.
+--
+-- Query -> index:
+--   company login (name + access_code)          companies_name_access_code_idx
+--   company contract list, keyset by renewal     contracts_company_renewal_idx
+--   company contract list, keyset by review      contracts_company_review_idx
+--   company contract list, keyset by value       contracts_company_value_idx
+--   reminder scheduler load (upcoming dates)     contracts_renewal_date_idx, contracts_review_date_idx
+--   services embedded into contracts             services_contract_id_idx
+--   app search (ilike '%term%')                  apps_name_trgm_idx
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Indexes
+CREATE INDEX IF NOT EXISTS companies_name_access_code_idx
+    ON companies (name, access_code);
+
+-- Each company_id index ends in id to match the keyset tiebreak, so a page
+-- is a single index range scan in either sort order
+CREATE INDEX IF NOT EXISTS contracts_company_renewal_idx
+    ON contracts (company_id, renewal_date, id);
+
+CREATE INDEX IF NOT EXISTS contracts_company_review_idx
+    ON contracts (company_id, review_date, id);
+
+CREATE INDEX IF NOT EXISTS contracts_company_value_idx
+    ON contracts (company_id, overall_total_value DESC NULLS LAST, id);
+
+CREATE INDEX IF NOT EXISTS contracts_renewal_date_idx
+    ON contracts (renewal_date)
+    WHERE renewal_date IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS contracts_review_date_idx
+    ON contracts (review_date)
+    WHERE review_date IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS contracts_company_app_id_idx
+    ON contracts (company_app_id);
+
+CREATE INDEX IF NOT EXISTS services_contract_id_idx
+    ON services (contract_id);
+
+CREATE INDEX IF NOT EXISTS apps_name_trgm_idx
+    ON apps USING GIN (name gin_trgm_ops);
+
+ANALYZE companies;
+ANALYZE contracts;
+ANALYZE services;
+ANALYZE apps;
@@ -0,0 +1,18 @@
+-- Reminders the scheduler has sent. A reminder is claimed here before it is
+-- emitted, so it goes out once across restarts and scheduler processes.
+
+CREATE TABLE IF NOT EXISTS reminders_sent (
+    contract_id UUID NOT NULL REFERENCES contracts(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL CHECK (kind IN ('review', 'renewal')),
+    due_date DATE NOT NULL,
+    sent_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL,
+    PRIMARY KEY (contract_id, kind, due_date)
+);
+
+-- The scheduler loads reminders that are still ahead on startup
+CREATE INDEX IF NOT EXISTS reminders_sent_due_date_idx
+    ON reminders_sent (due_date);
+
+-- The scheduler polls contracts by updated_at for changes made elsewhere
+CREATE INDEX IF NOT EXISTS contracts_updated_at_idx
+    ON contracts (updated_at, id);
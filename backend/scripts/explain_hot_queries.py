@@ -0,0 +1,242 @@
+"""
+EXPLAIN ANALYZE the API's hot queries against a Postgres database.
+
+Each query lists the indexes its plan is expected to use. The script exits
+non-zero when a plan uses none of them or falls back to a sequential scan of
+the table, so a dropped index or a query change that defeats it shows up
+before it reaches production.
+
+    python scripts/explain_hot_queries.py postgresql://postgres@localhost:5432/postgres --seed 20000
+
+The connection string defaults to $DATABASE_URL and the psql client must be
+installed. --seed inserts synthetic companies, apps, contracts and services
+first. Everything runs in one transaction that is rolled back, so the
+database is left as it was.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+MARKER = "@@query "
+
+# Contracts seeded per company, so tenant-scoped plans read a realistic slice
+CONTRACTS_PER_COMPANY = 1000
+SEED_APPS = 2000
+# Most tenants have few or no contracts; login still has to find them
+SEED_COMPANIES = 5000
+
+class HotQuery(NamedTuple):
+    name: str
+    sql: str
+    # The plan must use at least one of these; None only reports the plan
+    expected_indexes: Optional[Tuple[str, ...]]
+
+HOT_QUERIES = [
+    HotQuery(
+        "company_login",
+        "SELECT * FROM companies WHERE name = :'company_name' AND access_code = :'access_code'",
+        ("companies_name_access_code_idx", "companies_name_key")
+    ),
+    HotQuery(
+        "contracts_by_renewal",
+        "SELECT * FROM contracts WHERE company_id = :'company_id' "
+        "ORDER BY renewal_date ASC NULLS LAST, id LIMIT 51",
+        ("contracts_company_renewal_idx",)
+    ),
+    HotQuery(
+        "contracts_by_review",
+        "SELECT * FROM contracts WHERE company_id = :'company_id' "
+        "ORDER BY review_date ASC NULLS LAST, id LIMIT 51",
+        ("contracts_company_review_idx",)
+    ),
+    HotQuery(
+        "contracts_by_value",
+        "SELECT * FROM contracts WHERE company_id = :'company_id' "
+        "ORDER BY overall_total_value DESC NULLS LAST, id LIMIT 51",
+        ("contracts_company_value_idx",)
+    ),
+    HotQuery(
+        "contracts_renewing_soon",
+        "SELECT * FROM contracts WHERE company_id = :'company_id' "
+        "AND renewal_date >= CURRENT_DATE AND renewal_date <= CURRENT_DATE + 90 "
+        "ORDER BY renewal_date ASC NULLS LAST, id LIMIT 51",
+        ("contracts_company_renewal_idx",)
+    ),
+    HotQuery(
+        "contract_page_with_services",
+        "SELECT c.*, (SELECT json_agg(s) FROM services s WHERE s.contract_id = c.id) AS services "
+        "FROM contracts c WHERE c.company_id = :'company_id' "
+        "ORDER BY c.renewal_date ASC NULLS LAST, c.id LIMIT 51",
+        ("contracts_company_renewal_idx", "services_contract_id_idx")
+    ),
+    HotQuery(
+        "contract_services",
+        "SELECT * FROM services WHERE contract_id = :'contract_id'",
+        ("services_contract_id_idx",)
+    ),
+    # Reads every upcoming deadline, so a sequential scan can be the right plan
+    HotQuery(
+        "upcoming_deadlines",
+        "SELECT id, company_id, renewal_date, review_date FROM contracts "
+        "WHERE renewal_date >= CURRENT_DATE OR review_date >= CURRENT_DATE",
+        None
+    ),
+    # Small catalogs are cheaper to scan; the trigram index pays off as apps grow
+    HotQuery(
+        "app_search",
+        "SELECT * FROM apps WHERE name ILIKE '%' || :'app_term' || '%' ORDER BY name",
+        None
+    ),
+]
+
+def seed_sql(contracts: int) -> str:
+    with_contracts = max(1, contracts // CONTRACTS_PER_COMPANY)
+    return f"""
+INSERT INTO companies (name, access_code)
+SELECT 'seed-company-' || g, 'S' || lpad((g % 1000)::text, 3, '0')
+FROM generate_series(1, {max(SEED_COMPANIES, with_contracts)}) g;
+
+INSERT INTO apps (name, category, is_predefined)
+SELECT 'seed-app-' || g, (enum_range(NULL::app_category))[1 + g % 11], false
+FROM generate_series(1, {SEED_APPS}) g;
+
+CREATE TEMP TABLE seed_pairs ON COMMIT DROP AS
+SELECT c.id AS company_id, a.id AS app_id
+FROM (
+    SELECT id, row_number() OVER () AS n FROM companies WHERE name LIKE 'seed-company-%' LIMIT {with_contracts}
+) c
+JOIN (SELECT id, row_number() OVER () AS n FROM apps WHERE name LIKE 'seed-app-%') a
+    ON (a.n + c.n) % {SEED_APPS} < {CONTRACTS_PER_COMPANY};
+
+INSERT INTO company_apps (company_id, app_id)
+SELECT company_id, app_id FROM seed_pairs;
+
+INSERT INTO contracts (company_id, company_app_id, renewal_date, review_date, overall_total_value)
+SELECT
+    company_id,
+    app_id,
+    CASE WHEN random() < 0.9 THEN CURRENT_DATE + (random() * 730 - 365)::int END,
+    CASE WHEN random() < 0.5 THEN CURRENT_DATE + (random() * 365)::int END,
+    round((random() * 100000)::numeric, 2)
+FROM seed_pairs;
+
+INSERT INTO services (contract_id, name, license_type, pricing_model, cost_per_user, number_of_licenses, total_cost)
+SELECT c.id, 'seed-service-' || s, 'Annual', 'Flat rated', 10, s * 5, s * 50
+FROM contracts c
+JOIN (SELECT DISTINCT company_id FROM seed_pairs) p ON p.company_id = c.company_id
+CROSS JOIN generate_series(1, 3) s;
+
+ANALYZE companies;
+ANALYZE apps;
+ANALYZE company_apps;
+ANALYZE contracts;
+ANALYZE services;
+"""
+
+# Parameters for the queries, taken from the busiest company
+PARAMETERS_SQL = """
+SELECT company_id FROM contracts GROUP BY company_id ORDER BY count(*) DESC LIMIT 1 \\gset
+SELECT id AS contract_id FROM contracts WHERE company_id = :'company_id' LIMIT 1 \\gset
+SELECT name AS company_name, access_code FROM companies WHERE id = :'company_id' \\gset
+SELECT substr(lower(name), 1, 4) AS app_term FROM apps ORDER BY name LIMIT 1 \\gset
+"""
+
+def build_script(seed: int) -> str:
+    parts = ["\\set ON_ERROR_STOP on", "BEGIN;"]
+    if seed:
+        parts.append(seed_sql(seed))
+    parts.append(PARAMETERS_SQL)
+    for query in HOT_QUERIES:
+        parts.append(f"\\echo '{MARKER}{query.name}'")
+        parts.append(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query.sql};")
+    parts.append("ROLLBACK;")
+    return "\n".join(parts) + "\n"
+
+def run_psql(psql: str, database_url: str, script: str) -> Dict[str, dict]:
+    result = subprocess.run(
+        [psql, database_url, "--no-psqlrc", "--quiet", "--tuples-only", "--no-align", "--file", "-"],
+        input=script,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "psql failed")
+
+    plans: Dict[str, dict] = {}
+    name, lines = None, []
+    for line in result.stdout.splitlines() + [MARKER]:
+        if line.startswith(MARKER):
+            if name is not None:
+                plans[name] = json.loads("\n".join(lines))[0]
+            name, lines = line[len(MARKER):], []
+        elif name is not None:
+            lines.append(line)
+    return plans
+
+def plan_nodes(node: dict) -> List[dict]:
+    nodes = [node]
+    for child in node.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+def check(query: HotQuery, plan: dict) -> List[str]:
+    """Return the problems with a plan, empty when it is as expected"""
+    if query.expected_indexes is None:
+        return []
+
+    nodes = plan_nodes(plan["Plan"])
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    problems = []
+    if not used & set(query.expected_indexes):
+        problems.append(f"expected one of {', '.join(query.expected_indexes)}")
+    for node in nodes:
+        if node["Node Type"] == "Seq Scan":
+            problems.append(f"sequential scan on {node['Relation Name']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database_url", nargs="?", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--seed", type=int, default=0, help="synthetic contracts to insert before explaining")
+    parser.add_argument("--psql", default="psql", help="path to the psql client")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("pass a connection string or set DATABASE_URL")
+
+    try:
+        plans = run_psql(args.psql, args.database_url, build_script(args.seed))
+    except RuntimeError as e:
+        print(f"Error explaining queries: {e}")
+        if "\\gset" in str(e):
+            print("The database has no contracts to explain against; run with --seed")
+        sys.exit(2)
+
+    failures = 0
+    print(f"{'query':<30}{'plan ms':>10}{'exec ms':>10}  indexes")
+    for query in HOT_QUERIES:
+        plan = plans[query.name]
+        used = sorted({node["Index Name"] for node in plan_nodes(plan["Plan"]) if "Index Name" in node})
+        problems = check(query, plan)
+        failures += bool(problems)
+
+        print(
+            f"{query.name:<30}{plan['Planning Time']:>10.2f}{plan['Execution Time']:>10.2f}  "
+            f"{', '.join(used) or '-'}"
+        )
+        for problem in problems:
+            print(f"    FAIL: {problem}")
+        if args.verbose:
+            print(json.dumps(plan["Plan"], indent=2))
+
+    if failures:
+        print(f"{failures} of {len(HOT_QUERIES)} plans regressed")
+        sys.exit(1)
+    print("All plans use their indexes")
+
+if __name__ == "__main__":
+    main()
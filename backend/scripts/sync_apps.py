@@ -1,88 +1,320 @@
-import sys
-import os
+"""
+Sync the predefined app catalog in src/data/apps.ts into the apps table.
+
+    python scripts/sync_apps.py [--dry-run] [--force] [--batch-size N] [--verbose]
+
+Every app gets a stable UUID derived from its frontend id, so renamed or
+recategorized apps update their existing row. Rows created before that (or
+by hand) are matched by name instead. Apps are compared by checksum and only
+new or changed ones are upserted, in bounded batches. Names held by another
+row are reported as conflicts and skipped; renames that free a name are
+written before the rows that take it over.
+
+The checksum of the whole catalog is stored per Supabase project in a state
+file after a clean sync, and later runs skip all work while it is unchanged.
+"""
+import argparse
+import asyncio
+import hashlib
 import json
+import os
 import re
-from typing import List, Dict
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sys
+import uuid
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
 
-from app.database import get_db
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from app.config import get_settings
+from app.database import Database, close_database, get_database
 from app.models.app import AppCreate
 
-async def load_frontend_apps() -> List[Dict]:
-    """Load apps from the frontend TypeScript file"""
-    frontend_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-        'src', 'data', 'apps.ts'
-    )
-    
-    with open(frontend_path, 'r') as f:
+DEFAULT_SOURCE = os.path.join(os.path.dirname(BACKEND_DIR), 'src', 'data', 'apps.ts')
+DEFAULT_STATE = os.path.join(BACKEND_DIR, '.cache', 'sync_apps.json')
+
+# Namespace for ids derived from the frontend app ids; never change it, or
+# every app would be treated as new
+APP_ID_NAMESPACE = uuid.UUID('5a1f3c1e-8d0b-4c7e-9a52-3f6d2b7c4e10')
+
+# Columns owned by the sync; anything else on the row is left alone
+SYNCED_FIELDS = ('name', 'category', 'is_predefined', 'api_supported')
+
+PAGE_SIZE = 1000
+
+OBJECT_PATTERN = re.compile(r'\{([^{}]*)\}')
+FIELD_PATTERN = re.compile(r"""(\w+)\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|(true|false))""")
+
+class AppChange(NamedTuple):
+    row: dict
+    # Field -> (old, new); empty for inserts
+    changes: Dict[str, tuple]
+
+class SyncPlan(NamedTuple):
+    inserts: List[AppChange]
+    updates: List[AppChange]
+    unchanged: int
+    # Rows to write, grouped so no row takes a name before it is freed
+    phases: List[List[dict]]
+    conflicts: List[str]
+    # Existing predefined apps that are no longer in the source; never deleted
+    orphaned: List[str]
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', r'\1', value)
+
+def load_frontend_apps(path: str = DEFAULT_SOURCE) -> List[dict]:
+    """Parse the apps array of the frontend TypeScript file into app rows"""
+    with open(path, 'r') as f:
         content = f.read()
-        
-        # Extract the array content between [ and ]
-        # Find the last occurrence of '=' before the first '['
-        equals_pos = content.rfind('=', 0, content.find('['))
-        if equals_pos != -1:
-            # Start from after the '=' sign
-            content = content[equals_pos + 1:]
-        
-        # Find the first '[' and last ']'
-        start = content.find('[')
-        end = content.rfind(']') + 1
-        
-        if start == -1 or end == 0:
-            raise ValueError("Could not find valid array brackets in the TypeScript file")
-            
-        apps_array = content[start:end]
-        
-        # Use regex to clean and format the JSON string
-        apps_json = re.sub(r"(\w+):", r'"\1":', apps_array)  # Add quotes around keys
-        apps_json = re.sub(r"'", '"', apps_json)  # Replace single quotes with double quotes
-        apps_json = re.sub(r'//.*', '', apps_json)  # Remove single-line comments
-        apps_json = re.sub(r'/\*.*?\*/', '', apps_json, flags=re.DOTALL)  # Remove multi-line comments
-        apps_json = re.sub(r',(\s*[\]}])', r'\1', apps_json)  # Remove trailing commas
-        
-        # Log cleaned JSON for debugging
-        print("Cleaned Apps JSON:", apps_json)
-        
-        # Parse JSON
-        try:
-            return json.loads(apps_json)
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON: {e}")
-            print("Faulty JSON Content:", apps_json)
-            raise
-
-async def sync_apps():
+
+    # Skip the type annotation (App[]) and start at the array literal
+    match = re.search(r'export\s+const\s+apps\b[^=]*=\s*\[', content)
+    if not match:
+        raise ValueError(f"Could not find the apps array in {path}")
+    body = content[match.end():content.rfind(']')]
+    body = re.sub(r'/\*.*?\*/', '', body, flags=re.DOTALL)
+    body = re.sub(r'//[^\n]*', '', body)
+
+    apps = []
+    for number, obj in enumerate(OBJECT_PATTERN.findall(body), start=1):
+        fields = {}
+        for key, single, double, boolean in FIELD_PATTERN.findall(obj):
+            if boolean:
+                fields[key] = boolean == 'true'
+            else:
+                fields[key] = _unescape(single or double)
+
+        if 'id' not in fields:
+            raise ValueError(f"App #{number} in {path} has no id")
+        app = AppCreate(
+            name=fields.get('name', ''),
+            category=fields.get('category'),
+            is_predefined=True,
+            api_supported=fields.get('apiSupported', fields.get('api_supported', False))
+        )
+        apps.append({
+            'id': str(uuid.uuid5(APP_ID_NAMESPACE, fields['id'])),
+            **app.model_dump(mode='json')
+        })
+    return apps
+
+def app_checksum(row: dict) -> str:
+    values = [row.get(field) for field in SYNCED_FIELDS]
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+def catalog_checksum(apps: List[dict]) -> str:
+    digest = hashlib.sha256()
+    for app in sorted(apps, key=lambda app: app['id']):
+        digest.update(f"{app['id']}:{app_checksum(app)}\n".encode())
+    return digest.hexdigest()
+
+async def fetch_existing(db: Database) -> List[dict]:
+    """Read the synced columns of every app, a page at a time"""
+    rows = []
+    while True:
+        query = db.table('apps')\
+            .select('id, ' + ', '.join(SYNCED_FIELDS))\
+            .order('id')\
+            .range(len(rows), len(rows) + PAGE_SIZE - 1)
+        response = await db.execute(query)
+        rows.extend(response.data)
+        if len(response.data) < PAGE_SIZE:
+            return rows
+
+def plan_sync(source: List[dict], existing: List[dict]) -> SyncPlan:
+    by_id = {row['id']: row for row in existing}
+    by_name = {row['name']: row for row in existing}
+
+    inserts: List[AppChange] = []
+    updates: List[AppChange] = []
+    conflicts: List[str] = []
+    unchanged = 0
+    claimed: Dict[str, str] = {}
+    matched = set()
+
+    for app in source:
+        current = by_id.get(app['id']) or by_name.get(app['name'])
+        row = {**app, 'id': current['id']} if current else app
+
+        if claimed.get(row['name'], row['id']) != row['id']:
+            conflicts.append(f"{row['name']}: listed more than once in the source")
+            continue
+        claimed[row['name']] = row['id']
+
+        if current is None:
+            inserts.append(AppChange(row, {}))
+            continue
+
+        matched.add(current['id'])
+        if app_checksum(current) == app_checksum(row):
+            unchanged += 1
+        else:
+            changes = {
+                field: (current.get(field), row[field])
+                for field in SYNCED_FIELDS
+                if current.get(field) != row[field]
+            }
+            updates.append(AppChange(row, changes))
+
+    # A written row may take a name that another row still holds. That is
+    # fine once the holder has been renamed in an earlier phase; otherwise
+    # (the holder keeps its name, or renames form a cycle) it is a conflict.
+    writes = {change.row['id']: change.row for change in inserts + updates}
+    blocked_by = {}
+    for row in writes.values():
+        holder = by_name.get(row['name'])
+        if holder and holder['id'] != row['id']:
+            renamed = writes.get(holder['id'])
+            if renamed and renamed['name'] != holder['name']:
+                blocked_by[row['id']] = holder['id']
+            else:
+                conflicts.append(f"{row['name']}: name is already used by app {holder['id']}")
+                blocked_by[row['id']] = None
+
+    phases = []
+    done = set()
+    pending = dict(writes)
+    while pending:
+        phase = [
+            row for row_id, row in pending.items()
+            if row_id not in blocked_by or blocked_by[row_id] in done
+        ]
+        if not phase:
+            break
+        phases.append(phase)
+        for row in phase:
+            done.add(row['id'])
+            del pending[row['id']]
+
+    for row_id, row in pending.items():
+        if blocked_by.get(row_id) is not None:
+            conflicts.append(f"{row['name']}: circular rename with app {blocked_by[row_id]}")
+
+    skipped = set(pending)
+    orphaned = [
+        row['name'] for row in existing
+        if row.get('is_predefined') and row['id'] not in matched and row['id'] not in writes
+    ]
+    return SyncPlan(
+        inserts=[change for change in inserts if change.row['id'] not in skipped],
+        updates=[change for change in updates if change.row['id'] not in skipped],
+        unchanged=unchanged,
+        phases=phases,
+        conflicts=conflicts,
+        orphaned=orphaned
+    )
+
+async def apply_plan(db: Database, plan: SyncPlan, batch_size: int) -> int:
+    written = 0
+    for phase in plan.phases:
+        for start in range(0, len(phase), batch_size):
+            rows = [
+                {'id': row['id'], **{field: row[field] for field in SYNCED_FIELDS}}
+                for row in phase[start:start + batch_size]
+            ]
+            query = db.table('apps')\
+                .upsert(rows, on_conflict='id')
+            await db.execute(query)
+            written += len(rows)
+    return written
+
+def load_state(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temporary, path)
+
+def print_plan(plan: SyncPlan, verbose: bool):
+    print(
+        f"{len(plan.inserts)} to insert, {len(plan.updates)} to update, "
+        f"{plan.unchanged} unchanged, {len(plan.conflicts)} conflicts"
+    )
+    if verbose:
+        for change in plan.inserts:
+            print(f"+ {change.row['name']} ({change.row['category']})")
+        for change in plan.updates:
+            diff = ', '.join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in change.changes.items())
+            print(f"~ {change.row['name']}: {diff}")
+    for conflict in plan.conflicts:
+        print(f"! {conflict}")
+    if plan.orphaned:
+        print(f"{len(plan.orphaned)} predefined apps are no longer in the source and were left in place")
+
+async def sync_apps(
+    source_path: str = DEFAULT_SOURCE,
+    state_path: str = DEFAULT_STATE,
+    dry_run: bool = False,
+    force: bool = False,
+    batch_size: Optional[int] = None,
+    verbose: bool = False
+) -> Optional[SyncPlan]:
     """Sync frontend apps with backend database"""
-    db_generator = get_db()
-    db = next(db_generator)
+    settings = get_settings()
+    source = load_frontend_apps(source_path)
+    checksum = catalog_checksum(source)
+
+    state = load_state(state_path)
+    project = state.get(settings.supabase_url, {})
+    if not force and project.get('checksum') == checksum:
+        print(f"Catalog unchanged since {project.get('synced_at')}; nothing to do")
+        return None
+
+    db = get_database()
     try:
-        # Get existing apps from database
-        response = db.table('apps').select('id').execute()
-        existing_app_ids = {app['id'] for app in response.data}
-        
-        # Load frontend apps
-        frontend_apps = await load_frontend_apps()
-        
-        # Find apps that need to be added
-        apps_to_add = [
-            AppCreate(id=app['id'], name=app['name'], category=app['category']).model_dump()
-            for app in frontend_apps if app['id'] not in existing_app_ids
-        ]
-        
-        if apps_to_add:
-            # Insert new apps
-            response = db.table('apps').insert(apps_to_add).execute()
-            print(f"Added {len(apps_to_add)} new apps to the database")
-            for app in apps_to_add:
-                print(f"- {app['name']} ({app['id']})")
-        else:
-            print("All apps are already in sync")
-            
+        plan = plan_sync(source, await fetch_existing(db))
+        print_plan(plan, verbose)
+
+        if dry_run:
+            print("Dry run; no changes written")
+            return plan
+
+        written = await apply_plan(db, plan, batch_size or settings.bulk_chunk_size)
+        print(f"Wrote {written} apps")
+
+        # Conflicting apps were not written, so leave the state stale to retry them
+        if not plan.conflicts:
+            state[settings.supabase_url] = {
+                'checksum': checksum,
+                'synced_at': datetime.utcnow().isoformat()
+            }
+            save_state(state_path, state)
+        return plan
     except Exception as e:
         print(f"Error syncing apps: {e}")
         raise
+    finally:
+        await close_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="frontend apps.ts file")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="where the last synced checksum is kept")
+    parser.add_argument("--dry-run", action="store_true", help="show the changes without writing them")
+    parser.add_argument("--force", action="store_true", help="sync even if the catalog checksum is unchanged")
+    parser.add_argument("--batch-size", type=int, help="apps per upsert (default BULK_CHUNK_SIZE)")
+    parser.add_argument("--verbose", action="store_true", help="list every inserted and updated app")
+    args = parser.parse_args()
+
+    plan = asyncio.run(sync_apps(
+        source_path=args.source,
+        state_path=args.state,
+        dry_run=args.dry_run,
+        force=args.force,
+        batch_size=args.batch_size,
+        verbose=args.verbose
+    ))
+    if plan and plan.conflicts:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(sync_apps())
+    main()